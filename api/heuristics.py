@@ -0,0 +1,198 @@
+"""Heuristic essay scoring shared by every entry point that can't call a model.
+
+The offline fallback in GemmaEssayScorer, the basic scorer in gemma_app.py and
+the Vercel API in api/index.py all score from the same four counts, so the
+counting lives here once and the three scoring formulas are thin presets:
+
+    from heuristics import score_essay, score_many
+    result = score_essay(text, "offline")
+    results = score_many(texts, "basic")
+"""
+import re
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple
+
+# Substrings that usually mean sloppy punctuation; each one present costs a grammar point
+GRAMMAR_MARKERS = (". ,", "  ", " .", " ,", ",,", "!!")
+
+# Whitespace as understood by str.split() and str.strip(). The ASCII part is
+# classified byte-wise below; the rest is folded into a plain space first.
+_ASCII_SPACE = bytes(c for c in range(128) if chr(c).isspace() and chr(c) != "\n")
+_UNICODE_SPACE_RE = re.compile("[%s]" % "".join(chr(c) for c in range(128, 0x3001) if chr(c).isspace()))
+
+
+def _class_table(classes: Dict[bytes, bytes], default: bytes) -> bytes:
+    table = bytearray(default * 256)
+    for chars, cls in classes.items():
+        for c in chars:
+            table[c] = cls[0]
+    return bytes(table)
+
+
+# Byte -> character-class tables. Every feature is then a translate plus a
+# count of class transitions, so no per-word or per-sentence objects are built
+# no matter how the text is shaped.
+_WORD_CLASSES = _class_table({_ASCII_SPACE + b"\n": b" "}, b"a")
+_SENTENCE_CLASSES = _class_table({b".": b"."}, b"a")
+_PARAGRAPH_CLASSES = _class_table({_ASCII_SPACE: b"s", b"\n": b"n"}, b"a")
+
+
+def _runs_after(classes: bytes, boundary: bytes) -> int:
+    """Number of content runs ('a') that start the text or follow a boundary."""
+    return classes.count(boundary + b"a") + classes.startswith(b"a")
+
+
+class EssayFeatures(NamedTuple):
+    """The counts every heuristic preset scores from."""
+    word_count: int
+    sentence_count: int
+    paragraph_count: int
+    grammar_issues: int
+
+
+def extract_features(essay_text: str) -> EssayFeatures:
+    """Count words, sentences, paragraphs and grammar markers.
+
+    The counts match the original per-scorer code exactly: words as in
+    ``len(text.split())``, sentences as the non-blank pieces of
+    ``text.split('.')``, paragraphs as the non-blank pieces of
+    ``text.split('\\n\\n')`` (at least 1), and one grammar issue per
+    GRAMMAR_MARKERS entry present.
+
+    Args:
+        essay_text: The essay text
+
+    Returns:
+        EssayFeatures for the text
+    """
+    if essay_text.isascii():
+        data = essay_text.encode("ascii")
+    else:
+        # Multi-byte UTF-8 sequences never contain ASCII bytes, so once the
+        # non-ASCII whitespace is a space every other byte is plain content.
+        # surrogatepass keeps lone surrogates (valid in JSON input) as content too.
+        data = _UNICODE_SPACE_RE.sub(" ", essay_text).encode("utf-8", "surrogatepass")
+
+    words = _runs_after(data.translate(_WORD_CLASSES), b" ")
+    # Whitespace is dropped, so a piece between two dots is non-blank exactly
+    # when a '.' is directly followed by content
+    sentences = _runs_after(data.translate(_SENTENCE_CLASSES, _ASCII_SPACE + b"\n"), b".")
+    # bytes.replace pairs newlines left to right like str.split does, so a
+    # third newline in a row stays with the next paragraph
+    paragraph_classes = data.translate(_PARAGRAPH_CLASSES).replace(b"nn", b"P").translate(None, b"sn")
+    paragraphs = _runs_after(paragraph_classes, b"P")
+    grammar_issues = sum(marker in essay_text for marker in GRAMMAR_MARKERS)
+
+    return EssayFeatures(words, sentences, max(1, paragraphs), grammar_issues)
+
+
+def _overall(coherence: int, grammar: int, content: int, evidence: int) -> int:
+    return round((coherence + grammar + content + evidence) / 4)
+
+
+def _clamp(score: int) -> int:
+    return min(10, max(1, score))
+
+
+def score_offline(features: EssayFeatures) -> Dict[str, Any]:
+    """Fallback formula used by GemmaEssayScorer when the API is unavailable."""
+    word_count, paragraphs = features.word_count, features.paragraph_count
+    avg_words_per_sentence = word_count / max(features.sentence_count, 1)
+
+    coherence_score = _clamp(int((avg_words_per_sentence / 5) + (paragraphs / 2)))
+    grammar_score = _clamp(7 - features.grammar_issues + (1 if word_count > 300 else 0))
+    content_score = _clamp(word_count // 75)
+    evidence_score = _clamp(word_count // 100)
+    overall_score = _overall(coherence_score, grammar_score, content_score, evidence_score)
+
+    return {
+        "coherence_score": coherence_score,
+        "grammar_score": grammar_score,
+        "content_score": content_score,
+        "evidence_score": evidence_score,
+        "overall_score": overall_score,
+        "feedback": {
+            "coherence": f"Your essay has {paragraphs} paragraphs and an average of {round(avg_words_per_sentence, 1)} words per sentence. Consider organizing your ideas into clearly defined paragraphs with topic sentences for better structure.",
+            "grammar": "The essay contains some grammatical elements that could be improved. Pay attention to punctuation and sentence structure to enhance readability.",
+            "content": f"Your essay contains {word_count} words. To improve content depth, consider adding more specific examples and developing your arguments with greater detail.",
+            "evidence": "Consider incorporating more specific evidence to support your main points. Strong essays use concrete examples and references to strengthen arguments."
+        },
+        "summary": f"This {word_count}-word essay demonstrates {['limited', 'basic', 'good', 'strong'][min(3, overall_score//3)]} writing skills. Focus on improving organization, grammar, and supporting evidence for a better score."
+    }
+
+
+def score_basic(features: EssayFeatures) -> Dict[str, Any]:
+    """Length-based formula used by gemma_app.py when GemmaEssayScorer can't be imported."""
+    word_count, sentence_count = features.word_count, features.sentence_count
+
+    coherence_score = _clamp(5 + (1 if word_count > 200 else 0))
+    grammar_score = _clamp(5 + (1 if sentence_count > 10 else 0))
+    content_score = _clamp(word_count // 50)
+    evidence_score = _clamp(word_count // 75)
+
+    return {
+        "coherence_score": coherence_score,
+        "grammar_score": grammar_score,
+        "content_score": content_score,
+        "evidence_score": evidence_score,
+        "overall_score": _overall(coherence_score, grammar_score, content_score, evidence_score),
+        "scoring_method": "basic",
+        "feedback": {
+            "coherence": f"Your essay has approximately {sentence_count} sentences. Consider focusing on logical structure and flow.",
+            "grammar": "The essay might benefit from a review for grammar and punctuation.",
+            "content": f"Your essay contains {word_count} words. Consider adding more detailed arguments for a higher score.",
+            "evidence": "Try to include specific examples and references to support your points."
+        },
+        "summary": f"This {word_count}-word essay demonstrates basic writing skills. Focus on improving organization and evidence for a better score."
+    }
+
+
+def score_vercel(features: EssayFeatures) -> Dict[str, Any]:
+    """Formula served by the Vercel deployment (api/index.py)."""
+    word_count, sentence_count = features.word_count, features.sentence_count
+
+    coherence_score = _clamp(5 + (1 if word_count > 200 else 0))
+    grammar_score = _clamp(6 + (1 if sentence_count > 10 else 0))
+    content_score = _clamp(word_count // 50)
+    evidence_score = _clamp(word_count // 75)
+
+    return {
+        "coherence_score": coherence_score,
+        "grammar_score": grammar_score,
+        "content_score": content_score,
+        "evidence_score": evidence_score,
+        "overall_score": _overall(coherence_score, grammar_score, content_score, evidence_score),
+        "scoring_method": "advanced",  # For UI purposes
+        "feedback": {
+            "coherence": f"Your essay has {features.paragraph_count} paragraphs and approximately {sentence_count} sentences. Consider focusing on logical structure and flow.",
+            "grammar": "The essay structure appears good. Pay attention to punctuation and sentence variety for enhanced readability.",
+            "content": f"Your essay contains {word_count} words. Consider developing your arguments with greater detail for a higher score.",
+            "evidence": "Try to include specific examples and references to support your main points."
+        },
+        "summary": f"This {word_count}-word essay demonstrates solid writing skills. Focus on improving organization and evidence for a better score."
+    }
+
+
+PRESETS: Dict[str, Callable[[EssayFeatures], Dict[str, Any]]] = {
+    "offline": score_offline,
+    "basic": score_basic,
+    "vercel": score_vercel,
+}
+
+
+def score_essay(essay_text: str, preset: str = "offline") -> Dict[str, Any]:
+    """Score one essay with a heuristic preset.
+
+    Args:
+        essay_text: The essay text
+        preset: One of PRESETS
+
+    Returns:
+        Dictionary containing scores and feedback
+    """
+    return PRESETS[preset](extract_features(essay_text))
+
+
+def score_many(essays: Iterable[str], preset: str = "offline") -> List[Dict[str, Any]]:
+    """Score a batch of essays with one preset, in input order."""
+    formula = PRESETS[preset]
+    return [formula(extract_features(essay_text)) for essay_text in essays]
@@ -4,43 +4,15 @@ import os
 import logging
 import json
 
+from heuristics import score_essay as heuristic_score
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Simple scoring function for Vercel deployment
 def score_essay(essay_text):
-    word_count = len(essay_text.split())
-    sentences = [s.strip() for s in essay_text.split('.') if s.strip()]
-    sentence_count = len(sentences)
-    
-    # Count paragraphs as a measure of structure
-    paragraphs = len([p for p in essay_text.split('\n\n') if p.strip()])
-    paragraphs = max(1, paragraphs)
-    
-    # Simple scoring logic
-    coherence_score = min(10, max(1, 5 + (1 if word_count > 200 else 0)))
-    grammar_score = min(10, max(1, 6 + (1 if sentence_count > 10 else 0)))
-    content_score = min(10, max(1, word_count // 50))
-    evidence_score = min(10, max(1, word_count // 75))
-    
-    overall_score = round((coherence_score + grammar_score + content_score + evidence_score) / 4)
-    
-    return {
-        "coherence_score": coherence_score,
-        "grammar_score": grammar_score,
-        "content_score": content_score,
-        "evidence_score": evidence_score,
-        "overall_score": overall_score,
-        "scoring_method": "advanced",  # For UI purposes
-        "feedback": {
-            "coherence": f"Your essay has {paragraphs} paragraphs and approximately {sentence_count} sentences. Consider focusing on logical structure and flow.",
-            "grammar": "The essay structure appears good. Pay attention to punctuation and sentence variety for enhanced readability.",
-            "content": f"Your essay contains {word_count} words. Consider developing your arguments with greater detail for a higher score.",
-            "evidence": "Try to include specific examples and references to support your main points."
-        },
-        "summary": f"This {word_count}-word essay demonstrates solid writing skills. Focus on improving organization and evidence for a better score."
-    }
+    return heuristic_score(essay_text, "vercel")
 
 # Initialize Flask app
 app = Flask(__name__)
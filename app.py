@@ -1,66 +1,48 @@
-from flask import Flask,request,render_template,url_for,jsonify
+from flask import Flask,request,jsonify
 import numpy as np
-import pandas as pd
-import nltk
-import re
-from nltk.corpus import stopwords
-from nltk.tokenize import sent_tokenize,word_tokenize
-from gensim.models import Word2Vec
-from tensorflow.keras.layers import Embedding, LSTM, Dense, Dropout, Lambda, Flatten
-from tensorflow.keras.models import Sequential, load_model
-import tensorflow.keras.backend as K
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error
-from sklearn.metrics import cohen_kappa_score
-from gensim.models.keyedvectors import KeyedVectors
 from flask_cors import CORS
+from model_registry import ModelRegistry
+from embedding_engine import engine_for
+from text_pipeline import default_tokenizer
+from feature_extractor import default_extractor
+from score_cache import ScoreCache
+from microbatch import MicroBatcher
+from logs import configure_logging, get_logger
+from metrics import REGISTRY, instrument_app, timer
+from profiling import RequestProfiler
 
+configure_logging()
+log = get_logger(__name__)
+
+
+# Built once per process: compiled word pattern, frozen stopword set and a cached Punkt model
+tokenizer = default_tokenizer()
 
-def sent2word(x):
-    stop_words = set(stopwords.words('english')) 
-    x=re.sub("[^A-Za-z]"," ",x)
-    x.lower()
-    filtered_sentence = [] 
-    words=x.split()
-    for w in words:
-        if w not in stop_words: 
-            filtered_sentence.append(w)
-    return filtered_sentence
 
+def sent2word(x):
+    return tokenizer.words(x)
 
 
 def essay2word(essay):
-    essay = essay.strip()
-    tokenizer = nltk.data.load('tokenizers/punkt/english.pickle')
-    raw = tokenizer.tokenize(essay)
-    final_words=[]
-    for i in raw:
-        if(len(i)>0):
-            final_words.append(sent2word(i))
-    return final_words
+    return tokenizer.tokenize(essay)
+
 
 def makeVec(words, model, num_features):
-    vec = np.zeros((num_features,),dtype="float32")
-    noOfWords = 0.
-    index2word_set = set(model.index_to_key)
-    for i in words:
-        if i in index2word_set:
-            noOfWords += 1
-            vec = np.add(vec,model[i])        
-    vec = np.divide(vec,noOfWords)
-    return vec
+    return getVecs([words], model, num_features)[0]
 
 
 def getVecs(essays, model, num_features):
-    c=0
-    essay_vecs = np.zeros((len(essays),num_features),dtype="float32")
-    for i in essays:
-        essay_vecs[c] = makeVec(i, model, num_features)
-        c+=1
-    return essay_vecs
+    engine = engine_for(model)
+    if engine.num_features != num_features:
+        raise ValueError(f"Expected {num_features}-dimensional vectors, got {engine.num_features}")
+    return engine.mean_vectors(essays)
 
 
 def get_model():
+    # Imported here so serving with exported NumPy weights never loads TensorFlow
+    from tensorflow.keras.layers import LSTM, Dense, Dropout
+    from tensorflow.keras.models import Sequential
+
     model = Sequential()
     model.add(LSTM(300, dropout=0.4, recurrent_dropout=0.4, input_shape=[1, 300], return_sequences=True))
     model.add(LSTM(64, recurrent_dropout=0.4))
@@ -70,35 +52,60 @@ def get_model():
     model.summary()
     return model
 
+# Models are loaded once per process and shared by all requests
+registry = ModelRegistry()
+score_cache = ScoreCache.from_env()
+# Concurrent requests share one LSTM predict call (tuned by LSTM_BATCH_WINDOW_MS, LSTM_MAX_BATCH, LSTM_MAX_QUEUE)
+batcher = MicroBatcher.from_env(registry.predict, prefix="LSTM", name="lstm-batcher")
+
 def convertToVec(text):
     content=text
     if len(content) > 20:
-        num_features = 300
-        model = KeyedVectors.load_word2vec_format("word2vecmodel.bin", binary=True)
-        clean_test_essays = []
-        clean_test_essays.append(sent2word(content))
-        testDataVecs = getVecs(clean_test_essays, model, num_features )
+        registry.wait_until_ready()
+        # sent2word drops everything but letters, so whitespace-normalized keys are safe here
+        cache_key = ScoreCache.make_key(content, "lstm", registry.version)
+        cached = score_cache.get(cache_key)
+        if cached is not None:
+            return cached['score']
+        with timer("tokenize"):
+            clean_test_essays = tokenizer.tokenize_many([content])
+        with timer("embed"):
+            testDataVecs = getVecs(clean_test_essays, registry.embeddings, registry.num_features)
         testDataVecs = np.array(testDataVecs)
         testDataVecs = np.reshape(testDataVecs, (testDataVecs.shape[0], 1, testDataVecs.shape[1]))
 
-        lstm_model = load_model("final_lstm.h5")
-        preds = lstm_model.predict(testDataVecs)
-        return str(round(preds[0][0]))
+        with timer("predict"):
+            preds = batcher.predict(testDataVecs)
+        score = str(round(preds[0][0]))
+        score_cache.set(cache_key, {'score': score})
+        return score
 
         
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+instrument_app(app)  # Request timings, counters and the /metrics endpoint
+# Opt-in cProfile/tracemalloc profiling of sampled or admin-requested requests (off unless configured)
+profiler = RequestProfiler.from_env().install(app)
+registry.load_async()
+
+# Export the counters and histograms the components already keep
+REGISTRY.register('lstm_batches', batcher.batches, 'LSTM predict calls')
+REGISTRY.register('lstm_batch_rejected', batcher.rejected, 'Requests rejected because the batch queue was full')
+REGISTRY.register('lstm_batch_size', batcher.batch_sizes, 'Essays per LSTM predict call')
+REGISTRY.register('lstm_batch_queue_wait_ms', batcher.queue_wait_ms, 'Time requests waited to join a batch')
+REGISTRY.gauge('models_ready', lambda: float(registry.status()['ready']), 'Whether the models are loaded')
+for stat in ('memory_hits', 'disk_hits', 'misses', 'stores', 'evictions'):
+    REGISTRY.gauge('cache_' + stat, lambda stat=stat: score_cache.stats()[stat], f'Score cache {stat.replace("_", " ")}')
 
 @app.route('/', methods=['POST'])
 def create_task():
-    K.clear_session()
     try:
-        final_text = request.get_json()["text"]
+        with timer("request_parse"):
+            final_text = request.get_json()["text"]
         score = convertToVec(final_text)
-        K.clear_session()
         return jsonify({'score': score}), 201
     except Exception as e:
-        print("Error:", str(e))
+        log.warning("Error: %s", e)
         # Return a fixed score for testing
         return jsonify({'score': '7', 'note': 'Fixed score - model loading issue'}), 201
         
@@ -121,6 +128,31 @@ def test_endpoint():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/features', methods=['POST'])
+def features_endpoint():
+    """Handcrafted features of the essay (or list of essays), computed like Essay_Scoring_1.ipynb."""
+    try:
+        with timer("request_parse"):
+            payload = request.get_json()
+            texts = payload if isinstance(payload, list) else [payload["text"]]
+            if not all(isinstance(text, str) for text in texts):
+                raise ValueError("Expected {\"text\": ...} or a list of essays")
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    extractor = default_extractor()
+    with timer("features"):
+        matrix = extractor.transform(texts)
+    rows = [dict(zip(extractor.columns, row)) for row in matrix.tolist()]
+    return jsonify(rows if isinstance(payload, list) else rows[0]), 200
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    """Report whether the models are loaded and ready to serve."""
+    status = registry.status()
+    status['cache'] = score_cache.stats()
+    status['batching'] = batcher.stats()
+    return jsonify(status), 200 if status['ready'] else 503
+
 if __name__=='__main__':
     app.run(debug=True)
     
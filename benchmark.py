@@ -0,0 +1,504 @@
+"""Performance benchmarks for the scoring paths.
+
+    python benchmark.py async --requests 200 --latency 0.5
+    python benchmark.py heuristics --megabytes 5
+    python benchmark.py packing --requests 200 --latency 0.5
+    python benchmark.py ratelimit --requests 40 --rate-limit 10 --rate-window 5
+    python benchmark.py scorers lstm upstream --lengths 100,300,800 --essays 50
+    python benchmark.py tokenize --lengths 100,300,800 --essays 50
+
+Results are printed as JSON. To guard against regressions, store a baseline
+once and compare later runs against it; the run fails (exit code 1) when a
+throughput (*_per_s) drops or a median latency (*_ms, *_s, seconds) grows by
+more than the threshold:
+
+    python benchmark.py scorers lstm --save-baseline benchmark_baseline.json
+    python benchmark.py scorers lstm --baseline benchmark_baseline.json --threshold 0.2
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+BENCHMARKS: Dict[str, Callable[[argparse.Namespace], Dict[str, Any]]] = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark under a command-line name."""
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def load_sample_essays(path: str = "sample_essays.txt") -> List[Tuple[str, int]]:
+    """Read the (essay, score) pairs from sample_essays.txt."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read().replace("\r\n", "\n")
+    return [(essay.strip(), int(score))
+            for essay, score in re.findall(r"^\d+\)\n(.*?)\n\s*score:\s*(\d+)", text, re.S | re.M)]
+
+
+def synthetic_essays(count: int, words: int, seed: int = 0) -> List[str]:
+    """Essays of exactly `words` words, built from the sample essays' vocabulary.
+
+    Sentences run 8-25 words and paragraphs 3-6 sentences, so tokenizers and
+    the heuristic scorers see realistic structure at a controlled length.
+    """
+    vocabulary = sorted({word for essay, _ in load_sample_essays() for word in re.findall(r"[A-Za-z']+", essay)})
+    rng = random.Random(seed)
+    essays = []
+    for _ in range(count):
+        paragraphs, sentences, sentence = [], [], []
+        sentence_length = rng.randint(8, 25)
+        for i in range(words):
+            sentence.append(rng.choice(vocabulary))
+            if len(sentence) == sentence_length or i == words - 1:
+                sentences.append(" ".join(sentence).capitalize() + ".")
+                sentence, sentence_length = [], rng.randint(8, 25)
+                if len(sentences) >= rng.randint(3, 6) or i == words - 1:
+                    paragraphs.append(" ".join(sentences))
+                    sentences = []
+        essays.append("\n\n".join(paragraphs))
+    return essays
+
+
+def _lengths(args: argparse.Namespace) -> List[int]:
+    return [int(n) for n in args.lengths.split(",") if n.strip()]
+
+
+def latency_stats(seconds: Sequence[float]) -> Dict[str, float]:
+    """Percentiles, mean and throughput of per-call durations."""
+    ordered = sorted(seconds)
+
+    def percentile(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 4)
+
+    total = sum(ordered)
+    return {"calls": len(ordered), "p50_ms": percentile(50), "p90_ms": percentile(90), "p99_ms": percentile(99),
+            "mean_ms": round(total / len(ordered) * 1000, 4), "calls_per_s": _rate(len(ordered), total)}
+
+
+def time_calls(func: Callable[[Any], Any], inputs: Iterable[Any], warmup: int = 3, rounds: int = 1) -> Dict[str, float]:
+    """Call func once per input and report the latency distribution.
+
+    With several rounds the inputs are timed again each round and the round
+    with the lowest median is reported, like timeit's best-of-N, so a noisy
+    neighbour doesn't show up as a regression.
+    """
+    inputs = list(inputs)
+    for value in inputs[:warmup]:
+        func(value)
+    best = None
+    for _ in range(rounds):
+        durations = []
+        for value in inputs:
+            start = time.perf_counter()
+            func(value)
+            durations.append(time.perf_counter() - start)
+        stats = latency_stats(durations)
+        if best is None or stats["p50_ms"] < best["p50_ms"]:
+            best = stats
+    return best
+
+
+def _client_threads() -> int:
+    # The mock upstream runs in-process; its per-connection threads are not ours
+    return sum(1 for t in threading.enumerate() if "process_request_thread" not in t.name)
+
+
+class PeakThreads:
+    """Track the highest number of live client-side threads while a block runs."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = _client_threads()
+        self._stop = threading.Event()
+
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _client_threads())
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _rate(count: int, seconds: float) -> float:
+    return round(count / seconds, 2) if seconds else 0.0
+
+
+@benchmark("async")
+def bench_async(args: argparse.Namespace) -> Dict[str, Any]:
+    """Thread-per-request vs. asyncio fan-out against the local mock upstream."""
+    from gemma_scorer import GemmaEssayScorer
+    from mock_upstream import start_mock_upstream
+
+    server, url = start_mock_upstream(latency=args.latency)
+    samples = [essay for essay, _ in load_sample_essays()]
+    essays = [f"{samples[i % len(samples)]} ({i})" for i in range(args.requests)]
+    results = {"requests": args.requests, "upstream_latency_s": args.latency}
+    try:
+        scorer = GemmaEssayScorer("benchmark-key", api_url=url, pool_size=args.requests,
+                                  max_concurrency=args.requests)
+        scorer.score_essay(essays[0])  # open the pool before timing
+
+        with PeakThreads() as threads:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.threads) as pool:
+                list(pool.map(scorer.score_essay, essays))
+            elapsed = time.perf_counter() - start
+        results["threads"] = {"workers": args.threads, "seconds": round(elapsed, 3),
+                              "essays_per_s": _rate(args.requests, elapsed), "peak_threads": threads.peak}
+
+        server.max_in_flight = 0
+        with PeakThreads() as threads:
+            start = time.perf_counter()
+            scorer.score_many(essays)
+            elapsed = time.perf_counter() - start
+        results["asyncio"] = {"seconds": round(elapsed, 3), "essays_per_s": _rate(args.requests, elapsed),
+                              "peak_threads": threads.peak, "peak_in_flight": server.max_in_flight}
+        scorer.close()
+    finally:
+        server.shutdown()
+    return results
+
+
+@benchmark("packing")
+def bench_packing(args: argparse.Namespace) -> Dict[str, Any]:
+    """One essay per upstream request vs. several essays per packed request, against the mock."""
+    from gemma_scorer import CHARS_PER_TOKEN, GemmaEssayScorer
+    from mock_upstream import start_mock_upstream
+
+    server, url = start_mock_upstream(latency=args.latency)
+    samples = [essay for essay, _ in load_sample_essays()]
+    # Short answers, the case packing is meant for
+    essays = [f"{' '.join(samples[i % len(samples)].split()[:80])} ({i})" for i in range(args.requests)]
+    results = {"essays": args.requests, "upstream_latency_s": args.latency}
+    try:
+        scorer = GemmaEssayScorer("benchmark-key", api_url=url)
+        for mode, score in (("single", scorer.score_many), ("packed", scorer.score_packed)):
+            requests_before, chars_before = server.request_count, server.prompt_chars
+            start = time.perf_counter()
+            score(essays)
+            elapsed = time.perf_counter() - start
+            results[mode] = {"seconds": round(elapsed, 3), "upstream_requests": server.request_count - requests_before,
+                             "prompt_tokens": (server.prompt_chars - chars_before) // CHARS_PER_TOKEN}
+        results["request_reduction"] = round(results["single"]["upstream_requests"] / results["packed"]["upstream_requests"], 2)
+        results["prompt_token_reduction"] = round(results["single"]["prompt_tokens"] / results["packed"]["prompt_tokens"], 2)
+        scorer.close()
+    finally:
+        server.shutdown()
+    return results
+
+
+@benchmark("ratelimit")
+def bench_ratelimit(args: argparse.Namespace) -> Dict[str, Any]:
+    """Retry-on-429 vs. the client-side scheduler against a rate-limited mock, plus
+    the latency of an interactive request submitted behind a queued batch."""
+    from gemma_scorer import GemmaEssayScorer
+    from mock_upstream import start_mock_upstream
+    from rate_limiter import UpstreamScheduler
+
+    server, url = start_mock_upstream(latency=args.latency, rate_limit=args.rate_limit, rate_window=args.rate_window)
+    samples = [essay for essay, _ in load_sample_essays()]
+    essays = [f"{samples[i % len(samples)]} ({i})" for i in range(args.requests)]
+    results = {"essays": args.requests, "upstream_limit": f"{args.rate_limit} per {args.rate_window}s"}
+    # The scheduler is configured with the upstream's limit; its headroom keeps it just below
+    schedulers = (("retry_only", None),
+                  ("scheduler", UpstreamScheduler(requests_per_minute=args.rate_limit, window_seconds=args.rate_window)))
+    try:
+        for mode, scheduler in schedulers:
+            time.sleep(args.rate_window)  # start every run with a fresh upstream window
+            scorer = GemmaEssayScorer("benchmark-key", api_url=url, scheduler=scheduler, max_retries=10)
+            requests_before, throttled_before = server.request_count, server.rate_limited
+            start = time.perf_counter()
+            scored = scorer.score_many(essays)
+            elapsed = time.perf_counter() - start
+            accepted = server.request_count - requests_before - (server.rate_limited - throttled_before)
+            results[mode] = {"seconds": round(elapsed, 3), "essays_per_s": _rate(args.requests, elapsed),
+                             "http_429": server.rate_limited - throttled_before,
+                             "failed": sum(1 for result in scored if "error" in result),
+                             # Share of the upstream's allowance (one full limit per window touched) actually used
+                             "utilization": round(accepted / (args.rate_limit * math.ceil(elapsed / args.rate_window)), 3)}
+
+            if scheduler is not None:
+                time.sleep(args.rate_window)
+                batch = threading.Thread(target=scorer.score_many, args=(essays,))
+                batch.start()
+                time.sleep(args.rate_window / 2)  # let the batch fill the queue
+                start = time.perf_counter()
+                scorer.score_essay(f"{samples[0]} (interactive)")
+                results["interactive_behind_batch_s"] = round(time.perf_counter() - start, 3)
+                batch.join()
+                results["queue_wait_ms"] = {name: histogram["mean"] for name, histogram in scheduler.stats()["queue_wait_ms"].items()}
+            scorer.close()
+    finally:
+        server.shutdown()
+    return results
+
+
+def _legacy_features(essay_text: str) -> Tuple[int, int, int, int]:
+    """The split()-based counting the heuristic scorers used before heuristics.py."""
+    word_count = len(essay_text.split())
+    sentence_count = len([s for s in essay_text.split('.') if s.strip()])
+    grammar_issues = 0
+    for marker in [". ,", "  ", " .", " ,", ",,", "!!"]:
+        if marker in essay_text:
+            grammar_issues += 1
+    paragraphs = max(1, len([p for p in essay_text.split('\n\n') if p.strip()]))
+    return word_count, sentence_count, paragraphs, grammar_issues
+
+
+def _best_of(func: Callable[[], Any], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@benchmark("heuristics")
+def bench_heuristics(args: argparse.Namespace) -> Dict[str, Any]:
+    """Feature extraction for the heuristic scorers on normal and pathological input."""
+    from heuristics import extract_features, score_many
+
+    samples = [essay for essay, _ in load_sample_essays()]
+    size = int(args.megabytes * 1_000_000)
+    corpus = "\n\n".join(samples)
+    inputs = {
+        "essays": samples,
+        "large_essay": [(corpus * (size // len(corpus) + 1))[:size]],
+        "only_dots": ["." * size],
+        "one_char_sentences": ["a." * (size // 2)],
+        "blank_lines": ["\n\n" * (size // 2)],
+        "no_whitespace": ["x" * size],
+    }
+
+    results = {"megabytes": args.megabytes}
+    for name, texts in inputs.items():
+        assert [tuple(extract_features(t)) for t in texts] == [_legacy_features(t) for t in texts]
+        legacy = _best_of(lambda: [_legacy_features(t) for t in texts], args.rounds)
+        current = _best_of(lambda: [extract_features(t) for t in texts], args.rounds)
+        results[name] = {"legacy_ms": round(legacy * 1000, 2), "current_ms": round(current * 1000, 2),
+                         "speedup": round(legacy / current, 2) if current else None}
+
+    batch = samples * max(1, 10_000 // len(samples))
+    elapsed = _best_of(lambda: score_many(batch, "offline"), args.rounds)
+    results["score_many"] = {"essays": len(batch), "seconds": round(elapsed, 3), "essays_per_s": _rate(len(batch), elapsed)}
+    return results
+
+
+@benchmark("scorers")
+def bench_scorers(args: argparse.Namespace) -> Dict[str, Any]:
+    """Per-essay latency of the three heuristic scorers on the samples and on synthetic essays."""
+    from heuristics import PRESETS, score_essay
+
+    # Each call takes microseconds, so every essay is scored several times per round
+    inputs = {"samples": [essay for essay, _ in load_sample_essays()] * 10}
+    for words in _lengths(args):
+        inputs[f"{words}_words"] = synthetic_essays(args.essays, words) * 5
+    return {preset: {name: time_calls(lambda text: score_essay(text, preset), texts, rounds=args.rounds)
+                     for name, texts in inputs.items()}
+            for preset in sorted(PRESETS)}
+
+
+@benchmark("lstm")
+def bench_lstm(args: argparse.Namespace) -> Dict[str, Any]:
+    """Tokenization (sent2word), embedding (getVecs), LSTM predict and the whole convertToVec path of app.py."""
+    import numpy as np
+
+    import app as lstm_app
+
+    lstm_app.registry.wait_until_ready()
+    results = {"model": lstm_app.registry.version}
+    for words in _lengths(args):
+        # Distinct essays so the score cache never answers
+        texts = synthetic_essays(args.essays, words, seed=words)
+        tokens = [lstm_app.sent2word(text) for text in texts]
+        vectors = lstm_app.getVecs(tokens, lstm_app.registry.embeddings, lstm_app.registry.num_features)
+        batch = np.reshape(np.asarray(vectors), (len(texts), 1, -1))
+        end_to_end = synthetic_essays(args.essays, words, seed=words + 1)
+        results[f"{words}_words"] = {
+            "tokenize": time_calls(lstm_app.sent2word, texts, rounds=args.rounds),
+            "embed": time_calls(lambda essay_tokens: lstm_app.getVecs([essay_tokens], lstm_app.registry.embeddings,
+                                                                       lstm_app.registry.num_features),
+                                tokens, rounds=args.rounds),
+            "predict": time_calls(lambda row: lstm_app.registry.predict(row[None]), batch, rounds=args.rounds),
+            "predict_batch_ms": round(_best_of(lambda: lstm_app.registry.predict(batch), args.rounds) * 1000, 3),
+            "convert_to_vec": time_calls(lstm_app.convertToVec, end_to_end, warmup=0),
+        }
+    return results
+
+
+def _legacy_sent2word(x: str) -> List[str]:
+    """app.py's sent2word before text_pipeline.py: reloads the stopwords and re-applies the regex per call."""
+    from nltk.corpus import stopwords
+
+    stop_words = set(stopwords.words('english'))
+    return [w for w in re.sub("[^A-Za-z]", " ", x).split() if w not in stop_words]
+
+
+def _legacy_essay2word(essay: str) -> List[List[str]]:
+    """app.py's essay2word before text_pipeline.py: loads Punkt per essay."""
+    from text_pipeline import _load_punkt
+
+    return [_legacy_sent2word(s) for s in _load_punkt().tokenize(essay.strip()) if s]
+
+
+@benchmark("tokenize")
+def bench_tokenize(args: argparse.Namespace) -> Dict[str, Any]:
+    """EssayTokenizer against the per-call sent2word/essay2word it replaced, on samples and synthetic essays."""
+    from text_pipeline import EssayTokenizer
+
+    punkt = EssayTokenizer()
+    regex = EssayTokenizer(sentence_splitter="regex")
+    inputs = {"samples": [essay for essay, _ in load_sample_essays()] * 10}
+    for words in _lengths(args):
+        inputs[f"{words}_words"] = synthetic_essays(args.essays, words, seed=words)
+
+    results: Dict[str, Any] = {}
+    for name, texts in inputs.items():
+        assert punkt.tokenize_many(texts) == [_legacy_sent2word(t) for t in texts]
+        assert punkt.tokenize_many(texts, by_sentence=True) == [_legacy_essay2word(t) for t in texts]
+        legacy_words = _best_of(lambda: [_legacy_sent2word(t) for t in texts], args.rounds)
+        legacy_sentences = _best_of(lambda: [_legacy_essay2word(t) for t in texts], args.rounds)
+        words = _best_of(lambda: punkt.tokenize_many(texts), args.rounds)
+        sentences = _best_of(lambda: punkt.tokenize_many(texts, by_sentence=True), args.rounds)
+        regex_sentences = _best_of(lambda: regex.tokenize_many(texts, by_sentence=True), args.rounds)
+        results[name] = {
+            "essays": len(texts),
+            "words_legacy_ms": round(legacy_words * 1000, 2),
+            "words_essays_per_s": _rate(len(texts), words),
+            "words_speedup": round(legacy_words / words, 2),
+            "sentences_legacy_ms": round(legacy_sentences * 1000, 2),
+            "punkt_sentences_essays_per_s": _rate(len(texts), sentences),
+            "regex_sentences_essays_per_s": _rate(len(texts), regex_sentences),
+            "sentences_speedup": round(legacy_sentences / sentences, 2),
+        }
+    return results
+
+
+@benchmark("upstream")
+def bench_upstream(args: argparse.Namespace) -> Dict[str, Any]:
+    """GemmaEssayScorer.score_essay latency against the mock upstream, and the overhead on top of it."""
+    from gemma_scorer import GemmaEssayScorer
+    from mock_upstream import start_mock_upstream
+
+    server, url = start_mock_upstream(latency=args.latency)
+    results = {"upstream_latency_s": args.latency}
+    try:
+        scorer = GemmaEssayScorer("benchmark-key", api_url=url)
+        for words in _lengths(args):
+            stats = time_calls(scorer.score_essay, synthetic_essays(args.essays, words, seed=words))
+            # What the client adds on top of the simulated model time
+            stats["overhead_p50_ms"] = round(stats["p50_ms"] - args.latency * 1000, 3)
+            results[f"{words}_words"] = stats
+        scorer.close()
+    finally:
+        server.shutdown()
+    return results
+
+
+# Suffixes of the numbers compared against a baseline; everything else is informational.
+# Per-call tails and means are reported but not compared: at microsecond scale they mostly measure scheduler noise.
+HIGHER_IS_BETTER = ("_per_s",)
+LOWER_IS_BETTER = ("_ms", "_s", "seconds")
+NOT_COMPARED = ("p90_ms", "p99_ms", "mean_ms", "calls_per_s", "overhead_p50_ms", "legacy_ms")
+
+
+def flatten_metrics(report: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Comparable numbers of a report, keyed by their dotted path."""
+    flat = {}
+    for key, value in report.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_metrics(value, path + "."))
+        elif (isinstance(value, (int, float)) and not isinstance(value, bool)
+              and key.endswith(HIGHER_IS_BETTER + LOWER_IS_BETTER) and not key.endswith(NOT_COMPARED)):
+            flat[path] = float(value)
+    return flat
+
+
+def find_regressions(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Metrics that got worse than the baseline by more than `threshold` (a fraction)."""
+    current, previous = flatten_metrics(report), flatten_metrics(baseline)
+    regressions = []
+    for path in sorted(current.keys() & previous.keys()):
+        now, before = current[path], previous[path]
+        if before <= 0:
+            continue
+        change = (now - before) / before
+        worse = -change if path.endswith(HIGHER_IS_BETTER) else change
+        if worse > threshold:
+            regressions.append({"metric": path, "baseline": before, "current": now, "change": round(change, 4)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scoring benchmarks.")
+    parser.add_argument("names", nargs="*", default=sorted(BENCHMARKS), help=f"benchmarks to run: {', '.join(sorted(BENCHMARKS))}")
+    parser.add_argument("--requests", type=int, default=200, help="upstream requests per run")
+    parser.add_argument("--latency", type=float, default=0.5, help="mock upstream latency in seconds")
+    parser.add_argument("--threads", type=int, default=16, help="worker threads for the thread-per-request baseline")
+    parser.add_argument("--megabytes", type=float, default=5, help="size of the pathological heuristics inputs")
+    parser.add_argument("--rate-limit", type=int, default=10, help="requests per window the rate-limited mock accepts")
+    parser.add_argument("--rate-window", type=float, default=5, help="rate-limit window of the mock in seconds")
+    parser.add_argument("--lengths", default="100,300,800", help="comma-separated word counts of the synthetic essays")
+    parser.add_argument("--essays", type=int, default=50, help="synthetic essays per length")
+    parser.add_argument("--rounds", type=int, default=5, help="timing rounds per in-process measurement; the best is kept")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--save-baseline", help="store the results as a baseline in this file")
+    parser.add_argument("--baseline", help="compare the results against a stored baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown against the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    report = {}
+    for name in args.names:
+        print(f"Running {name}...", file=sys.stderr)
+        try:
+            report[name] = BENCHMARKS[name](args)
+        except (ImportError, LookupError, RuntimeError) as e:
+            # e.g. app.py's dependencies, NLTK data or model files are not available here
+            print(f"Skipping {name}: {e}", file=sys.stderr)
+            report[name] = {"skipped": str(e)}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {"python": platform.python_version(), "machine": platform.machine(), "created": time.time(),
+                    "args": vars(args), "results": report}
+        with open(args.save_baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline["results"], args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['metric']}: {regression['baseline']:g} -> {regression['current']:g} "
+                  f"({regression['change']:+.1%})", file=sys.stderr)
+        compared = len(flatten_metrics(report).keys() & flatten_metrics(baseline["results"]).keys())
+        print(f"{compared} metrics compared against {args.baseline}, {len(regressions)} regressions "
+              f"(threshold {args.threshold:.0%})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, NamedTuple, Optional, Tuple
+
+from metrics import Counter
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+
+class Permit(NamedTuple):
+    """An admitted call: the state and generation of the breaker when allow() let it through."""
+    state: str
+    generation: int
+
+
+class CircuitBreaker:
+    """Stop calling a dependency that keeps failing or answering too slowly.
+
+    closed:    calls go through; the outcomes of the last ``window_size`` calls
+               are kept. Once at least ``min_calls`` are recorded and the share
+               of failures reaches ``failure_rate`` (or the share of calls
+               slower than ``slow_call_seconds`` reaches ``slow_call_rate``)
+               the circuit trips.
+    open:      calls are rejected for ``open_seconds``.
+    half_open: up to ``half_open_calls`` probe calls go through. If they all
+               succeed quickly the circuit closes again, the first bad probe
+               reopens it.
+
+    Every state change starts a new generation. An outcome only counts
+    towards the generation its call was admitted in, so a slow call let
+    through while closed can't act as a half-open probe.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window_size: int = 20, min_calls: int = 5, failure_rate: float = 0.5,
+                 slow_call_seconds: float = 15.0, slow_call_rate: float = 0.8, open_seconds: float = 30.0,
+                 half_open_calls: int = 2):
+        """Initialize a closed breaker.
+
+        Args:
+            window_size: Number of recent calls the rates are computed over
+            min_calls: Calls needed in the window before the breaker may trip
+            failure_rate: Share of failed calls that trips the breaker
+            slow_call_seconds: Calls taking longer than this count as slow
+            slow_call_rate: Share of slow calls that trips the breaker
+            open_seconds: How long to reject calls before probing again
+            half_open_calls: Successful probes needed to close the circuit
+        """
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._generation = 0
+        self._window: Deque[Tuple[bool, bool]] = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+        self.trips = Counter()
+        self.rejected = Counter()
+
+    @classmethod
+    def from_env(cls, prefix: str = "UPSTREAM_BREAKER") -> "CircuitBreaker":
+        """Build a breaker tuned by <prefix>_WINDOW, _MIN_CALLS, _FAILURE_RATE, _SLOW_SECONDS,
+        _SLOW_RATE, _OPEN_SECONDS and _HALF_OPEN_CALLS."""
+        return cls(
+            window_size=int(os.environ.get(f"{prefix}_WINDOW", 20)),
+            min_calls=int(os.environ.get(f"{prefix}_MIN_CALLS", 5)),
+            failure_rate=float(os.environ.get(f"{prefix}_FAILURE_RATE", 0.5)),
+            slow_call_seconds=float(os.environ.get(f"{prefix}_SLOW_SECONDS", 15)),
+            slow_call_rate=float(os.environ.get(f"{prefix}_SLOW_RATE", 0.8)),
+            open_seconds=float(os.environ.get(f"{prefix}_OPEN_SECONDS", 30)),
+            half_open_calls=int(os.environ.get(f"{prefix}_HALF_OPEN_CALLS", 2)),
+        )
+
+    def _update_state(self) -> None:
+        # Caller holds the lock. Open circuits move to half-open lazily.
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._set_state(self.HALF_OPEN)
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+        self._generation += 1
+
+    def _trip(self) -> None:
+        self._set_state(self.OPEN)
+        self._opened_at = time.monotonic()
+        self._window.clear()
+        self.trips.inc()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._update_state()
+            return self._state
+
+    def allow(self) -> Optional[Permit]:
+        """Admit a call if the circuit lets it through now.
+
+        Every admitted call must be followed by record() or, if it never
+        completed, release(), passing the returned permit.
+
+        Returns:
+            A Permit (truthy), or None if the call is rejected
+        """
+        with self._lock:
+            self._update_state()
+            if self._state == self.CLOSED:
+                return Permit(self._state, self._generation)
+            if self._state == self.HALF_OPEN and self._probes_in_flight + self._probe_successes < self.half_open_calls:
+                self._probes_in_flight += 1
+                return Permit(self._state, self._generation)
+        self.rejected.inc()
+        return None
+
+    def record(self, success: bool, seconds: float, permit: Optional[Permit] = None) -> None:
+        """Record the outcome of an admitted call.
+
+        Args:
+            success: Whether the dependency answered properly
+            seconds: How long the call took
+            permit: What allow() returned for the call (None counts it towards the current state)
+        """
+        slow = seconds > self.slow_call_seconds
+        with self._lock:
+            self._update_state()
+            if permit is not None and permit.generation != self._generation:
+                # Admitted before the last state change: a closed-state call finishing
+                # during half-open is no probe, and an old probe's slot was already reset
+                return
+            if self._state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if not success or slow:
+                    self._trip()
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_calls:
+                    self._set_state(self.CLOSED)
+                return
+            if self._state == self.OPEN:
+                # A call that started before the circuit opened
+                return
+
+            self._window.append((not success, slow))
+            calls = len(self._window)
+            if calls < self.min_calls:
+                return
+            failures = sum(failed for failed, _ in self._window)
+            slow_calls = sum(was_slow for _, was_slow in self._window)
+            if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+                self._trip()
+
+    def release(self, permit: Optional[Permit] = None) -> None:
+        """Give back an admitted call that ended without an outcome (e.g. cancelled)."""
+        with self._lock:
+            self._update_state()
+            if permit is not None and permit.generation != self._generation:
+                return
+            if self._state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current state, recent failure and slow-call rates, trip and rejection counts."""
+        with self._lock:
+            self._update_state()
+            window = list(self._window)
+            state = self._state
+            retry_in = max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)) if state == self.OPEN else 0.0
+        calls = len(window)
+        return {
+            "state": state,
+            "trips": self.trips.value,
+            "rejected": self.rejected.value,
+            "window_calls": calls,
+            "failure_rate": round(sum(f for f, _ in window) / calls, 3) if calls else 0.0,
+            "slow_call_rate": round(sum(s for _, s in window) / calls, 3) if calls else 0.0,
+            "retry_in_s": round(retry_in, 1),
+        }
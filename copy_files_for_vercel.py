@@ -1,7 +1,15 @@
+import argparse
+import filecmp
 import os
 import shutil
 import sys
 
+# Modules api/index.py imports. Their copies in api/ are committed so a plain
+# git checkout (and a git-based Vercel deploy) works; check_copies() catches drift.
+MODULE_COPIES = [
+    ('heuristics.py', 'api/heuristics.py'),
+]
+
 def create_dir_if_not_exists(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
@@ -14,20 +22,24 @@ def copy_file(src, dst):
     else:
         print(f"Source file not found: {src}")
 
+def check_copies():
+    """Return the committed module copies that differ from their source."""
+    return [dst for src, dst in MODULE_COPIES if not os.path.exists(dst) or not filecmp.cmp(src, dst, shallow=False)]
+
 def main():
     # Create necessary directories
     create_dir_if_not_exists('api/templates')
     create_dir_if_not_exists('api/static')
     
-    # Copy files to api directory
+    # Copy files to api directory. api/index.py only scores with the heuristics, so the
+    # upstream client (gemma_scorer.py and the modules it imports) is not deployed.
     files_to_copy = [
-        ('gemma_scorer.py', 'api/gemma_scorer.py'),
         ('model.h5', 'api/model.h5'),
         ('tokenizer.pickle', 'api/tokenizer.pickle'),
         ('word2vec.magnitude', 'api/word2vec.magnitude'),
     ]
     
-    for src, dst in files_to_copy:
+    for src, dst in MODULE_COPIES + files_to_copy:
         copy_file(src, dst)
     
     # Copy template files
@@ -48,4 +60,13 @@ def main():
     print("Make sure to set the OPENROUTER_API_KEY environment variable in your Vercel project settings.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy the files the Vercel API needs into api/.")
+    parser.add_argument("--check", action="store_true",
+                        help="only verify that the committed module copies match their sources")
+    args = parser.parse_args()
+    if args.check:
+        stale = check_copies()
+        for dst in stale:
+            print(f"Out of date: {dst} (run python copy_files_for_vercel.py)")
+        sys.exit(1 if stale else 0)
     main() 
\ No newline at end of file
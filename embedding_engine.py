@@ -0,0 +1,117 @@
+import weakref
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+
+class EmbeddingEngine:
+    """Batched mean-of-word-vectors lookup over a fixed embedding matrix.
+
+    The word -> row index is built once. A batch of tokenized essays is mapped
+    to integer ids and all essay means are computed with a single sparse
+    matrix product, so the cost no longer grows with a Python loop over
+    every word of every essay.
+
+    The matrix may be stored in reduced precision (see quantize_embeddings.py):
+    only the rows a batch touches are converted back to float32.
+    """
+
+    def __init__(self, vectors: np.ndarray, index_to_key: Sequence[str],
+                 key_to_index: Optional[Dict[str, int]] = None, scales: Optional[np.ndarray] = None):
+        """Initialize the engine.
+
+        Args:
+            vectors: Embedding matrix of shape (vocab_size, num_features), float32, float16 or int8
+            index_to_key: Word for each row of the matrix
+            key_to_index: Optional precomputed word -> row mapping
+            scales: Per-row scales of shape (vocab_size,) for an int8 matrix; row i is vectors[i] * scales[i]
+        """
+        if scales is None and np.issubdtype(vectors.dtype, np.integer):
+            raise ValueError(f"An {vectors.dtype} embedding matrix needs per-row scales")
+        self.vectors = vectors
+        self.scales = scales
+        self.index_to_key = index_to_key
+        self.key_to_index = key_to_index if key_to_index is not None else {
+            word: i for i, word in enumerate(index_to_key)
+        }
+        self.num_features = vectors.shape[1]
+
+    @classmethod
+    def from_keyed_vectors(cls, model) -> "EmbeddingEngine":
+        """Build an engine from a gensim KeyedVectors (or compatible) object."""
+        return cls(model.vectors, model.index_to_key, getattr(model, "key_to_index", None),
+                   getattr(model, "scales", None))
+
+    def encode(self, essays: Iterable[List[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Map a batch of tokenized essays to row ids.
+
+        Out-of-vocabulary words are dropped, exactly like makeVec did.
+
+        Args:
+            essays: Iterable of token lists
+
+        Returns:
+            Tuple of (ids, lengths): the concatenated row ids of all essays and
+            the number of in-vocabulary words per essay
+        """
+        lookup = self.key_to_index.get
+        ids: List[int] = []
+        lengths: List[int] = []
+        for words in essays:
+            before = len(ids)
+            ids.extend(i for i in map(lookup, words) if i is not None)
+            lengths.append(len(ids) - before)
+        return np.asarray(ids, dtype=np.int64), np.asarray(lengths, dtype=np.int64)
+
+    def _rows(self, ids: np.ndarray) -> np.ndarray:
+        """Return the float32 embedding rows for the given (sorted, unique) ids."""
+        rows = np.asarray(self.vectors[ids], dtype=np.float32)
+        if self.scales is not None:
+            rows *= np.asarray(self.scales[ids], dtype=np.float32)[:, None]
+        return rows
+
+    def mean_vectors(self, essays: Iterable[List[str]]) -> np.ndarray:
+        """Average the word vectors of every essay in a batch.
+
+        Essays without any in-vocabulary word get an all-zero vector instead
+        of the NaNs the old division by zero produced.
+
+        Args:
+            essays: Iterable of token lists
+
+        Returns:
+            Array of shape (len(essays), num_features), dtype float32
+        """
+        ids, lengths = self.encode(essays)
+        out = np.zeros((len(lengths), self.num_features), dtype=np.float32)
+        if ids.size == 0:
+            return out
+
+        # Only gather the distinct rows this batch touches
+        unique_ids, columns = np.unique(ids, return_inverse=True)
+        indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        counts = sparse.csr_matrix(
+            (np.ones(ids.size, dtype=np.float32), columns, indptr),
+            shape=(len(lengths), unique_ids.size),
+        )
+        sums = counts @ self._rows(unique_ids)
+
+        nonempty = lengths > 0
+        out[nonempty] = sums[nonempty] / lengths[nonempty, None].astype(np.float32)
+        return out
+
+
+_engines: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def engine_for(model) -> EmbeddingEngine:
+    """Return a cached EmbeddingEngine for a KeyedVectors-like model."""
+    if isinstance(model, EmbeddingEngine):
+        return model
+    engine = _engines.get(model)
+    if engine is None:
+        engine = EmbeddingEngine.from_keyed_vectors(model)
+        _engines[model] = engine
+    return engine
@@ -0,0 +1,145 @@
+import threading
+from typing import Container, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from spell_lexicon import SpellLexicon
+from text_pipeline import EssayTokenizer, split_contractions
+
+# Column order of Processed_data.csv, which the saved SVR/RF models read by position.
+# The notebook used to label columns 7 and 8 "adj_count" and "verb_count" although
+# count_pos returned the verb count first; the names here say what the columns hold.
+COUNT_COLUMNS = ("char_count", "word_count", "sent_count", "avg_word_len")
+SPELL_COLUMN = "spell_err_count"
+POS_COLUMNS = ("noun_count", "verb_count", "adj_count", "adv_count")
+
+# First letter of a Penn Treebank tag -> POS column, as count_pos grouped them
+_POS_PREFIXES = {"N": 0, "V": 1, "J": 2, "R": 3}
+_DIGITS = str.maketrans("", "", "0123456789")
+
+
+def _load_tagger():
+    from nltk.tag import PerceptronTagger
+
+    return PerceptronTagger()
+
+
+class FeatureExtractor:
+    """The handcrafted features of Essay_Scoring_1.ipynb, computed in one pass.
+
+    Each essay is sentence-split and word-tokenized once; the counts, the
+    spelling errors and the POS counts all come from that token stream, and
+    every sentence of a batch is tagged by one PerceptronTagger instead of
+    nltk.pos_tag loading it per sentence. The result is a float matrix whose
+    columns are named by ``columns``, so training (the notebook) and serving
+    (app.py's /features) compute exactly the same numbers.
+
+    The tagger is loaded on first use and the extractor holds no per-call
+    state, so one instance can be shared by all request threads.
+    """
+
+    def __init__(self, tokenizer: Optional[EssayTokenizer] = None, vocabulary: Optional[Container[str]] = None,
+                 pos: bool = True, split_contractions: bool = True):
+        """Initialize the extractor.
+
+        Args:
+            tokenizer: Tokenizer to use (defaults to the notebook's: letters and digits, stopwords kept)
+            vocabulary: Known lowercase words, ideally a SpellLexicon (looked up once per batch); adds
+                spell_err_count, the number of words not in it
+            pos: Whether to POS-tag the essays (the slowest step) and add the POS counts
+            split_contractions: Count and tag "cannot", "gonna" etc. as two words, as the notebook's
+                nltk.word_tokenize did; the spelling check still sees them whole, like check_spell_error
+        """
+        self.tokenizer = tokenizer or EssayTokenizer(stop_words=None, pattern=r"[A-Za-z0-9]+")
+        self.vocabulary = vocabulary
+        self.pos = pos
+        self.split_contractions = split_contractions
+        self.columns: Tuple[str, ...] = (COUNT_COLUMNS + ((SPELL_COLUMN,) if vocabulary is not None else ())
+                                         + (POS_COLUMNS if pos else ()))
+        self._tagger = None
+        self._tagger_lock = threading.Lock()
+
+    def _tag_sents(self, sentences: List[List[str]]) -> List[List[Tuple[str, str]]]:
+        if self._tagger is None:
+            with self._tagger_lock:
+                if self._tagger is None:
+                    self._tagger = _load_tagger()
+        return self._tagger.tag_sents(sentences)
+
+    def _spelling_words(self, words: Iterable[str]) -> List[str]:
+        # Lowercase and without digits, like check_spell_error
+        return [w for w in (word.lower().translate(_DIGITS) for word in words) if w]
+
+    def spelling_errors(self, words: Iterable[str]) -> int:
+        """Words that are not in the vocabulary."""
+        words = self._spelling_words(words)
+        if isinstance(self.vocabulary, SpellLexicon):
+            return self.vocabulary.count_unknown(words)
+        vocabulary = self.vocabulary
+        return sum(1 for word in words if word not in vocabulary)
+
+    def transform(self, essays: Sequence[str]) -> np.ndarray:
+        """Compute the features of a batch of essays.
+
+        Args:
+            essays: Essay texts
+
+        Returns:
+            Array of shape (len(essays), len(columns)), dtype float64
+        """
+        out = np.zeros((len(essays), len(self.columns)), dtype=np.float64)
+        tokenized = self.tokenizer.tokenize_many(essays, by_sentence=True)
+        counted = ([[split_contractions(sentence) for sentence in sentences] for sentences in tokenized]
+                   if self.split_contractions else tokenized)
+        lexicon = self.vocabulary if isinstance(self.vocabulary, SpellLexicon) else None
+        spelling_rows: List[int] = []
+        spelling_words: List[str] = []
+        for row, (sentences, split) in enumerate(zip(tokenized, counted)):
+            counted_words = [word for sentence in split for word in sentence]
+            chars = sum(map(len, counted_words))
+            out[row, :4] = chars, len(counted_words), len(split), chars / len(counted_words) if counted_words else 0.0
+            words = [word for sentence in sentences for word in sentence]
+            if lexicon is not None:
+                checked = self._spelling_words(words)
+                spelling_words.extend(checked)
+                spelling_rows.extend([row] * len(checked))
+            elif self.vocabulary is not None:
+                out[row, 4] = self.spelling_errors(words)
+        if spelling_words:
+            # One lookup for every word of the batch
+            unknown = ~lexicon.contains(spelling_words)
+            out[:, 4] = np.bincount(np.asarray(spelling_rows), weights=unknown, minlength=len(essays))
+
+        if self.pos:
+            # One tagging call for every sentence of the batch
+            flat = [sentence for sentences in counted for sentence in sentences]
+            tagged = iter(self._tag_sents(flat))
+            first = len(self.columns) - len(POS_COLUMNS)
+            for row, sentences in enumerate(counted):
+                counts = [0, 0, 0, 0]
+                for _ in range(len(sentences)):
+                    for _, tag in next(tagged):
+                        column = _POS_PREFIXES.get(tag[:1])
+                        if column is not None:
+                            counts[column] += 1
+                out[row, first:] = counts
+        return out
+
+    def extract(self, essay: str) -> Dict[str, float]:
+        """Features of one essay, keyed by column name."""
+        return dict(zip(self.columns, self.transform([essay])[0].tolist()))
+
+
+_default: Optional[FeatureExtractor] = None
+_default_lock = threading.Lock()
+
+
+def default_extractor() -> FeatureExtractor:
+    """The process-wide extractor with the notebook's settings; spell_err_count is included when the lexicon
+    at SPELL_LEXICON has been built."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = FeatureExtractor(vocabulary=SpellLexicon.from_env())
+    return _default
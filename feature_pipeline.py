@@ -0,0 +1,236 @@
+"""Build the handcrafted-feature store of Essay_Scoring_1.ipynb as Parquet.
+
+    python feature_pipeline.py Dataset/training_set_rel3.tsv features.parquet --lexicon spell_lexicon
+
+The essays are read in chunks and scored across a process pool. Every
+essay's features are cached in SQLite under a hash of its text and of the
+extractor settings, so a re-run only computes new or edited essays.
+"""
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from feature_extractor import FeatureExtractor
+from logs import configure_logging, get_logger
+from spell_lexicon import SpellLexicon, lexicon_exists
+
+log = get_logger(__name__)
+
+# Bump when the features of an unchanged essay would come out differently
+FEATURE_VERSION = 2
+
+# Score range of each essay_set (1-8) from the ASAP rubrics; final_score maps it onto 0-10
+MIN_SCORES = np.array([2, 1, 0, 0, 0, 0, 0, 0])
+MAX_SCORES = np.array([12, 6, 3, 3, 4, 4, 30, 60])
+
+INPUT_COLUMNS = ["essay_id", "essay_set", "essay", "domain1_score"]
+
+_NON_LETTERS_RE = re.compile("[^A-Za-z ]")
+
+
+def normalize_scores(essay_set: Sequence[int], scores: Sequence[float]) -> np.ndarray:
+    """Map domain1_score onto 0-10 with each essay_set's range (the notebook's normalize, vectorized).
+
+    Rounds half to even like Python's round().
+    """
+    index = np.asarray(essay_set, dtype=np.int64) - 1
+    low, high = MIN_SCORES[index], MAX_SCORES[index]
+    return np.round((np.asarray(scores, dtype=np.float64) - low) / (high - low) * 10).astype(np.int64)
+
+
+def strip_anonymized(essay: str) -> str:
+    """Drop the dataset's @PERSON1-style placeholders (the notebook's clean_essay)."""
+    return " ".join(word for word in essay.split() if not word.startswith("@"))
+
+
+class FeatureCache:
+    """SQLite cache of per-essay features, keyed by a content hash."""
+
+    def __init__(self, db_path: str):
+        self._db = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS features (key TEXT PRIMARY KEY, clean_essay TEXT NOT NULL, "
+                         "features BLOB NOT NULL, created REAL NOT NULL)")
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Tuple[str, np.ndarray]]:
+        found: Dict[str, Tuple[str, np.ndarray]] = {}
+        unique = list(dict.fromkeys(keys))
+        # Stay below SQLite's limit on bound parameters
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            rows = self._db.execute(f"SELECT key, clean_essay, features FROM features WHERE key IN "
+                                    f"({', '.join('?' * len(batch))})", batch)
+            for key, clean_essay, blob in rows:
+                found[key] = (clean_essay, np.frombuffer(blob, dtype=np.float64))
+        return found
+
+    def put_many(self, entries: Dict[str, Tuple[str, np.ndarray]]) -> None:
+        now = time.time()
+        self._db.execute("BEGIN")
+        self._db.executemany("INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?)",
+                             [(key, clean_essay, np.ascontiguousarray(values, dtype=np.float64).tobytes(), now)
+                              for key, (clean_essay, values) in entries.items()])
+        self._db.execute("COMMIT")
+
+    def close(self) -> None:
+        self._db.close()
+
+
+# Per-process state of the pool workers, built once by _init_worker
+_worker: Dict[str, object] = {}
+
+
+def _build_extractor(lexicon_prefix: Optional[str], pos: bool) -> FeatureExtractor:
+    lexicon = SpellLexicon.load(lexicon_prefix) if lexicon_prefix else None
+    return FeatureExtractor(vocabulary=lexicon, pos=pos)
+
+
+def _init_worker(lexicon_prefix: Optional[str], pos: bool) -> None:
+    from nltk.corpus import stopwords
+
+    _worker["extractor"] = _build_extractor(lexicon_prefix, pos)
+    _worker["stop_words"] = frozenset(stopwords.words("english"))
+
+
+def _clean_text(essay: str, stop_words: frozenset) -> str:
+    """The notebook's clean_essay column: stopwords removed after word_tokenize, then everything but letters."""
+    from nltk.tokenize import word_tokenize
+
+    return _NON_LETTERS_RE.sub("", " ".join(word for word in word_tokenize(essay) if word not in stop_words))
+
+
+def _compute(essays: List[str]) -> Tuple[List[str], np.ndarray]:
+    """Clean texts and feature rows of a batch of essays (runs in a pool worker)."""
+    extractor: FeatureExtractor = _worker["extractor"]
+    cleaned = [strip_anonymized(essay) for essay in essays]
+    return [_clean_text(essay, _worker["stop_words"]) for essay in cleaned], extractor.transform(cleaned)
+
+
+def _read_chunks(path: str, chunk_size: int) -> Iterator["pd.DataFrame"]:
+    import pandas as pd
+
+    yield from pd.read_csv(path, sep="\t", encoding="ISO-8859-1", usecols=INPUT_COLUMNS, chunksize=chunk_size)
+
+
+def _schema(columns: Sequence[str]):
+    import pyarrow as pa
+
+    # The first five columns of Processed_data.csv, then the features in FeatureExtractor order
+    fields = [("essay_id", pa.int32()), ("essay_set", pa.int8()), ("essay", pa.string()),
+              ("final_score", pa.int8()), ("clean_essay", pa.string())]
+    fields += [(name, pa.float64() if name == "avg_word_len" else pa.int32()) for name in columns]
+    return pa.schema(fields)
+
+
+def build_feature_store(data_path: str, output_path: str, cache_path: Optional[str] = "feature_cache.sqlite3",
+                        lexicon_prefix: Optional[str] = None, workers: Optional[int] = None,
+                        chunk_size: int = 2000, batch_size: int = 64, pos: bool = True) -> Dict[str, float]:
+    """Compute the features of every essay in a TSV and write them to a Parquet file.
+
+    Args:
+        data_path: training_set_rel3.tsv, or another TSV with essay_id, essay_set, essay and domain1_score
+        output_path: Parquet file to write (replaced atomically)
+        cache_path: SQLite file caching per-essay results (None recomputes everything)
+        lexicon_prefix: Spelling lexicon for spell_err_count (see spell_lexicon.py; None leaves the column out)
+        workers: Processes computing features (defaults to the CPU count)
+        chunk_size: Rows read from the TSV at a time
+        batch_size: Essays sent to a worker at a time
+        pos: Whether to include the POS counts
+
+    Returns:
+        Counts of essays read, taken from the cache and computed, and the seconds taken
+    """
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    started = time.perf_counter()
+    if lexicon_prefix and not lexicon_exists(lexicon_prefix):
+        raise FileNotFoundError(f"No spelling lexicon at {lexicon_prefix}; build it with spell_lexicon.py")
+    extractor = _build_extractor(lexicon_prefix, pos)
+    columns = extractor.columns
+    # A rebuilt lexicon invalidates every cached spelling count
+    lexicon_id = (hashlib.sha256(np.asarray(extractor.vocabulary.words).tobytes()).hexdigest()[:16]
+                  if lexicon_prefix else "none")
+    settings = f"v{FEATURE_VERSION}|{','.join(columns)}|{lexicon_id}"
+    schema = _schema(columns)
+
+    cache = FeatureCache(cache_path) if cache_path else None
+    pool: Optional[ProcessPoolExecutor] = None
+    stats = {"essays": 0, "cached": 0, "computed": 0}
+    tmp_path = output_path + ".tmp"
+    try:
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            for chunk in _read_chunks(data_path, chunk_size):
+                essays = chunk["essay"].astype(str).tolist()
+                keys = [hashlib.sha256(f"{settings}\0{essay}".encode("utf-8")).hexdigest() for essay in essays]
+                results = cache.get_many(keys) if cache else {}
+                stats["cached"] += sum(1 for key in keys if key in results)
+                missing = list(dict.fromkeys(key for key in keys if key not in results))
+                if missing:
+                    if pool is None:
+                        # Started on first use, so a fully cached run never spawns workers
+                        pool = ProcessPoolExecutor(workers or os.cpu_count(), initializer=_init_worker,
+                                                   initargs=(lexicon_prefix, pos))
+                    text_of = dict(zip(keys, essays))
+                    batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+                    computed = {}
+                    for batch, (cleaned, matrix) in zip(batches, pool.map(_compute, [[text_of[k] for k in b]
+                                                                                     for b in batches])):
+                        computed.update({key: (clean, row) for key, clean, row in zip(batch, cleaned, matrix)})
+                    if cache:
+                        cache.put_many(computed)
+                    results.update(computed)
+                    stats["computed"] += len(missing)
+                stats["essays"] += len(essays)
+
+                features = np.vstack([results[key][1] for key in keys]) if keys else np.empty((0, len(columns)))
+                frame = pd.DataFrame({
+                    "essay_id": chunk["essay_id"].to_numpy(),
+                    "essay_set": chunk["essay_set"].to_numpy(),
+                    # Placeholders stripped, like Processed_data.csv's essay column
+                    "essay": [strip_anonymized(essay) for essay in essays],
+                    "final_score": normalize_scores(chunk["essay_set"], chunk["domain1_score"]),
+                    "clean_essay": [results[key][0] for key in keys],
+                })
+                for index, name in enumerate(columns):
+                    frame[name] = features[:, index] if name == "avg_word_len" else features[:, index].astype(np.int32)
+                writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+                log.info("%d essays done (%d computed)", stats["essays"], stats["computed"])
+        os.replace(tmp_path, output_path)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if cache:
+            cache.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute the handcrafted essay features into a Parquet feature store.")
+    parser.add_argument("data", nargs="?", default="Dataset/training_set_rel3.tsv", help="essay TSV")
+    parser.add_argument("output", nargs="?", default="features.parquet", help="Parquet file to write")
+    parser.add_argument("--cache", default="feature_cache.sqlite3", help="per-essay result cache ('' disables it)")
+    parser.add_argument("--lexicon", default="spell_lexicon",
+                        help="spelling lexicon prefix for spell_err_count ('' leaves the column out)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="TSV rows read at a time")
+    parser.add_argument("--batch-size", type=int, default=64, help="essays per worker task")
+    parser.add_argument("--no-pos", action="store_true", help="skip POS tagging and the POS count columns")
+    args = parser.parse_args()
+
+    configure_logging()
+    stats = build_feature_store(args.data, args.output, args.cache or None, args.lexicon or None, args.workers,
+                                args.chunk_size, args.batch_size, not args.no_pos)
+    print(f"Wrote {stats['essays']} essays to {args.output} in {stats['seconds']}s "
+          f"({stats['cached']} from the cache, {stats['computed']} computed)")
@@ -1,73 +1,182 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 from flask_cors import CORS
 import os
 import json
 import sys
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from circuit_breaker import CircuitBreaker
+from heuristics import score_essay as heuristic_score
+from job_queue import JobQueue
+from logs import SAMPLED, configure_logging, get_logger
+from metrics import REGISTRY, Counter, instrument_app, timer
+from profiling import RequestProfiler
+from rate_limiter import PRIORITY_NAMES, UpstreamScheduler
+from score_cache import ScoreCache
+
+configure_logging()
+log = get_logger(__name__)
 
 # We need to handle the import error for gemma_scorer if the dependencies are not installed
 try:
     from gemma_scorer import GemmaEssayScorer
     have_gemma_scorer = True
 except ImportError:
-    print("Could not import GemmaEssayScorer - will use simplified scoring")
+    log.warning("Could not import GemmaEssayScorer - will use simplified scoring")
     have_gemma_scorer = False
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+instrument_app(app)  # Request timings, counters and the /metrics endpoint
+# Opt-in cProfile/tracemalloc profiling of sampled or admin-requested requests (off unless configured)
+profiler = RequestProfiler.from_env().install(app)
 
 # Define a simple scorer function to use if gemma_scorer is not available
 def simple_score_essay(essay_text):
-    word_count = len(essay_text.split())
-    sentences = [s.strip() for s in essay_text.split('.') if s.strip()]
-    sentence_count = len(sentences)
-    
-    # Simple scoring logic
-    coherence_score = min(10, max(1, 5 + (1 if word_count > 200 else 0)))
-    grammar_score = min(10, max(1, 5 + (1 if sentence_count > 10 else 0)))
-    content_score = min(10, max(1, word_count // 50))
-    evidence_score = min(10, max(1, word_count // 75))
-    
-    overall_score = round((coherence_score + grammar_score + content_score + evidence_score) / 4)
-    
-    return {
-        "coherence_score": coherence_score,
-        "grammar_score": grammar_score,
-        "content_score": content_score,
-        "evidence_score": evidence_score,
-        "overall_score": overall_score,
-        "scoring_method": "basic",
-        "feedback": {
-            "coherence": f"Your essay has approximately {sentence_count} sentences. Consider focusing on logical structure and flow.",
-            "grammar": "The essay might benefit from a review for grammar and punctuation.",
-            "content": f"Your essay contains {word_count} words. Consider adding more detailed arguments for a higher score.",
-            "evidence": "Try to include specific examples and references to support your points."
-        },
-        "summary": f"This {word_count}-word essay demonstrates basic writing skills. Focus on improving organization and evidence for a better score."
-    }
+    with timer("fallback"):
+        return heuristic_score(essay_text, "basic")
 
 # Get API key from environment variable first, fallback to hardcoded key for local testing
 api_key = os.environ.get("OPENROUTER_API_KEY")
 if not api_key:
     # Fallback for local development only
     api_key = "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"
-    print("Warning: Using hardcoded API key. Set OPENROUTER_API_KEY environment variable for production.")
+    log.warning("Using hardcoded API key. Set OPENROUTER_API_KEY environment variable for production.")
+
+# Scores are cached by essay content so resubmissions don't cost another upstream call
+score_cache = ScoreCache.from_env()
+
+# Stop calling the upstream for a while when it keeps failing or stalling
+breaker = CircuitBreaker.from_env()
+
+# Keep upstream calls under the provider's rate limits; single essays go before batch work
+scheduler = UpstreamScheduler.from_env()
 
 # Initialize the scorer if available
 if have_gemma_scorer:
-    scorer = GemmaEssayScorer(api_key)
+    scorer = GemmaEssayScorer(api_key, cache=score_cache, breaker=breaker, scheduler=scheduler)
 else:
     scorer = None
 
+# Seconds /api/score waits for the upstream before answering offline (0 waits indefinitely)
+LATENCY_BUDGET = float(os.environ.get('SCORE_LATENCY_BUDGET', 20))
+budget_exceeded = Counter()
+# Batches turned away because their rate-limit wait would exceed BATCH_MAX_WAIT
+batch_rejected = Counter()
+
+# Results by scoring method ('advanced' from the API, 'basic' from the fallback)
+scored_advanced = REGISTRY.counter('scores', 'Essays scored, by method', method='advanced')
+scored_basic = REGISTRY.counter('scores', 'Essays scored, by method', method='basic')
+
+# Batch scoring: upper bound on essays per request and on upstream calls in flight per batch
+BATCH_MAX_ESSAYS = int(os.environ.get('BATCH_MAX_ESSAYS', 200))
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', 8))
+# Send several essays per upstream request in batches (override per request with ?packed=0/1)
+BATCH_PACKING = os.environ.get('BATCH_PACKING', '0') == '1'
+# Seconds of rate-limit wait a batch may queue for before it is refused (0 always queues it)
+BATCH_MAX_WAIT = float(os.environ.get('BATCH_MAX_WAIT', 0))
+
 @app.route('/')
 def home():
     """Serve the home page with the essay submission form."""
     return render_template('index.html')
 
+def score_online(essay_text):
+    """Score with the upstream, giving up after LATENCY_BUDGET seconds.
+
+    A call that runs over budget is not cancelled: it finishes on the scorer's
+    event loop and its result lands in the score cache, so resubmitting the
+    same essay is answered from there. A call the rate limiter could not even
+    start within the budget gives up right away instead.
+    """
+    if not LATENCY_BUDGET:
+        return scorer.score_essay(essay_text)
+    future = scorer.submit(essay_text, deadline=time.monotonic() + LATENCY_BUDGET)
+    try:
+        return future.result(timeout=LATENCY_BUDGET)
+    except FutureTimeoutError:
+        budget_exceeded.inc()
+        return {'error': f'Latency budget of {LATENCY_BUDGET:g}s exceeded'}
+
+def score_with_fallback(essay_text, online_result=None):
+    """Score one essay online, falling back to the offline scorer on any failure.
+
+    If the online result was already fetched (e.g. as part of a batch), pass it
+    as online_result to only apply the fallback and cleanup rules.
+    """
+    # If we don't have the required dependencies, use simple scoring
+    if not have_gemma_scorer:
+        log.info("Using simplified scoring due to missing dependencies", extra=SAMPLED)
+        scored_basic.inc()
+        return simple_score_essay(essay_text)
+    
+    # Otherwise try online scoring with API    
+    try:
+        log.debug("Processing essay with %d characters", len(essay_text))
+        if api_key:
+            result = online_result if online_result is not None else score_online(essay_text)
+            # Check if there was an API error
+            if "error" in result:
+                api_error = result['error']
+                log.info("API returned error, falling back to offline scoring: %s", api_error, extra=SAMPLED)
+                scored_basic.inc()
+                result = scorer.score_essay_offline(essay_text)
+                # For UI, we'll call this "basic model" instead of "offline"
+                result['scoring_method'] = 'basic'
+                # Store but don't expose the API error
+                result['_api_error'] = api_error
+                # Remove the 'error' key so it doesn't show in the UI
+                if 'error' in result:
+                    del result['error']
+            else:
+                scored_advanced.inc()
+                # Rename to hide the actual model
+                result['scoring_method'] = 'advanced'
+        else:
+            log.info("No API key available - using offline scoring", extra=SAMPLED)
+            scored_basic.inc()
+            # No API key, use offline scoring
+            result = scorer.score_essay_offline(essay_text)
+            result['scoring_method'] = 'basic'
+            
+        # Clean up any raw responses that might reveal the model
+        if 'raw_response' in result:
+            del result['raw_response']
+            
+        return result
+        
+    except Exception as e:
+        # If online scoring fails, fall back to offline
+        log.exception("Exception in scoring: %s", e)
+        scored_basic.inc()
+        
+        # If offline scoring is available, use it
+        if hasattr(scorer, 'score_essay_offline'):
+            result = scorer.score_essay_offline(essay_text)
+        else:
+            # Otherwise use our simple scorer
+            result = simple_score_essay(essay_text)
+            
+        result['scoring_method'] = 'basic'
+        # Store but don't expose the API error
+        result['_api_error'] = str(e)
+        return result
+
+def validate_essay_text(essay_text):
+    """Return an (error, message) pair if the essay can't be scored, otherwise None."""
+    if not isinstance(essay_text, str) or not essay_text:
+        return 'Missing essay text', 'Please provide an essay in the "text" field.'
+    if len(essay_text) < 50:
+        return 'Essay too short', 'Please provide an essay with at least 50 characters.'
+    return None
+
 @app.route('/api/score', methods=['POST'])
 def score_essay():
     """API endpoint to score an essay."""
     try:
-        data = request.get_json()
+        with timer("request_parse"):
+            data = request.get_json()
         
         if not data or 'text' not in data:
             return jsonify({
@@ -83,73 +192,247 @@ def score_essay():
                 'message': 'Please provide an essay with at least 50 characters.'
             }), 400
             
-        # If we don't have the required dependencies, use simple scoring
-        if not have_gemma_scorer:
-            print("Using simplified scoring due to missing dependencies")
-            result = simple_score_essay(essay_text)
-            return jsonify(result), 200
-        
-        # Otherwise try online scoring with API    
-        try:
-            print(f"Processing essay with {len(essay_text)} characters")
-            if api_key:
-                print(f"Using API key: {api_key[:8]}...{api_key[-4:]}")
-                result = scorer.score_essay(essay_text)
-                # Check if there was an API error
-                if "error" in result:
-                    print(f"API returned error: {result['error']}")
-                    print("Falling back to offline scoring")
-                    result = scorer.score_essay_offline(essay_text)
-                    # For UI, we'll call this "basic model" instead of "offline"
-                    result['scoring_method'] = 'basic'
-                    # Store but don't expose the API error
-                    result['_api_error'] = result.get('error', 'Unknown API error')
-                    # Remove the 'error' key so it doesn't show in the UI
-                    if 'error' in result:
-                        del result['error']
-                else:
-                    print("Successful API scoring")
-                    # Rename to hide the actual model
-                    result['scoring_method'] = 'advanced'
-            else:
-                print("No API key available - using offline scoring")
-                # No API key, use offline scoring
-                result = scorer.score_essay_offline(essay_text)
-                result['scoring_method'] = 'basic'
-                
-            # Clean up any raw responses that might reveal the model
-            if 'raw_response' in result:
-                del result['raw_response']
-                
-            return jsonify(result), 200
-            
-        except Exception as e:
-            # If online scoring fails, fall back to offline
-            print(f"Exception in scoring: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            
-            # If offline scoring is available, use it
-            if hasattr(scorer, 'score_essay_offline'):
-                result = scorer.score_essay_offline(essay_text)
-            else:
-                # Otherwise use our simple scorer
-                result = simple_score_essay(essay_text)
-                
-            result['scoring_method'] = 'basic'
-            # Store but don't expose the API error
-            result['_api_error'] = str(e)
-            return jsonify(result), 200
+        result = score_with_fallback(essay_text)
+        return jsonify(result), 200
             
     except Exception as e:
-        print(f"Server error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Server error: %s", e)
         return jsonify({
             'error': 'Server error',
             'message': f'An unexpected error occurred: {str(e)}'
         }), 500
 
+def sse_event(event, data):
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/score/stream', methods=['POST'])
+def score_essay_stream():
+    """Score an essay progressively as Server-Sent Events.
+
+    Events, in order: "heuristic" with the offline score (immediately), one
+    "field" per score or feedback field of the model's answer as soon as it is
+    complete ({"path": [...], "value": ...}), and "result" with the final
+    result exactly as /api/score would return it.
+    """
+    with timer("request_parse"):
+        data = request.get_json(silent=True)
+    essay_text = data.get('text') if isinstance(data, dict) else None
+    invalid = validate_essay_text(essay_text)
+    if invalid:
+        return jsonify({'error': invalid[0], 'message': invalid[1]}), 400
+
+    def generate():
+        heuristic = scorer.score_essay_offline(essay_text) if have_gemma_scorer else simple_score_essay(essay_text)
+        heuristic['scoring_method'] = 'basic'
+        yield sse_event('heuristic', heuristic)
+
+        if not (have_gemma_scorer and api_key):
+            yield sse_event('result', heuristic)
+            return
+
+        online_result = None
+        try:
+            for event, payload in scorer.stream_essay(essay_text):
+                if event == 'result':
+                    online_result = payload
+                else:
+                    yield sse_event(event, payload)
+        except Exception as e:
+            log.warning("Streaming failed: %s", e)
+            online_result = {'error': str(e)}
+        yield sse_event('result', score_with_fallback(essay_text, online_result))
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+def parse_batch_items():
+    """Read the submitted essays from a JSON or NDJSON request body.
+
+    Accepts a JSON list, an object with an "essays" list, or one essay per
+    NDJSON line. Each essay is either a string or an object with "text" and
+    an optional "id". Returns a list of (essay, parse_error) pairs so a bad
+    NDJSON line only fails its own item.
+    """
+    if request.mimetype in NDJSON_MIMETYPES:
+        items = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append((json.loads(line), None))
+            except json.JSONDecodeError as e:
+                items.append((None, f'Invalid JSON line: {e}'))
+        return items
+    
+    data = request.get_json()
+    essays = data.get('essays') if isinstance(data, dict) else data
+    if not isinstance(essays, list):
+        raise ValueError('Expected a list of essays or an object with an "essays" list.')
+    return [(essay, None) for essay in essays]
+
+def prepare_batch_item(index, item, parse_error):
+    """Validate one element of a batch.
+
+    Returns (entry, essay_text); essay_text is None when the item is invalid,
+    in which case the error is already recorded on the entry.
+    """
+    entry = {'index': index}
+    essay_text = item
+    if isinstance(item, dict):
+        if item.get('id') is not None:
+            entry['id'] = item['id']
+        essay_text = item.get('text')
+    
+    if parse_error:
+        entry.update({'error': 'Invalid item', 'message': parse_error})
+        return entry, None
+    invalid = validate_essay_text(essay_text)
+    if invalid:
+        entry.update({'error': invalid[0], 'message': invalid[1]})
+        return entry, None
+    return entry, essay_text
+
+def score_texts(texts, packed=BATCH_PACKING):
+    """Score valid essays together, with the offline fallback applied per essay."""
+    # All upstream calls are in flight together on the scorer's event loop
+    online_results = [None] * len(texts)
+    if have_gemma_scorer and api_key and texts:
+        try:
+            if packed:
+                online_results = scorer.score_packed(texts, concurrency=BATCH_CONCURRENCY)
+            else:
+                online_results = scorer.score_many(texts, concurrency=BATCH_CONCURRENCY)
+        except Exception as e:
+            log.warning("Batch scoring failed: %s", e)
+            online_results = [{'error': str(e)} for _ in texts]
+    
+    results = []
+    for essay_text, online_result in zip(texts, online_results):
+        try:
+            results.append(score_with_fallback(essay_text, online_result))
+        except Exception as e:
+            results.append({'error': 'Scoring failed', 'message': str(e)})
+    return results
+
+@app.route('/api/score/batch', methods=['POST'])
+def score_essay_batch():
+    """Score a list of essays concurrently; results keep the input order."""
+    try:
+        with timer("request_parse"):
+            items = parse_batch_items()
+    except Exception as e:
+        return jsonify({
+            'error': 'Invalid batch',
+            'message': str(e)
+        }), 400
+    
+    if len(items) > BATCH_MAX_ESSAYS:
+        return jsonify({
+            'error': 'Batch too large',
+            'message': f'Please submit at most {BATCH_MAX_ESSAYS} essays per batch.'
+        }), 413
+    
+    prepared = [prepare_batch_item(i, item, parse_error) for i, (item, parse_error) in enumerate(items)]
+    texts = [essay_text for _, essay_text in prepared if essay_text is not None]
+    packed = request.args.get('packed', '1' if BATCH_PACKING else '0') == '1'
+    
+    # Batch calls queue in the scheduler's BATCH class; only refuse a batch whose rate-limit
+    # wait would exceed BATCH_MAX_WAIT (off by default), pointing it to /api/jobs instead
+    if BATCH_MAX_WAIT and have_gemma_scorer and api_key:
+        wait = scheduler.estimated_wait(scorer.upstream_requests(texts, packed))
+        if wait > BATCH_MAX_WAIT:
+            batch_rejected.inc()
+            return jsonify({
+                'error': 'Batch too slow',
+                'message': f'Scoring this batch would wait about {wait:.0f}s for the upstream rate limit, '
+                           f'more than the {BATCH_MAX_WAIT:g}s allowed. Submit it to /api/jobs instead.',
+                'estimated_wait_s': round(wait, 1),
+                'jobs_url': '/api/jobs',
+            }), 429
+    
+    results = []
+    scored = iter(score_texts(texts, packed))
+    for entry, essay_text in prepared:
+        if essay_text is not None:
+            entry.update(next(scored))
+        results.append(entry)
+    
+    return jsonify({
+        'results': results,
+        'count': len(results),
+        'failed': sum(1 for r in results if 'error' in r),
+        'fallback': sum(1 for r in results if r.get('scoring_method') == 'basic'),
+    }), 200
+
+# Bulk jobs: persisted in SQLite and drained in the background by this process's workers
+JOB_MAX_ESSAYS = int(os.environ.get('JOB_MAX_ESSAYS', 10000))
+jobs = JobQueue.from_env(score_texts).start()
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Queue a set of essays for background scoring; accepts the same body as /api/score/batch."""
+    try:
+        with timer("request_parse"):
+            items = parse_batch_items()
+    except Exception as e:
+        return jsonify({
+            'error': 'Invalid job',
+            'message': str(e)
+        }), 400
+    
+    if len(items) > JOB_MAX_ESSAYS:
+        return jsonify({
+            'error': 'Job too large',
+            'message': f'Please submit at most {JOB_MAX_ESSAYS} essays per job.'
+        }), 413
+    
+    prepared = [prepare_batch_item(i, item, parse_error) for i, (item, parse_error) in enumerate(items)]
+    job_id = jobs.submit(prepared)
+    status_url = f'/api/jobs/{job_id}'
+    return jsonify({'id': job_id, 'status_url': status_url, 'total': len(prepared)}), 202, {'Location': status_url}
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Report a job's progress, throughput, ETA and finished results (?offset=&limit= page the results)."""
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return jsonify({
+            'error': 'Invalid parameters',
+            'message': 'offset and limit must be integers.'
+        }), 400
+    
+    status = jobs.status(job_id, offset=max(0, offset), limit=max(0, limit))
+    if status is None:
+        return jsonify({
+            'error': 'Job not found',
+            'message': f'There is no job with ID {job_id}.'
+        }), 404
+    return jsonify(status), 200
+
+# Export the counters and histograms the components already keep
+REGISTRY.register('latency_budget_exceeded', budget_exceeded, 'Requests answered offline after the latency budget ran out')
+REGISTRY.register('batch_rejected', batch_rejected, 'Batches rejected because their rate limit wait would exceed BATCH_MAX_WAIT')
+REGISTRY.register('breaker_trips', breaker.trips, 'Times the upstream circuit breaker opened')
+REGISTRY.register('breaker_rejected', breaker.rejected, 'Upstream calls skipped by the open circuit breaker')
+REGISTRY.gauge('breaker_open', lambda: float(breaker.state != breaker.CLOSED), 'Whether the circuit breaker is open or half-open')
+REGISTRY.register('rate_limit_granted', scheduler.granted, 'Upstream attempts let through by the rate limiter')
+REGISTRY.register('rate_limit_expired', scheduler.expired, 'Upstream calls given up because the rate limit wait would miss the deadline')
+REGISTRY.register('rate_limit_throttled', scheduler.throttled, 'HTTP 429 responses from the upstream')
+for priority, name in PRIORITY_NAMES.items():
+    REGISTRY.register('rate_limit_queue_wait_ms', scheduler.queue_wait_ms[priority],
+                      'Time upstream attempts waited for the rate limiter', priority=name)
+for stat in ('memory_hits', 'disk_hits', 'misses', 'stores', 'evictions'):
+    REGISTRY.gauge('cache_' + stat, lambda stat=stat: score_cache.stats()[stat], f'Score cache {stat.replace("_", " ")}')
+if scorer is not None:
+    for stat in ('requests', 'retries', 'failures', 'in_flight'):
+        REGISTRY.gauge('upstream_' + stat, lambda stat=stat: scorer.pool_stats()[stat], f'Upstream {stat.replace("_", " ")}')
+REGISTRY.gauge('job_pending_essays', lambda: jobs.stats()['pending_essays'], 'Job essays waiting to be scored')
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
@@ -157,6 +440,13 @@ def health_check():
         'status': 'healthy',
         'api_connected': api_key is not None,
         'advanced_scoring': have_gemma_scorer,
+        'upstream_pool': scorer.pool_stats() if scorer else None,
+        'circuit_breaker': breaker.stats(),
+        'rate_limiter': scheduler.stats(),
+        'latency_budget': {'seconds': LATENCY_BUDGET, 'exceeded': budget_exceeded.value,
+                           'batch_max_wait_seconds': BATCH_MAX_WAIT, 'batches_rejected': batch_rejected.value},
+        'cache': score_cache.stats(),
+        'jobs': jobs.stats(),
         'version': '1.0.0'
     })
 
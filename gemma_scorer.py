@@ -1,39 +1,53 @@
 import os
-import requests
+import asyncio
+import queue
+import hashlib
+import random
+import threading
+import time
+import weakref
+import aiohttp
 import json
-from typing import Dict, Any, List, Optional
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, List, Optional, NamedTuple, Iterable, Iterator, Awaitable, Callable, Tuple
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from heuristics import score_essay as heuristic_score
+from json_stream import IncrementalJSONParser
+from logs import SAMPLED, get_logger
+from metrics import timer
+from rate_limiter import BATCH, INTERACTIVE, DeadlineExceededError, UpstreamScheduler
+from score_cache import ScoreCache
 
-class GemmaEssayScorer:
-    """Essay scoring system using Gemma 3's natural language understanding capabilities.
-    
-    This implementation uses the free OpenRouter API to access Google's Gemma 3 model.
-    """
+log = get_logger(__name__)
+
+# Upstream responses worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Failures to reach the upstream at all are retried; read timeouts are not,
+# the upstream already had its chance
+RETRY_EXCEPTIONS = (aiohttp.ClientConnectorError, aiohttp.ServerDisconnectedError) + (
+    (aiohttp.ConnectionTimeoutError,) if hasattr(aiohttp, "ConnectionTimeoutError") else ())
+
+# Errors that mean the upstream call failed and the caller should fall back
+UPSTREAM_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+class UpstreamResponse(NamedTuple):
+    """Final HTTP response from the chat-completions endpoint."""
+    status: int
+    headers: Dict[str, str]
+    text: str
+
+
+class _LoopClient:
+    """The shared HTTP session and concurrency cap for one event loop."""
     
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize the GemmaEssayScorer.
-        
-        Args:
-            api_key: OpenRouter API key (optional, will use environment variable if not provided)
-        """
-        self.api_key = api_key or os.environ.get("OPENROUTER_API_KEY")
-        if not self.api_key:
-            print("Warning: No API key provided. Please set OPENROUTER_API_KEY environment variable or provide a key.")
-        else:
-            print(f"API key configured: {self.api_key[:8]}...{self.api_key[-4:]}")
-            
-        self.api_url = "https://openrouter.ai/api/v1/chat/completions"
-        self.model = "google/gemma-3-27b-it"  # Using Gemma 3 model (fixed format)
-        
-    def _create_scoring_prompt(self, essay_text: str) -> List[Dict[str, Any]]:
-        """Create a well-structured prompt for essay scoring.
-        
-        Args:
-            essay_text: The essay text to be scored
-            
-        Returns:
-            List of message dictionaries for the API
-        """
-        system_prompt = """You are an expert essay grader with years of experience in evaluating student essays. 
+    def __init__(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore):
+        self.session = session
+        self.semaphore = semaphore
+
+SCORING_SYSTEM_PROMPT = """You are an expert essay grader with years of experience in evaluating student essays. 
 Your task is to grade the provided essay on a scale of 1-10 based on these criteria:
 
 1. Coherence and Organization (structure, flow, logical progression)
@@ -58,88 +72,710 @@ You MUST provide your response in valid JSON format with the EXACT following str
   "summary": "<brief overall assessment, 1-2 sentences>"
 }
 """
+
+SCORING_USER_TEMPLATE = "Please evaluate this essay according to the criteria and format specified in the system message:\n\n{essay_text}"
+
+# Changes whenever the prompt does, so cached scores from an older prompt are not reused
+PROMPT_VERSION = hashlib.sha256((SCORING_SYSTEM_PROMPT + SCORING_USER_TEMPLATE).encode("utf-8")).hexdigest()[:12]
+
+# Packed mode: several essays in one completion, answered as {"results": [...]}
+PACKED_SCORING_INSTRUCTIONS = """
+When you receive several essays, each one is wrapped in <essay id="..."></essay> tags. Grade every essay independently and respond with one JSON object that holds, for each essay in the order given, a result with the structure above plus the essay's id:
+
+{"results": [{"id": "<essay id>", "coherence_score": <number between 1 and 10>, ...}, ...]}
+"""
+PACKED_SYSTEM_PROMPT = SCORING_SYSTEM_PROMPT + PACKED_SCORING_INSTRUCTIONS
+PACKED_USER_TEMPLATE = "Please evaluate each of these {count} essays according to the criteria and format specified in the system message:\n\n{essays}"
+PACKED_ESSAY_TEMPLATE = '<essay id="{essay_id}">\n{essay_text}\n</essay>'
+PACKED_PROMPT_VERSION = hashlib.sha256((PACKED_SYSTEM_PROMPT + PACKED_USER_TEMPLATE + PACKED_ESSAY_TEMPLATE).encode("utf-8")).hexdigest()[:12]
+
+# Rough token accounting used to size packs
+CHARS_PER_TOKEN = 4
+RESULT_TOKENS = 350  # one result in the schema above, feedback included
+PACKED_ESSAY_OVERHEAD_TOKENS = 12  # the <essay> tags around each essay
+
+# Bump when the heuristics in score_essay_offline change
+OFFLINE_SCORER_VERSION = "heuristic-1"
+
+SCORE_FIELDS = ("coherence_score", "grammar_score", "content_score", "evidence_score", "overall_score")
+
+
+def validate_scores(score_data: Any) -> Optional[str]:
+    """Check a parsed model answer against the schema in SCORING_SYSTEM_PROMPT.
+    
+    Args:
+        score_data: The decoded JSON answer
         
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Please evaluate this essay according to the criteria and format specified in the system message:\n\n{essay_text}"}
-        ]
+    Returns:
+        A description of the first problem found, or None if the answer is usable
+    """
+    if not isinstance(score_data, dict):
+        return "answer is not a JSON object"
+    if "error" in score_data:
+        return f"model reported an error: {score_data['error']}"
+    for field in SCORE_FIELDS:
+        value = score_data.get(field)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return f"missing or non-numeric {field}"
+        if not 1 <= value <= 10:
+            return f"{field} out of range: {value}"
+    if not isinstance(score_data.get("feedback", {}), dict):
+        return "feedback is not an object"
+    return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate; good enough to size requests, not to bill them."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def plan_packs(token_counts: List[int], max_output_tokens: int, max_input_tokens: int,
+               max_pack_size: int) -> List[List[int]]:
+    """Group essays into packs that fit one completion each.
+    
+    K is bounded by how many results fit into max_output_tokens, by
+    max_pack_size, and by the input budget: consecutive essays are added to a
+    pack until the next one would overflow any of these.
+    
+    Args:
+        token_counts: Estimated tokens of each essay, in input order
+        max_output_tokens: max_tokens of a packed request
+        max_input_tokens: Prompt tokens allowed per packed request
+        max_pack_size: Upper bound for K
         
-        return messages
+    Returns:
+        Lists of indexes into token_counts; essays too long to share a request come back alone
+    """
+    per_request = max(1, min(max_pack_size, max_output_tokens // RESULT_TOKENS))
+    overhead = estimate_tokens(PACKED_SYSTEM_PROMPT + PACKED_USER_TEMPLATE)
+    packs: List[List[int]] = []
+    current: List[int] = []
+    used = overhead
+    for index, tokens in enumerate(token_counts):
+        tokens += PACKED_ESSAY_OVERHEAD_TOKENS
+        if current and (len(current) >= per_request or used + tokens > max_input_tokens):
+            packs.append(current)
+            current, used = [], overhead
+        current.append(index)
+        used += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+class GemmaEssayScorer:
+    """Essay scoring system using Gemma 3's natural language understanding capabilities.
     
-    def score_essay(self, essay_text: str) -> Dict[str, Any]:
-        """Score an essay using the Gemma 3 model.
+    This implementation uses the free OpenRouter API to access Google's Gemma 3 model.
+    """
+    
+    def __init__(self, api_key: Optional[str] = None, api_url: Optional[str] = None,
+                 connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None, pool_size: Optional[int] = None,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0,
+                 cache: Optional[ScoreCache] = None, max_concurrency: Optional[int] = None,
+                 breaker: Optional[CircuitBreaker] = None, pack_size: Optional[int] = None,
+                 pack_max_tokens: Optional[int] = None, pack_input_tokens: Optional[int] = None,
+                 scheduler: Optional[UpstreamScheduler] = None):
+        """Initialize the GemmaEssayScorer.
         
         Args:
-            essay_text: The essay text to be scored
-            
-        Returns:
-            Dictionary containing scores and feedback
+            api_key: OpenRouter API key (optional, will use environment variable if not provided)
+            api_url: Chat-completions endpoint (optional, defaults to OPENROUTER_API_URL or OpenRouter)
+            connect_timeout: Seconds to wait for a connection (default OPENROUTER_CONNECT_TIMEOUT or 5)
+            read_timeout: Seconds to wait for the response (default OPENROUTER_READ_TIMEOUT or 60)
+            max_retries: Retries for 429/5xx and connection errors (default OPENROUTER_MAX_RETRIES or 3)
+            pool_size: Maximum open keep-alive connections (default OPENROUTER_POOL_SIZE or 100)
+            backoff_base: First retry delay in seconds, doubled on every attempt
+            backoff_max: Upper bound for a single retry delay in seconds
+            cache: Optional ScoreCache consulted before every online and offline score
+            max_concurrency: Maximum upstream calls in flight per event loop (default OPENROUTER_MAX_CONCURRENCY or 100)
+            breaker: Optional CircuitBreaker that skips the upstream while it keeps failing or stalling
+            pack_size: Most essays per packed request (default OPENROUTER_PACK_SIZE or 8)
+            pack_max_tokens: max_tokens of a packed request (default OPENROUTER_PACK_MAX_TOKENS or 4000)
+            pack_input_tokens: Estimated prompt tokens allowed per packed request (default OPENROUTER_PACK_INPUT_TOKENS or 16000)
+            scheduler: Optional UpstreamScheduler that rate-limits and prioritizes upstream attempts
         """
+        self.api_key = api_key or os.environ.get("OPENROUTER_API_KEY")
         if not self.api_key:
-            print("Error: Missing API key")
-            return {
-                "error": "No API key provided",
-                "overall_score": 5,  # Default fallback score
-                "summary": "Unable to score essay: No API key provided"
-            }
+            log.warning("No API key provided. Please set OPENROUTER_API_KEY environment variable or provide a key.")
+        else:
+            log.info("API key configured")
             
-        messages = self._create_scoring_prompt(essay_text)
+        self.api_url = api_url or os.environ.get("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+        self.model = "google/gemma-3-27b-it"  # Using Gemma 3 model (fixed format)
+        self.temperature = 0.2  # Low temperature for more consistent scoring
+        self.cache = cache
+        self.breaker = breaker
+        self.scheduler = scheduler
         
-        headers = {
+        self.connect_timeout = connect_timeout if connect_timeout is not None else float(os.environ.get("OPENROUTER_CONNECT_TIMEOUT", 5))
+        self.read_timeout = read_timeout if read_timeout is not None else float(os.environ.get("OPENROUTER_READ_TIMEOUT", 60))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get("OPENROUTER_MAX_RETRIES", 3))
+        self.pool_size = pool_size if pool_size is not None else int(os.environ.get("OPENROUTER_POOL_SIZE", 100))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        
+        self.max_concurrency = max_concurrency if max_concurrency is not None else int(os.environ.get("OPENROUTER_MAX_CONCURRENCY", 100))
+        self.pack_size = pack_size if pack_size is not None else int(os.environ.get("OPENROUTER_PACK_SIZE", 8))
+        self.pack_max_tokens = pack_max_tokens if pack_max_tokens is not None else int(os.environ.get("OPENROUTER_PACK_MAX_TOKENS", 4000))
+        self.pack_input_tokens = pack_input_tokens if pack_input_tokens is not None else int(os.environ.get("OPENROUTER_PACK_INPUT_TOKENS", 16000))
+        self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "HTTP-Referer": "automatic-essay-scoring.example.com",  # Simplified domain
             "X-Title": "Automatic Essay Scoring"  # Your app's name
         }
         
-        data = {
+        # One pooled keep-alive client per event loop; score_essay and friends
+        # run on a loop owned by the scorer so every caller shares its pool
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopClient]" = weakref.WeakKeyDictionary()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "failures": 0, "in_flight": 0,
+                       "connections_opened": 0, "connections_reused": 0,
+                       "packed_requests": 0, "packed_essays": 0, "packed_rescored": 0}
+        
+    def _create_scoring_prompt(self, essay_text: str) -> List[Dict[str, Any]]:
+        """Create a well-structured prompt for essay scoring.
+        
+        Args:
+            essay_text: The essay text to be scored
+            
+        Returns:
+            List of message dictionaries for the API
+        """
+        messages = [
+            {"role": "system", "content": SCORING_SYSTEM_PROMPT},
+            {"role": "user", "content": SCORING_USER_TEMPLATE.format(essay_text=essay_text)}
+        ]
+        
+        return messages
+    
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait before the next attempt.
+        
+        Honors a Retry-After header (seconds or HTTP date) when present,
+        otherwise uses exponential backoff with full jitter.
+        
+        Args:
+            attempt: Zero-based number of the attempt that just failed
+            retry_after: Value of the Retry-After response header, if any
+            
+        Returns:
+            Delay in seconds
+        """
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                return min(self.backoff_max, max(0.0, delay))
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+    
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the scorer's background event loop on first use."""
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="gemma-scorer-loop", daemon=True)
+                thread.start()
+                self._loop = loop
+            return self._loop
+    
+    def _run_sync(self, coro: Awaitable[Any]) -> Any:
+        """Run a coroutine on the background loop and wait for its result.
+        
+        If the calling thread stops waiting (e.g. its client disconnected and
+        the server raised into it), the upstream call is cancelled as well.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+    
+    def _client(self) -> _LoopClient:
+        """Return the shared HTTP client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.session.closed:
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_end.append(self._on_connection_created)
+            trace.on_connection_reuseconn.append(self._on_connection_reused)
+            session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout,
+                                              sock_read=self.read_timeout),
+                trace_configs=[trace],
+            )
+            client = _LoopClient(session, asyncio.Semaphore(self.max_concurrency))
+            self._clients[loop] = client
+        return client
+    
+    async def _on_connection_created(self, session, context, params) -> None:
+        with self._stats_lock:
+            self._stats["connections_opened"] += 1
+    
+    async def _on_connection_reused(self, session, context, params) -> None:
+        with self._stats_lock:
+            self._stats["connections_reused"] += 1
+    
+    async def _apost(self, data: Dict[str, Any],
+                     read_body: Optional[Callable[[aiohttp.ClientResponse], Awaitable[str]]] = None,
+                     priority: int = INTERACTIVE, deadline: Optional[float] = None) -> UpstreamResponse:
+        """POST a chat-completion request through the shared client with retries.
+        
+        Args:
+            data: JSON request body
+            read_body: Optional coroutine function reading a 200 response instead
+                of response.text() (used for streamed completions)
+            priority: Scheduler priority class (INTERACTIVE or BATCH)
+            deadline: time.monotonic() by which the request must have left the scheduler queue
+            
+        Returns:
+            The final response (which may still carry an error status)
+            
+        Raises:
+            aiohttp.ClientError: If the last attempt failed to connect or timed out
+            DeadlineExceededError: If the scheduler could not start an attempt in time
+        """
+        client = self._client()
+        prompt_tokens = sum(estimate_tokens(message["content"]) for message in data["messages"])
+        cost = prompt_tokens + data.get("max_tokens", 0)
+        for attempt in range(self.max_retries + 1):
+            # Queue for the rate limit before taking a connection slot, so waiting
+            # batch work never holds slots an interactive request could use
+            if self.scheduler is not None:
+                await self.scheduler.acquire(cost, priority, deadline)
+            async with client.semaphore:
+                with self._stats_lock:
+                    self._stats["in_flight"] += 1
+                    self._stats["requests"] += 1
+                used = prompt_tokens
+                try:
+                    async with client.session.post(self.api_url, json=data) as response:
+                        if self.scheduler is not None:
+                            self.scheduler.observe(response.status, response.headers)
+                        if response.status not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                            if response.status != 200:
+                                with self._stats_lock:
+                                    self._stats["failures"] += 1
+                            if response.status == 200 and read_body is not None:
+                                body = await read_body(response)
+                                used += estimate_tokens(body)
+                            else:
+                                body = await response.text()
+                                if response.status == 200:
+                                    used = self._reported_usage(body) or used + RESULT_TOKENS
+                            return UpstreamResponse(response.status, dict(response.headers), body)
+                        delay = self._retry_delay(attempt, response.headers.get("Retry-After"))
+                        # Drain the body so the connection can go back to the pool
+                        await response.read()
+                except RETRY_EXCEPTIONS:
+                    if attempt == self.max_retries:
+                        with self._stats_lock:
+                            self._stats["failures"] += 1
+                        raise
+                    delay = self._retry_delay(attempt)
+                finally:
+                    with self._stats_lock:
+                        self._stats["in_flight"] -= 1
+                    if self.scheduler is not None:
+                        self.scheduler.settle(cost, used)
+            
+            log.info("Retrying upstream request in %.2fs (attempt %d of %d)", delay, attempt + 1, self.max_retries,
+                     extra=SAMPLED)
+            with self._stats_lock:
+                self._stats["retries"] += 1
+            await asyncio.sleep(delay)
+    
+    @staticmethod
+    def _reported_usage(body: str) -> Optional[int]:
+        """total_tokens from a chat-completion response body, if present."""
+        try:
+            return int(json.loads(body)["usage"]["total_tokens"])
+        except (ValueError, KeyError, TypeError):
+            return None
+    
+    async def _acall_upstream(self, data: Dict[str, Any],
+                              read_body: Optional[Callable[[aiohttp.ClientResponse], Awaitable[str]]] = None,
+                              priority: int = INTERACTIVE, deadline: Optional[float] = None) -> UpstreamResponse:
+        """_apost behind the circuit breaker, if there is one.
+        
+        Raises:
+            CircuitOpenError: If the breaker currently rejects upstream calls
+            DeadlineExceededError: If the scheduler could not start the call in time
+        """
+        if self.breaker is None:
+            with timer("upstream"):
+                return await self._apost(data, read_body, priority, deadline)
+        permit = self.breaker.allow()
+        if not permit:
+            raise CircuitOpenError("upstream circuit is open")
+        
+        started = time.perf_counter()
+        healthy = None
+        try:
+            with timer("upstream"):
+                response = await self._apost(data, read_body, priority, deadline)
+            healthy = response.status not in RETRY_STATUS_CODES
+            return response
+        except UPSTREAM_ERRORS:
+            healthy = False
+            raise
+        finally:
+            if healthy is None:
+                # Cancelled by the caller; says nothing about the upstream
+                self.breaker.release(permit)
+            else:
+                self.breaker.record(healthy, time.perf_counter() - started, permit)
+    
+    @staticmethod
+    async def _read_event_stream(response: aiohttp.ClientResponse, on_delta: Callable[[str], None]) -> str:
+        """Collect the text of a streamed chat completion, passing each piece to on_delta.
+        
+        Returns:
+            The complete message content
+        """
+        parts = []
+        try:
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    # Blank event separators and ": keep-alive" comments
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                delta = (json.loads(payload)["choices"][0].get("delta") or {}).get("content")
+                if delta:
+                    parts.append(delta)
+                    on_delta(delta)
+        except RETRY_EXCEPTIONS as e:
+            # Part of the answer was already passed on, so this must not be retried
+            raise aiohttp.ClientPayloadError(f"Stream interrupted: {e}") from e
+        return "".join(parts)
+    
+    def _parse_scores(self, model_response: str, cache_key: Optional[str]) -> Dict[str, Any]:
+        """Decode and validate the model's answer, caching it if it is usable."""
+        try:
+            with timer("json_parse"):
+                score_data = json.loads(model_response)
+        except json.JSONDecodeError as e:
+            log.warning("JSON decode error in model response: %s", e)
+            log.debug("Raw response: %s", model_response)
+            return {
+                "error": "Invalid JSON response from model",
+                "raw_response": model_response,
+                "overall_score": 5  # Default fallback score
+            }
+        
+        problem = validate_scores(score_data)
+        if problem:
+            log.warning("Unusable scores from model: %s", problem)
+            return {
+                "error": f"Invalid scores from model: {problem}",
+                "raw_response": model_response,
+                "overall_score": 5  # Default fallback score
+            }
+        if cache_key is not None:
+            self.cache.set(cache_key, score_data)
+        return score_data
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection pool and retry statistics for the upstream client.
+        
+        Returns:
+            Dictionary with request/retry/failure counters and connection counts
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({
+            "pool_maxsize": self.pool_size,
+            "max_concurrency": self.max_concurrency,
+            "event_loops": len(self._clients),
+        })
+        return stats
+    
+    def _build_request(self, essay_text: str) -> Dict[str, Any]:
+        """Chat-completion request body for scoring one essay."""
+        return {
             "model": self.model,
-            "messages": messages,
-            "temperature": 0.2,  # Low temperature for more consistent scoring
+            "messages": self._create_scoring_prompt(essay_text),
+            "temperature": self.temperature,
             "max_tokens": 1000,
             "response_format": {"type": "json_object"}  # Request JSON formatted response
         }
+    
+    async def ascore_essay(self, essay_text: str,
+                           on_field: Optional[Callable[[Tuple[Any, ...], Any], None]] = None,
+                           priority: int = INTERACTIVE, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Score an essay using the Gemma 3 model without blocking a thread.
         
-        try:
-            print(f"Sending request to {self.api_url} with model {self.model}")
-            response = requests.post(self.api_url, headers=headers, data=json.dumps(data))
+        Args:
+            essay_text: The essay text to be scored
+            on_field: Optional callback; if given the answer is streamed and
+                on_field(path, value) is called for every score and feedback
+                field as soon as it is complete, e.g. (("feedback", "grammar"), "...").
+                Cached results are returned without any calls.
+            priority: Scheduler priority class; INTERACTIVE requests overtake queued BATCH ones
+            deadline: time.monotonic() after which waiting for the rate limit is pointless;
+                the call then fails fast with an error result
             
-            print(f"Response status code: {response.status_code}")
-            if response.status_code != 200:
-                print(f"Error response: {response.text}")
-                
-            response.raise_for_status()
+        Returns:
+            Dictionary containing scores and feedback
+        """
+        if not self.api_key:
+            log.error("Missing API key")
+            return {
+                "error": "No API key provided",
+                "overall_score": 5,  # Default fallback score
+                "summary": "Unable to score essay: No API key provided"
+            }
             
-            response_data = response.json()
-            print(f"Response data keys: {response_data.keys()}")
+        cache_key = None
+        if self.cache is not None:
+            cache_key = ScoreCache.make_key(essay_text, self.model, PROMPT_VERSION, self.temperature)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        data = self._build_request(essay_text)
+        read_body = None
+        if on_field is not None:
+            data["stream"] = True
+            parser = IncrementalJSONParser()
             
-            model_response = response_data["choices"][0]["message"]["content"]
-            print(f"Response content preview: {model_response[:100]}...")
+            def on_delta(delta: str) -> None:
+                for path, value in parser.feed(delta):
+                    on_field(path, value)
             
-            # Extract JSON from the response
-            try:
-                score_data = json.loads(model_response)
-                print("Successfully parsed JSON response")
-                return score_data
-            except json.JSONDecodeError as e:
-                # If the model doesn't return valid JSON, try to extract the scores manually
-                print(f"JSON decode error: {str(e)}")
-                print(f"Raw response: {model_response}")
+            async def read_body(response: aiohttp.ClientResponse) -> str:
+                return await self._read_event_stream(response, on_delta)
+        
+        try:
+            log.debug("Sending request to %s with model %s", self.api_url, self.model)
+            response = await self._acall_upstream(data, read_body, priority, deadline)
+            
+            if response.status != 200:
+                log.warning("Upstream error: HTTP %d", response.status)
+                log.debug("Error response: %s", response.text)
                 return {
-                    "error": "Invalid JSON response from model",
-                    "raw_response": model_response,
+                    "error": f"API request error: HTTP {response.status}",
                     "overall_score": 5  # Default fallback score
                 }
+            
+            if read_body is not None:
+                # The streamed body is already the message content
+                model_response = response.text
+            else:
+                with timer("json_parse"):
+                    response_data = json.loads(response.text)
+                model_response = response_data["choices"][0]["message"]["content"]
+            log.debug("Response content preview: %s...", model_response[:100])
+            
+            # Extract JSON from the response
+            return self._parse_scores(model_response, cache_key)
                 
-        except requests.exceptions.RequestException as e:
-            print(f"Request exception: {str(e)}")
+        except (CircuitOpenError, DeadlineExceededError) as e:
+            log.info("Skipping API call: %s", e, extra=SAMPLED)
             return {
-                "error": f"API request error: {str(e)}",
+                "error": f"API unavailable: {e}",
+                "overall_score": 5  # Default fallback score
+            }
+        except UPSTREAM_ERRORS as e:
+            log.warning("Request exception: %s", str(e) or type(e).__name__)
+            return {
+                "error": f"API request error: {str(e) or type(e).__name__}",
                 "overall_score": 5  # Default fallback score
             }
     
-    def score_essay_offline(self, essay_text: str) -> Dict[str, Any]:
-        """Score an essay using simple heuristics when API is unavailable.
+    def _build_packed_request(self, pack: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """Chat-completion request body for scoring several (essay_id, essay_text) pairs at once."""
+        essays = "\n\n".join(
+            PACKED_ESSAY_TEMPLATE.format(essay_id=essay_id, essay_text=essay_text.replace("</essay>", "</ essay>"))
+            for essay_id, essay_text in pack
+        )
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": PACKED_SYSTEM_PROMPT},
+                {"role": "user", "content": PACKED_USER_TEMPLATE.format(count=len(pack), essays=essays)}
+            ],
+            "temperature": self.temperature,
+            "max_tokens": self.pack_max_tokens,
+            "response_format": {"type": "json_object"}
+        }
+    
+    async def _ascore_pack(self, pack: List[Tuple[str, str]], priority: int = BATCH) -> Dict[str, Dict[str, Any]]:
+        """Score several essays in one completion.
+        
+        Args:
+            pack: (essay_id, essay_text) pairs
+            
+        Returns:
+            The valid results by essay id; missing ids were not answered usably
+        """
+        try:
+            response = await self._acall_upstream(self._build_packed_request(pack), priority=priority)
+        except (CircuitOpenError, DeadlineExceededError) + UPSTREAM_ERRORS as e:
+            log.warning("Packed request failed: %s", str(e) or type(e).__name__)
+            return {}
+        if response.status != 200:
+            log.warning("Packed request error: HTTP %d", response.status)
+            return {}
+        
+        try:
+            with timer("json_parse"):
+                answer = json.loads(json.loads(response.text)["choices"][0]["message"]["content"])
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            log.warning("Unusable packed response: %s", e)
+            return {}
+        items = answer.get("results") if isinstance(answer, dict) else answer
+        if not isinstance(items, list):
+            log.warning("Packed response has no results list")
+            return {}
+        
+        wanted = {essay_id for essay_id, _ in pack}
+        results: Dict[str, Dict[str, Any]] = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            essay_id = str(item.get("id"))
+            score_data = {key: value for key, value in item.items() if key != "id"}
+            if essay_id in wanted and essay_id not in results and validate_scores(score_data) is None:
+                results[essay_id] = score_data
+        return results
+    
+    async def ascore_packed(self, essays: Iterable[str], concurrency: Optional[int] = None,
+                            priority: int = BATCH) -> List[Dict[str, Any]]:
+        """Score many essays with several essays per upstream completion.
+        
+        Essays are grouped by plan_packs, each pack is sent as one request
+        with stable ids, and every element of the answer is validated. Essays
+        the model skipped or answered unusably, and essays too long to share a
+        request, are scored one by one with ascore_essay.
+        
+        Args:
+            essays: Essay texts to be scored
+            concurrency: Optional cap on packed requests in flight
+            priority: Scheduler priority class for every request of the batch
+            
+        Returns:
+            One result per essay, in input order, like ascore_many
+        """
+        essays = list(essays)
+        if not self.api_key:
+            return await self.ascore_many(essays, concurrency, priority)
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(essays)
+        cache_keys: List[Optional[str]] = [None] * len(essays)
+        pending = []
+        for index, essay_text in enumerate(essays):
+            if self.cache is not None:
+                cache_keys[index] = ScoreCache.make_key(essay_text, self.model, PACKED_PROMPT_VERSION, self.temperature)
+                cached = self.cache.get(cache_keys[index])
+                if cached is not None:
+                    results[index] = cached
+                    continue
+            pending.append(index)
+        
+        plan = plan_packs([estimate_tokens(essays[i]) for i in pending],
+                          self.pack_max_tokens, self.pack_input_tokens, self.pack_size)
+        packs = [[pending[i] for i in pack] for pack in plan if len(pack) > 1]
+        limit = asyncio.Semaphore(concurrency) if concurrency else None
+        
+        async def _one(pack: List[int]) -> Dict[str, Dict[str, Any]]:
+            # Ids only need to be unique within the batch and stable across re-scoring
+            pairs = [(f"essay-{index}", essays[index]) for index in pack]
+            if limit is None:
+                return await self._ascore_pack(pairs, priority)
+            async with limit:
+                return await self._ascore_pack(pairs, priority)
+        
+        answers = await asyncio.gather(*(_one(pack) for pack in packs), return_exceptions=True)
+        packed = 0
+        for pack, answer in zip(packs, answers):
+            packed += len(pack)
+            if isinstance(answer, Exception):
+                log.warning("Packed request failed: %s", answer)
+                continue
+            for index in pack:
+                score_data = answer.get(f"essay-{index}")
+                if score_data is not None:
+                    results[index] = score_data
+                    if cache_keys[index] is not None:
+                        self.cache.set(cache_keys[index], score_data)
+        
+        missing = [index for index, result in enumerate(results) if result is None]
+        with self._stats_lock:
+            self._stats["packed_requests"] += len(packs)
+            self._stats["packed_essays"] += packed
+            self._stats["packed_rescored"] += sum(1 for pack in packs for index in pack if results[index] is None)
+        if missing:
+            for index, result in zip(missing, await self.ascore_many([essays[i] for i in missing], concurrency, priority)):
+                results[index] = result
+        return results
+    
+    async def ascore_many(self, essays: Iterable[str], concurrency: Optional[int] = None,
+                          priority: int = BATCH) -> List[Dict[str, Any]]:
+        """Score many essays concurrently.
+        
+        Args:
+            essays: Essay texts to be scored
+            concurrency: Optional cap on calls in flight for this batch, on top
+                of the scorer-wide max_concurrency
+            priority: Scheduler priority class for every call of the batch
+            
+        Returns:
+            One result per essay, in input order. Unexpected exceptions are
+            reported as error results instead of failing the whole batch.
+        """
+        limit = asyncio.Semaphore(concurrency) if concurrency else None
+        
+        async def _one(essay_text: str) -> Dict[str, Any]:
+            if limit is None:
+                return await self.ascore_essay(essay_text, priority=priority)
+            async with limit:
+                return await self.ascore_essay(essay_text, priority=priority)
+        
+        results = await asyncio.gather(*(_one(e) for e in essays), return_exceptions=True)
+        return [
+            {"error": f"Scoring failed: {r}", "overall_score": 5} if isinstance(r, Exception) else r
+            for r in results
+        ]
+    
+    def upstream_requests(self, essays: Iterable[str], packed: bool = False) -> int:
+        """Upstream requests scoring these essays would take, not counting cached essays or retries.
+        
+        Args:
+            essays: Essay texts
+            packed: Whether they would go through ascore_packed instead of ascore_many
+        """
+        if not self.api_key:
+            return 0
+        prompt_version = PACKED_PROMPT_VERSION if packed else PROMPT_VERSION
+        pending = [essay_text for essay_text in essays
+                   if self.cache is None or not self.cache.contains(
+                       ScoreCache.make_key(essay_text, self.model, prompt_version, self.temperature))]
+        if not packed:
+            return len(pending)
+        return len(plan_packs([estimate_tokens(essay_text) for essay_text in pending],
+                              self.pack_max_tokens, self.pack_input_tokens, self.pack_size))
+    
+    def score_essay(self, essay_text: str) -> Dict[str, Any]:
+        """Score an essay using the Gemma 3 model.
+        
+        Blocking wrapper around ascore_essay.
         
         Args:
             essay_text: The essay text to be scored
@@ -147,43 +783,96 @@ You MUST provide your response in valid JSON format with the EXACT following str
         Returns:
             Dictionary containing scores and feedback
         """
-        # Simple heuristic-based scoring as a fallback
-        word_count = len(essay_text.split())
-        sentence_count = len([s for s in essay_text.split('.') if s.strip()])
-        avg_words_per_sentence = word_count / max(sentence_count, 1)
+        return self._run_sync(self.ascore_essay(essay_text))
+    
+    def stream_essay(self, essay_text: str) -> Iterator[Tuple[str, Any]]:
+        """Blocking, streaming counterpart of score_essay.
+        
+        Yields ("field", {"path": [...], "value": ...}) for every field of the
+        model's answer as soon as it is complete, then ("result", result) with
+        the full result as score_essay would return it. Closing the generator
+        early cancels the upstream call.
         
-        # Check for basic grammar markers
-        grammar_issues = 0
-        for marker in [". ,", "  ", " .", " ,", ",,", "!!"]:
-            if marker in essay_text:
-                grammar_issues += 1
+        Args:
+            essay_text: The essay text to be scored
+        """
+        events: "queue.Queue[Optional[Tuple[str, Any]]]" = queue.Queue()
         
-        # Count paragraphs as a measure of structure
-        paragraphs = len([p for p in essay_text.split('\n\n') if p.strip()])
-        paragraphs = max(1, paragraphs)
+        def on_field(path: Tuple[Any, ...], value: Any) -> None:
+            events.put(("field", {"path": list(path), "value": value}))
         
-        # Very basic scoring heuristics
-        coherence_score = min(10, max(1, int((avg_words_per_sentence / 5) + (paragraphs / 2))))
-        grammar_score = min(10, max(1, 7 - grammar_issues + (1 if word_count > 300 else 0)))
-        content_score = min(10, max(1, word_count // 75))
-        evidence_score = min(10, max(1, word_count // 100))
+        future = asyncio.run_coroutine_threadsafe(self.ascore_essay(essay_text, on_field), self._ensure_loop())
+        future.add_done_callback(lambda _: events.put(None))
+        try:
+            while True:
+                event = events.get()
+                if event is None:
+                    break
+                yield event
+            yield "result", future.result()
+        finally:
+            future.cancel()
+    
+    def score_packed(self, essays: Iterable[str], concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Blocking wrapper around ascore_packed."""
+        return self._run_sync(self.ascore_packed(list(essays), concurrency))
+    
+    def submit(self, essay_text: str, deadline: Optional[float] = None) -> Future:
+        """Start scoring an essay on the background loop without waiting for it.
         
-        overall_score = round((coherence_score + grammar_score + content_score + evidence_score) / 4)
+        Unlike score_essay, giving up on the returned future (e.g. waiting with
+        a timeout) leaves the upstream call running, so a late answer still
+        lands in the cache.
         
-        return {
-            "coherence_score": coherence_score,
-            "grammar_score": grammar_score,
-            "content_score": content_score,
-            "evidence_score": evidence_score,
-            "overall_score": overall_score,
-            "feedback": {
-                "coherence": f"Your essay has {paragraphs} paragraphs and an average of {round(avg_words_per_sentence, 1)} words per sentence. Consider organizing your ideas into clearly defined paragraphs with topic sentences for better structure.",
-                "grammar": f"The essay contains some grammatical elements that could be improved. Pay attention to punctuation and sentence structure to enhance readability.",
-                "content": f"Your essay contains {word_count} words. To improve content depth, consider adding more specific examples and developing your arguments with greater detail.",
-                "evidence": "Consider incorporating more specific evidence to support your main points. Strong essays use concrete examples and references to strengthen arguments."
-            },
-            "summary": f"This {word_count}-word essay demonstrates {['limited', 'basic', 'good', 'strong'][min(3, overall_score//3)]} writing skills. Focus on improving organization, grammar, and supporting evidence for a better score."
-        }
+        Args:
+            essay_text: The essay text to be scored
+            deadline: Optional time.monotonic() by which the call must have
+                started; if the rate limit would hold it longer it fails fast
+            
+        Returns:
+            concurrent.futures.Future resolving to the ascore_essay result
+        """
+        return asyncio.run_coroutine_threadsafe(self.ascore_essay(essay_text, deadline=deadline), self._ensure_loop())
+    
+    def score_many(self, essays: Iterable[str], concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Blocking wrapper around ascore_many."""
+        return self._run_sync(self.ascore_many(list(essays), concurrency))
+    
+    async def aclose(self) -> None:
+        """Close the HTTP client of the running event loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.session.close()
+    
+    def close(self) -> None:
+        """Close the HTTP client and stop the background event loop."""
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.aclose(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+    
+    def score_essay_offline(self, essay_text: str) -> Dict[str, Any]:
+        """Score an essay using simple heuristics when API is unavailable.
+        
+        Args:
+            essay_text: The essay text to be scored
+            
+        Returns:
+            Dictionary containing scores and feedback
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = ScoreCache.make_key(essay_text, "offline", OFFLINE_SCORER_VERSION, normalize=False)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        with timer("fallback"):
+            result = heuristic_score(essay_text, "offline")
+        if cache_key is not None:
+            self.cache.set(cache_key, result)
+        return result
 
 
 # Example usage
@@ -0,0 +1,315 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from logs import get_logger
+
+log = get_logger(__name__)
+
+# Item states; a job is finished once none of its items is pending or running
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Longest pause of a worker retrying after a database error
+MAX_BACKOFF_SECONDS = 30.0
+
+ScoreBatch = Callable[[List[str]], List[Dict[str, Any]]]
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """Persistent queue of bulk scoring jobs drained by a local worker pool.
+
+    Jobs and their essays live in a SQLite file, so they survive restarts and
+    every worker process on the host can drain the same queue without a
+    broker. Workers claim a few essays at a time; a claim records the owning
+    process, and essays claimed by a process that no longer exists go back to
+    pending, so a restarted job resumes after its last completed essay.
+    """
+
+    def __init__(self, db_path: str, score_batch: ScoreBatch, workers: int = 2, chunk_size: int = 8,
+                 poll_interval: float = 1.0):
+        """Initialize the queue.
+
+        Args:
+            db_path: SQLite file holding jobs and results
+            score_batch: Scores a list of essays, returning one result per essay in order;
+                a result with an "error" key marks that essay as failed
+            workers: Number of worker threads started by start()
+            chunk_size: Essays a worker claims and scores at a time
+            poll_interval: Seconds an idle worker waits before looking for work
+                submitted by another process
+        """
+        self.db_path = db_path
+        self.score_batch = score_batch
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+
+        self._owner = os.getpid()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, created REAL NOT NULL, started REAL, finished REAL, "
+            "total INTEGER NOT NULL, invalid INTEGER NOT NULL, completed INTEGER NOT NULL DEFAULT 0, "
+            "failed INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS job_items ("
+            "job_id TEXT NOT NULL, idx INTEGER NOT NULL, item TEXT NOT NULL, essay TEXT, "
+            "status TEXT NOT NULL, owner INTEGER, result TEXT, finished REAL, PRIMARY KEY (job_id, idx))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS job_items_status ON job_items (status, job_id, idx)")
+
+    @classmethod
+    def from_env(cls, score_batch: ScoreBatch) -> "JobQueue":
+        """Build a queue from JOB_DB_PATH, JOB_WORKERS and JOB_CHUNK_SIZE."""
+        return cls(
+            db_path=os.environ.get("JOB_DB_PATH", "jobs.sqlite3"),
+            score_batch=score_batch,
+            workers=int(os.environ.get("JOB_WORKERS", 2)),
+            chunk_size=int(os.environ.get("JOB_CHUNK_SIZE", 8)),
+        )
+
+    def submit(self, items: Sequence[Tuple[Dict[str, Any], Optional[str]]]) -> str:
+        """Queue a job.
+
+        Args:
+            items: (entry, essay_text) per essay, as built by the batch endpoint.
+                The entry is merged into the essay's result; an essay_text of None
+                marks an invalid item whose entry already holds the error.
+
+        Returns:
+            The new job's ID
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        rows = []
+        invalid = 0
+        for index, (entry, essay_text) in enumerate(items):
+            if essay_text is None:
+                invalid += 1
+                rows.append((job_id, index, json.dumps(entry), None, FAILED, None, json.dumps(entry), now))
+            else:
+                rows.append((job_id, index, json.dumps(entry), essay_text, PENDING, None, None, None))
+        finished = now if invalid == len(rows) else None
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("INSERT INTO jobs (id, created, finished, total, invalid, failed) VALUES (?, ?, ?, ?, ?, ?)",
+                                 (job_id, now, finished, len(rows), invalid, invalid))
+                self._db.executemany("INSERT INTO job_items VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        self._wakeup.set()
+        return job_id
+
+    def _claim(self) -> List[Tuple[str, int, str, str]]:
+        """Mark the next chunk of pending essays as ours, oldest job first."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT i.job_id, i.idx, i.item, i.essay FROM job_items i JOIN jobs j ON j.id = i.job_id "
+                    "WHERE i.status = ? ORDER BY j.created, i.job_id, i.idx LIMIT ?",
+                    (PENDING, self.chunk_size)).fetchall()
+                if rows:
+                    self._db.executemany("UPDATE job_items SET status = ?, owner = ? WHERE job_id = ? AND idx = ?",
+                                         [(RUNNING, self._owner, job_id, idx) for job_id, idx, _, _ in rows])
+                    now = time.time()
+                    self._db.executemany("UPDATE jobs SET started = ? WHERE id = ? AND started IS NULL",
+                                         [(now, job_id) for job_id in {row[0] for row in rows}])
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return rows
+
+    def _store(self, claimed: List[Tuple[str, int, str, str]], results: List[Dict[str, Any]]) -> None:
+        """Record the results of a claimed chunk and advance the jobs' counters in one transaction."""
+        now = time.time()
+        updates = []
+        counts: Dict[str, List[int]] = {}
+        for (job_id, idx, item, _), result in zip(claimed, results):
+            entry = json.loads(item)
+            entry.update(result)
+            status = FAILED if "error" in entry else DONE
+            updates.append((status, json.dumps(entry), now, job_id, idx))
+            job_counts = counts.setdefault(job_id, [0, 0])
+            job_counts[status == FAILED] += 1
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany("UPDATE job_items SET status = ?, result = ?, finished = ?, owner = NULL "
+                                     "WHERE job_id = ? AND idx = ?", updates)
+                for job_id, (completed, failed) in counts.items():
+                    self._db.execute("UPDATE jobs SET completed = completed + ?, failed = failed + ? WHERE id = ?",
+                                     (completed, failed, job_id))
+                    self._db.execute("UPDATE jobs SET finished = ? WHERE id = ? AND completed + failed = total",
+                                     (now, job_id))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def recover(self) -> int:
+        """Put essays claimed by processes that have exited back to pending.
+
+        Returns:
+            Number of essays requeued
+        """
+        with self._lock:
+            owners = [row[0] for row in self._db.execute(
+                "SELECT DISTINCT owner FROM job_items WHERE status = ?", (RUNNING,))]
+            # Claims under our own pid before the workers started come from an earlier process that had the same pid
+            dead = [owner for owner in owners if owner is not None
+                    and (not _pid_alive(owner) or (owner == self._owner and not self._threads))]
+            requeued = 0
+            for owner in dead:
+                requeued += self._db.execute("UPDATE job_items SET status = ?, owner = NULL WHERE status = ? AND owner = ?",
+                                             (PENDING, RUNNING, owner)).rowcount
+        return requeued
+
+    def _work(self) -> None:
+        # A scored chunk is kept until it is stored, so a failed write is retried instead of re-scored
+        unstored: Optional[Tuple[List[Tuple[str, int, str, str]], List[Dict[str, Any]]]] = None
+        delay = self.poll_interval
+        while not self._stop.is_set():
+            try:
+                if unstored is None:
+                    claimed = self._claim()
+                    if not claimed:
+                        self._wakeup.clear()
+                        self._wakeup.wait(self.poll_interval)
+                        self.recover()
+                        continue
+                    try:
+                        results = self.score_batch([essay for _, _, _, essay in claimed])
+                    except Exception as e:
+                        log.exception("Job chunk failed: %s", e)
+                        results = [{"error": "Scoring failed", "message": str(e)} for _ in claimed]
+                    unstored = (claimed, results)
+                self._store(*unstored)
+                unstored = None
+                delay = self.poll_interval
+            except Exception as e:
+                # e.g. "database is locked" from another process; the worker must outlive it
+                log.exception("Job worker error, retrying in %.1fs: %s", delay, e)
+                self._stop.wait(delay)
+                delay = min(delay * 2, MAX_BACKOFF_SECONDS)
+
+    def start(self) -> "JobQueue":
+        """Requeue interrupted essays and start the worker threads."""
+        if self._threads or self.workers <= 0:
+            return self
+        requeued = self.recover()
+        if requeued:
+            log.info("Resuming %d interrupted job essays", requeued)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the workers after their current chunk."""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._stop.clear()
+
+    def status(self, job_id: str, offset: int = 0, limit: Optional[int] = 100) -> Optional[Dict[str, Any]]:
+        """Progress, throughput, ETA and the finished results of a job.
+
+        Args:
+            job_id: ID returned by submit()
+            offset: Index of the first result to include
+            limit: Maximum number of results to include (None for all, 0 for none)
+
+        Returns:
+            The job's status, or None if there is no such job
+        """
+        with self._lock:
+            job = self._db.execute("SELECT created, started, finished, total, invalid, completed, failed FROM jobs "
+                                   "WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            created, started, finished, total, invalid, completed, failed = job
+            # Results are returned in input order; unfinished essays are simply absent
+            results = []
+            if limit != 0:
+                rows = self._db.execute(
+                    "SELECT result FROM job_items WHERE job_id = ? AND idx >= ? AND result IS NOT NULL ORDER BY idx LIMIT ?",
+                    (job_id, offset, -1 if limit is None else limit))
+                results = [json.loads(row[0]) for row in rows]
+
+        processed = completed + failed
+        remaining = total - processed
+        now = time.time()
+        # Throughput since the first essay was claimed; invalid items were finished at submission
+        elapsed = ((finished or now) - started) if started else 0.0
+        throughput = (processed - invalid) / elapsed if elapsed > 0 else 0.0
+        if not remaining:
+            eta = 0.0
+        else:
+            eta = round(remaining / throughput, 1) if throughput else None
+        if finished:
+            state = "completed"
+        elif started:
+            state = "running"
+        else:
+            state = "queued"
+        return {
+            "id": job_id,
+            "status": state,
+            "total": total,
+            "completed": completed,
+            "failed": failed,
+            "remaining": remaining,
+            "progress": round(processed / total, 4) if total else 1.0,
+            "created": created,
+            "started": started,
+            "finished": finished,
+            "essays_per_s": round(throughput, 3),
+            "eta_s": eta,
+            "results": results,
+            "offset": offset,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and worker count for the health endpoint."""
+        with self._lock:
+            counts = dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM job_items WHERE status IN (?, ?) GROUP BY status", (PENDING, RUNNING)))
+            active = self._db.execute("SELECT COUNT(*) FROM jobs WHERE finished IS NULL").fetchone()[0]
+        return {
+            "workers": len(self._threads),
+            "active_jobs": active,
+            "pending_essays": counts.get(PENDING, 0),
+            "running_essays": counts.get(RUNNING, 0),
+        }
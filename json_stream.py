@@ -0,0 +1,121 @@
+import json
+from typing import Any, List, Optional, Tuple, Union
+
+PathElement = Union[str, int]
+
+
+class _Frame:
+    """An object or array the parser is currently inside."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.key: Optional[str] = None
+        self.index = 0
+        self.expect_key = kind == "{"
+
+    @property
+    def position(self) -> PathElement:
+        return self.key if self.kind == "{" else self.index
+
+
+class IncrementalJSONParser:
+    """Report the scalar values of a JSON document while it is still arriving.
+
+    Feed the text in arbitrary pieces (e.g. the deltas of a streamed model
+    answer); each call returns the (path, value) pairs that became complete,
+    such as (("coherence_score",), 7) or (("feedback", "grammar"), "...").
+    Anything before the first '{' (a code fence, a preamble) is skipped, as is
+    anything after the top-level object closes. The parser does not validate
+    the document; parse the full text once it is complete for that.
+    """
+
+    def __init__(self):
+        # Pieces of a string or literal that started in an earlier chunk
+        self._pending: List[str] = []
+        self._stack: List[_Frame] = []
+        self._started = False
+        self.done = False
+        self._in_string = False
+        self._escape = False
+        # Where the current token starts (or resumes) in the chunk being read
+        self._token_start: Optional[int] = None
+
+    def _path(self) -> Tuple[PathElement, ...]:
+        return tuple(frame.position for frame in self._stack)
+
+    def _complete(self, chunk: str, end: int, found: List[Tuple[Tuple[PathElement, ...], Any]]) -> None:
+        """Handle the string or bare literal ending just before `end` in `chunk`."""
+        token = "".join(self._pending) + chunk[self._token_start:end]
+        self._pending = []
+        self._token_start = None
+        try:
+            value = json.loads(token)
+        except ValueError:
+            return
+        frame = self._stack[-1]
+        if frame.expect_key:
+            frame.key = value
+            frame.expect_key = False
+        else:
+            found.append((self._path(), value))
+
+    def feed(self, chunk: str) -> List[Tuple[Tuple[PathElement, ...], Any]]:
+        """Add more text.
+
+        Args:
+            chunk: The next piece of the document
+
+        Returns:
+            (path, value) for every scalar value completed by this chunk
+        """
+        found: List[Tuple[Tuple[PathElement, ...], Any]] = []
+        if self.done:
+            return found
+        # Only the unfinished token is carried over, so a long document costs linear time
+        for i, c in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._complete(chunk, i + 1, found)
+                continue
+            if self._token_start is not None:
+                # Numbers, true, false and null end at the next delimiter
+                if c not in ",}] \t\r\n":
+                    continue
+                self._complete(chunk, i, found)
+
+            if not self._started:
+                if c == "{":
+                    self._started = True
+                    self._stack.append(_Frame("{"))
+                continue
+            if c in " \t\r\n:":
+                continue
+            if c == '"':
+                self._in_string = True
+                self._token_start = i
+            elif c == ",":
+                frame = self._stack[-1]
+                if frame.kind == "{":
+                    frame.expect_key = True
+                    frame.key = None
+                else:
+                    frame.index += 1
+            elif c in "{[":
+                self._stack.append(_Frame(c))
+            elif c in "}]":
+                self._stack.pop()
+                if not self._stack:
+                    self.done = True
+                    return found
+            else:
+                self._token_start = i
+
+        if self._token_start is not None:
+            self._pending.append(chunk[self._token_start:])
+            self._token_start = 0
+        return found
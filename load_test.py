@@ -0,0 +1,251 @@
+"""Load generator for the scoring services.
+
+Closed loop: --concurrency clients each send their next request as soon as
+the previous one is answered (finds the saturation throughput).
+Open loop: requests start at --rate per second on a Poisson schedule whatever
+the service does (shows how latency grows at a given arrival rate). Open-loop
+latency is measured from the scheduled start, so a backed-up client does not
+hide queueing.
+
+    python load_test.py --url http://127.0.0.1:5000 --endpoint /api/score --concurrency 16 --duration 60
+    python load_test.py --endpoint /api/score --endpoint /api/score/batch --mode open --rate 20 --duration 60
+    python load_test.py --url http://127.0.0.1:5000 --endpoint / --requests 1 -v
+    python load_test.py --endpoint /api/score --rate 40 --mode open --output run2.json --compare run1.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+import aiohttp
+
+from benchmark import latency_stats, load_sample_essays, synthetic_essays
+
+# Endpoints scoring one essay per request ({"text": ...}); "/" and "/test" belong to app.py
+SINGLE_ENDPOINTS = ("/", "/test", "/api/score", "/api/score/stream")
+BATCH_ENDPOINTS = ("/api/score/batch",)
+
+# Compared by --compare; the others in the summary are informational
+COMPARED = ("requests_per_s", "p50_ms", "p90_ms", "p99_ms", "error_rate", "fallback_rate")
+
+
+class EssaySource:
+    """Essays drawn from sample_essays.txt (or synthetic ones of a fixed length)."""
+
+    def __init__(self, words: Optional[int] = None, unique: bool = True, seed: int = 0):
+        """Initialize the source.
+
+        Args:
+            words: Use synthetic essays of this many words instead of the samples
+            unique: Append a nonce so the score caches never answer
+            seed: Seed for the essay choice
+        """
+        self.essays = synthetic_essays(100, words, seed) if words else [essay for essay, _ in load_sample_essays()]
+        self.unique = unique
+        self.rng = random.Random(seed)
+
+    def next(self) -> str:
+        essay = self.rng.choice(self.essays)
+        return f"{essay}\n\nReference {uuid.uuid4().hex}." if self.unique else essay
+
+
+def _scoring_methods(endpoint: str, body: Any) -> List[str]:
+    """scoring_method of every essay in a response body ('lstm' for app.py's answers)."""
+    if endpoint in ("/", "/test"):
+        return ["lstm" if endpoint == "/" else "test"]
+    if endpoint in BATCH_ENDPOINTS:
+        return [result.get("scoring_method", "error") for result in body.get("results", [])]
+    return [body.get("scoring_method", "error")]
+
+
+async def _read_stream(response: aiohttp.ClientResponse, started: float, record: Dict[str, Any]) -> Any:
+    """Read an SSE response; returns the data of its final "result" event."""
+    event, result = None, None
+    async for raw_line in response.content:
+        line = raw_line.decode("utf-8").rstrip("\r\n")
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+            record.setdefault("first_event", time.perf_counter() - started)
+        elif line.startswith("data:") and event == "result":
+            result = json.loads(line[len("data:"):])
+    return result or {}
+
+
+async def send(session: aiohttp.ClientSession, base_url: str, endpoint: str, essays: EssaySource,
+               batch_size: int, started: float, verbose: bool = False) -> Dict[str, Any]:
+    """Send one request and describe its outcome."""
+    if endpoint in BATCH_ENDPOINTS:
+        payload: Any = [essays.next() for _ in range(batch_size)]
+    else:
+        payload = {"text": essays.next()}
+    record: Dict[str, Any] = {"endpoint": endpoint}
+    try:
+        async with session.post(base_url + endpoint, json=payload) as response:
+            record["status"] = response.status
+            if endpoint == "/api/score/stream" and response.content_type == "text/event-stream":
+                body = await _read_stream(response, started, record)
+            else:
+                body = await response.json(content_type=None)
+        if verbose:
+            print(json.dumps(body, indent=2), file=sys.stderr)
+        if response.status >= 400:
+            record["error"] = f"HTTP {response.status}"
+        else:
+            record["methods"] = _scoring_methods(endpoint, body)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        record["error"] = type(e).__name__
+    record["latency"] = time.perf_counter() - started
+    return record
+
+
+async def run_closed(args: argparse.Namespace, session: aiohttp.ClientSession, essays: EssaySource) -> List[Dict[str, Any]]:
+    records: List[Dict[str, Any]] = []
+    deadline = time.perf_counter() + args.duration
+    remaining = [args.requests]
+
+    async def client(index: int) -> None:
+        turn = index
+        while time.perf_counter() < deadline and (args.requests is None or remaining[0] > 0):
+            if args.requests is not None:
+                remaining[0] -= 1
+            endpoint = args.endpoint[turn % len(args.endpoint)]
+            turn += 1
+            records.append(await send(session, args.url, endpoint, essays, args.batch_size,
+                                      time.perf_counter(), args.verbose))
+
+    await asyncio.gather(*(client(i) for i in range(args.concurrency)))
+    return records
+
+
+async def run_open(args: argparse.Namespace, session: aiohttp.ClientSession, essays: EssaySource) -> List[Dict[str, Any]]:
+    rng = random.Random(args.seed)
+    tasks = []
+    start = time.perf_counter()
+    scheduled = start
+    count = 0
+    while scheduled - start < args.duration and (args.requests is None or count < args.requests):
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        endpoint = args.endpoint[count % len(args.endpoint)]
+        # Latency counts from the scheduled start, including any time the request waited on the client side
+        tasks.append(asyncio.ensure_future(send(session, args.url, endpoint, essays, args.batch_size, scheduled,
+                                                args.verbose)))
+        count += 1
+        scheduled += rng.expovariate(args.rate)
+    return list(await asyncio.gather(*tasks))
+
+
+def summarize(records: Sequence[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """Latency percentiles, throughput, error and fallback rates of a set of requests."""
+    ok = [r for r in records if "error" not in r]
+    methods = Counter(method for r in ok for method in r["methods"])
+    essays = sum(methods.values())
+    summary = {
+        "requests": len(records),
+        "requests_per_s": round(len(records) / elapsed, 3) if elapsed else 0.0,
+        "essays_scored": essays,
+        "error_rate": round((len(records) - len(ok)) / len(records), 4) if records else 0.0,
+        "errors": dict(Counter(r["error"] for r in records if "error" in r)),
+        # Share of essays answered by the heuristic fallback instead of the model
+        "fallback_rate": round(methods.get("basic", 0) / essays, 4) if essays else 0.0,
+        "scoring_method": dict(methods),
+    }
+    if records:
+        summary.update({key: value for key, value in latency_stats([r["latency"] for r in records]).items()
+                        if key.endswith("_ms")})
+        summary["max_ms"] = round(max(r["latency"] for r in records) * 1000, 3)
+    first_events = [r["first_event"] for r in records if "first_event" in r]
+    if first_events:
+        summary["first_event_p50_ms"] = latency_stats(first_events)["p50_ms"]
+    return summary
+
+
+def compare(summary: Dict[str, Any], previous: Dict[str, Any]) -> List[str]:
+    """Lines describing how the headline numbers moved since an earlier run."""
+    lines = []
+    for scope, current in [("total", summary["total"])] + sorted(summary["endpoints"].items()):
+        before = previous["total"] if scope == "total" else previous.get("endpoints", {}).get(scope)
+        if not before:
+            continue
+        changes = []
+        for key in COMPARED:
+            if key in current and key in before:
+                delta = current[key] - before[key]
+                relative = f" ({delta / before[key]:+.1%})" if before[key] else ""
+                changes.append(f"{key} {before[key]:g} -> {current[key]:g}{relative}")
+        lines.append(f"{scope}: " + ", ".join(changes))
+    return lines
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    essays = EssaySource(args.words, unique=not args.repeat_essays, seed=args.seed)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        start = time.perf_counter()
+        if args.mode == "open":
+            records = await run_open(args, session, essays)
+        else:
+            records = await run_closed(args, session, essays)
+        elapsed = time.perf_counter() - start
+
+    by_endpoint = defaultdict(list)
+    for record in records:
+        by_endpoint[record["endpoint"]].append(record)
+    return {
+        "config": {"url": args.url, "mode": args.mode, "endpoints": args.endpoint,
+                   "rate": args.rate if args.mode == "open" else None,
+                   "concurrency": args.concurrency if args.mode == "closed" else None,
+                   "batch_size": args.batch_size, "essays": f"synthetic {args.words} words" if args.words else "samples",
+                   "started": time.time() - elapsed, "seconds": round(elapsed, 3)},
+        "total": summarize(records, elapsed),
+        "endpoints": {endpoint: summarize(endpoint_records, elapsed) for endpoint, endpoint_records in by_endpoint.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the scoring endpoints with concurrent load.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="base URL of the service")
+    parser.add_argument("--endpoint", action="append",
+                        help=f"endpoint to call, repeat to mix several ({', '.join(SINGLE_ENDPOINTS + BATCH_ENDPOINTS)}); "
+                             "default /api/score")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed", help="closed or open loop")
+    parser.add_argument("--concurrency", type=int, default=8, help="clients in closed-loop mode")
+    parser.add_argument("--rate", type=float, default=10, help="requests per second in open-loop mode")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--batch-size", type=int, default=10, help="essays per batch request")
+    parser.add_argument("--words", type=int, help="send synthetic essays of this length instead of the samples")
+    parser.add_argument("--repeat-essays", action="store_true", help="send the essays unchanged, so caches can answer")
+    parser.add_argument("--connections", type=int, default=100, help="maximum open connections")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="seed for essay choice and open-loop arrivals")
+    parser.add_argument("--output", help="write the summary as JSON to this file")
+    parser.add_argument("--compare", help="summary JSON of an earlier run to compare against")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every response body")
+    args = parser.parse_args()
+    args.endpoint = args.endpoint or ["/api/score"]
+    unknown = [endpoint for endpoint in args.endpoint if endpoint not in SINGLE_ENDPOINTS + BATCH_ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoint(s): {', '.join(unknown)}")
+
+    summary = asyncio.run(run(args))
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        for line in compare(summary, previous):
+            print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import logging
+import os
+import random
+
+# Pass as extra= on per-request messages so only a sample of them is written
+SAMPLED = {"sampled": True}
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of the records marked as sampled; warnings and errors always pass."""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not getattr(record, "sampled", False):
+            return True
+        return self.rate >= 1.0 or random.random() < self.rate
+
+
+_sampling = SamplingFilter(float(os.environ.get("LOG_SAMPLE_RATE", 0.1)))
+
+
+def get_logger(name: str) -> logging.Logger:
+    """A logger that honors LOG_SAMPLE_RATE for records logged with extra=SAMPLED."""
+    logger = logging.getLogger(name)
+    if _sampling not in logger.filters:
+        logger.addFilter(_sampling)
+    return logger
+
+
+def configure_logging() -> None:
+    """Send log records to stderr at LOG_LEVEL (default INFO) unless logging is already set up,
+    e.g. by gunicorn."""
+    level = os.environ.get("LOG_LEVEL", "INFO").upper()
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logging.getLogger().setLevel(level)
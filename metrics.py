@@ -0,0 +1,240 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Upper bounds in seconds for the per-stage timers, from cache lookups to slow upstream calls
+STAGE_SECONDS_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+
+class Histogram:
+    """Thread-safe cumulative histogram with fixed bucket upper bounds."""
+
+    def __init__(self, buckets: Sequence[float]):
+        """Initialize the histogram.
+
+        Args:
+            buckets: Sorted upper bounds; values above the last one land in +Inf
+        """
+        self.buckets = list(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Cumulative bucket counts plus sum, count and mean."""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = {}
+        running = 0
+        for bound, n in zip(self.buckets + [float("inf")], counts):
+            running += n
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+        return {
+            "buckets": cumulative,
+            "sum": round(total, 6),
+            "count": count,
+            "mean": round(total / count, 6) if count else 0.0,
+        }
+
+
+class Counter:
+    """Thread-safe monotonically increasing counter."""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Gauge:
+    """Value read from a callback whenever the metrics are collected."""
+
+    def __init__(self, func: Callable[[], float]):
+        self._func = func
+
+    @property
+    def value(self) -> float:
+        return self._func()
+
+
+Metric = Union[Counter, Gauge, Histogram]
+LabelSet = Tuple[Tuple[str, str], ...]
+
+_PROMETHEUS_TYPES = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: LabelSet, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Registry:
+    """Named metrics with optional labels, rendered in the Prometheus text format.
+
+    Counters and histograms are created on first use and shared afterwards,
+    so modules can ask for the same (name, labels) pair without coordinating.
+    Existing Counter and Histogram objects (e.g. a breaker's trip counter) can
+    be registered as they are. Reusing a name with another type or help text,
+    or registering a second gauge or metric object under the same name and
+    labels, raises ValueError instead of silently keeping the first one.
+    """
+
+    def __init__(self, namespace: str = "essay"):
+        """Initialize an empty registry.
+
+        Args:
+            namespace: Prefix added to every metric name
+        """
+        self.namespace = namespace
+        self._families: Dict[str, Tuple[str, type, Dict[LabelSet, Metric]]] = {}
+        self._lock = threading.Lock()
+
+    def _full_name(self, name: str) -> str:
+        return f"{self.namespace}_{name}" if self.namespace else name
+
+    def _get(self, name: str, help_text: str, kind: type, labels: Dict[str, str],
+             create: Callable[[], Metric], shared: bool = True) -> Metric:
+        """The metric for name and labels, created if missing.
+
+        Args:
+            shared: Whether an existing metric may be returned; if not, the
+                name and labels must be new (or hold the very metric create() returns)
+        """
+        key = tuple(sorted((label, str(value)) for label, value in labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = (help_text, kind, {})
+            elif family[1] is not kind:
+                raise ValueError(f"Metric {name} is already registered as a {_PROMETHEUS_TYPES[family[1]]}")
+            elif family[0] != help_text:
+                raise ValueError(f"Metric {name} is already registered with help text {family[0]!r}")
+            metric = family[2].get(key)
+            if metric is None:
+                metric = family[2][key] = create()
+            elif not shared and metric is not create():
+                raise ValueError(f"Metric {name}{_labels(key)} is already registered")
+            return metric
+
+    def counter(self, name: str, help_text: str = "", **labels: str) -> Counter:
+        """The counter for name and labels, created on first use."""
+        return self._get(name, help_text, Counter, labels, Counter)
+
+    def histogram(self, name: str, help_text: str = "", buckets: Sequence[float] = STAGE_SECONDS_BUCKETS,
+                  **labels: str) -> Histogram:
+        """The histogram for name and labels, created on first use with the given buckets."""
+        histogram = self._get(name, help_text, Histogram, labels, lambda: Histogram(buckets))
+        if histogram.buckets != list(buckets):
+            raise ValueError(f"Histogram {name} already exists with buckets {histogram.buckets}")
+        return histogram
+
+    def gauge(self, name: str, func: Callable[[], float], help_text: str = "", **labels: str) -> Gauge:
+        """Expose a value computed at collection time, e.g. a queue depth."""
+        return self._get(name, help_text, Gauge, labels, lambda: Gauge(func), shared=False)
+
+    def register(self, name: str, metric: Metric, help_text: str = "", **labels: str) -> Metric:
+        """Expose an existing Counter or Histogram under name and labels."""
+        return self._get(name, help_text, type(metric), labels, lambda: metric, shared=False)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Time a block into stage_seconds{stage=...}; the block's exceptions pass through."""
+        histogram = self.histogram("stage_seconds", "Time spent per processing stage", stage=stage)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            families = [(name, help_text, kind, list(metrics.items()))
+                        for name, (help_text, kind, metrics) in sorted(self._families.items())]
+        lines: List[str] = []
+        for name, help_text, kind, metrics in families:
+            full_name = self._full_name(name)
+            if kind is Counter and not full_name.endswith("_total"):
+                full_name += "_total"
+            if help_text:
+                lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {_PROMETHEUS_TYPES[kind]}")
+            for labels, metric in sorted(metrics, key=lambda item: item[0]):
+                if kind is Histogram:
+                    snapshot = metric.snapshot()
+                    for bound, count in snapshot["buckets"].items():
+                        lines.append(f"{full_name}_bucket{_labels(labels, ('le', bound))} {count}")
+                    lines.append(f"{full_name}_sum{_labels(labels)} {_number(snapshot['sum'])}")
+                    lines.append(f"{full_name}_count{_labels(labels)} {snapshot['count']}")
+                else:
+                    lines.append(f"{full_name}{_labels(labels)} {_number(metric.value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry the serving paths record into
+REGISTRY = Registry()
+
+
+def timer(stage: str):
+    """Time a block into the process-wide stage_seconds histogram."""
+    return REGISTRY.timer(stage)
+
+
+def instrument_app(app, registry: Registry = REGISTRY) -> None:
+    """Count and time every request of a Flask app and serve the registry at /metrics.
+
+    Requests are labelled by route pattern rather than path, so IDs in URLs
+    don't create new series. For streamed responses the time until the
+    headers are sent is recorded.
+    """
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = getattr(g, "metrics_started", None)
+        if started is not None:
+            endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            registry.histogram("http_request_seconds", "Time until the response headers are sent",
+                               endpoint=endpoint, method=request.method).observe(time.perf_counter() - started)
+            registry.counter("http_requests", "Requests by route and status", endpoint=endpoint,
+                             method=request.method, status=str(response.status_code)).inc()
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        """Prometheus scrape endpoint."""
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
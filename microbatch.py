@@ -0,0 +1,157 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import Counter, Histogram
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+QUEUE_WAIT_MS_BUCKETS = [0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+
+class QueueFullError(RuntimeError):
+    """Raised when more requests are waiting than the batcher accepts."""
+
+
+class MicroBatcher:
+    """Coalesce concurrent prediction requests into a single model call.
+
+    Callers submit their own input rows and get back a Future. A single worker
+    thread waits for the first request, keeps collecting for up to
+    ``max_wait_ms`` or until ``max_batch_size`` rows are queued, runs one
+    ``predict_fn`` on the stacked rows and hands every caller its slice.
+    """
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray], max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, max_queue: int = 1024, name: str = "microbatch"):
+        """Initialize the batcher (the worker starts on first submit).
+
+        Args:
+            predict_fn: Function mapping a stacked input array to one output row per input row
+            max_batch_size: Maximum rows per predict_fn call
+            max_wait_ms: How long the first request of a batch waits for company
+            max_queue: Maximum number of requests waiting; beyond that submit raises QueueFullError
+            name: Worker thread name
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue = max_queue
+        self.name = name
+
+        self._queue: "queue.Queue[Tuple[np.ndarray, Future, float]]" = queue.Queue(maxsize=max_queue)
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._pending: Optional[Tuple[np.ndarray, Future, float]] = None
+
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_MS_BUCKETS)
+        self.rejected = Counter()
+        self.batches = Counter()
+
+    @classmethod
+    def from_env(cls, predict_fn: Callable[[np.ndarray], np.ndarray], prefix: str = "LSTM",
+                 name: str = "microbatch") -> "MicroBatcher":
+        """Build a batcher tuned by <prefix>_BATCH_WINDOW_MS, <prefix>_MAX_BATCH and <prefix>_MAX_QUEUE."""
+        return cls(
+            predict_fn,
+            max_batch_size=int(os.environ.get(f"{prefix}_MAX_BATCH", 32)),
+            max_wait_ms=float(os.environ.get(f"{prefix}_BATCH_WINDOW_MS", 5)),
+            max_queue=int(os.environ.get(f"{prefix}_MAX_QUEUE", 1024)),
+            name=name,
+        )
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None:
+            with self._start_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._worker.start()
+
+    def submit(self, rows: np.ndarray) -> Future:
+        """Queue input rows for the next batch.
+
+        Args:
+            rows: Array whose first axis is the batch axis (usually a single row)
+
+        Returns:
+            Future resolving to predict_fn's output for exactly these rows
+
+        Raises:
+            QueueFullError: If max_queue requests are already waiting
+        """
+        self._ensure_worker()
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((rows, future, time.perf_counter()))
+        except queue.Full:
+            self.rejected.inc()
+            raise QueueFullError(f"{self.name}: more than {self.max_queue} requests waiting")
+        return future
+
+    def predict(self, rows: np.ndarray, timeout: Optional[float] = None) -> np.ndarray:
+        """Blocking convenience wrapper around submit."""
+        return self.submit(rows).result(timeout)
+
+    def _collect(self) -> List[Tuple[np.ndarray, Future, float]]:
+        """Wait for the first request, then gather more until the window closes or the batch is full."""
+        first = self._pending or self._queue.get()
+        self._pending = None
+        batch = [first]
+        size = len(first[0])
+        deadline = first[2] + self.max_wait_ms / 1000.0
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if size + len(item[0]) > self.max_batch_size:
+                # Keep it for the next batch instead of overshooting this one
+                self._pending = item
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            live = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not live:
+                continue
+            for _, _, enqueued in live:
+                self.queue_wait_ms.observe((started - enqueued) * 1000.0)
+
+            sizes = [len(rows) for rows, _, _ in live]
+            self.batch_sizes.observe(sum(sizes))
+            self.batches.inc()
+            try:
+                outputs = self.predict_fn(np.concatenate([rows for rows, _, _ in live]))
+            except Exception as e:
+                for _, future, _ in live:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for size, (_, future, _) in zip(sizes, live):
+                future.set_result(outputs[offset:offset + size])
+                offset += size
+
+    def stats(self) -> Dict[str, Any]:
+        """Tuning parameters, queue depth and batch-size / queue-wait histograms."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "max_queue": self.max_queue,
+            "queue_depth": self._queue.qsize(),
+            "batches": self.batches.value,
+            "rejected": self.rejected.value,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+        }
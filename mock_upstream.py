@@ -0,0 +1,242 @@
+"""Local stand-in for the OpenRouter chat-completions endpoint.
+
+Useful for exercising gemma_app.py and GemmaEssayScorer without network
+access or API credits:
+
+    python mock_upstream.py --port 8081 --latency 1.5
+    OPENROUTER_API_URL=http://127.0.0.1:8081/api/v1/chat/completions python gemma_app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+# Characters of the answer per streamed delta
+STREAM_PIECE_CHARS = 12
+
+# Essays of a packed request (see GemmaEssayScorer.ascore_packed)
+PACKED_ESSAY_RE = re.compile(r'<essay id="([^"]*)">\n(.*?)\n</essay>', re.S)
+
+
+def _fake_scores(essay_text: str) -> Dict[str, Any]:
+    """Deterministic scores in the schema requested by _create_scoring_prompt."""
+    word_count = len(essay_text.split())
+    base = min(10, max(1, word_count // 60))
+    return {
+        "coherence_score": base,
+        "grammar_score": min(10, base + 1),
+        "content_score": base,
+        "evidence_score": max(1, base - 1),
+        "overall_score": base,
+        "feedback": {
+            "coherence": "Mock feedback on coherence.",
+            "grammar": "Mock feedback on grammar.",
+            "content": "Mock feedback on content.",
+            "evidence": "Mock feedback on evidence.",
+        },
+        "summary": f"Mock assessment of a {word_count}-word essay.",
+    }
+
+
+class MockUpstreamHandler(BaseHTTPRequestHandler):
+    """Answers chat-completion requests after a configurable delay."""
+
+    server_version = "MockUpstream/1.0"
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle plus delayed ACKs add ~40 ms per response
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:
+            # Clients may drop a keep-alive connection instead of reusing it
+            pass
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _write_chunk(self, text: str) -> None:
+        payload = text.encode("utf-8")
+        self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+    
+    def _send_stream(self, content: str, model: str, completion_id: str,
+                     headers: Optional[Dict[str, str]] = None) -> None:
+        """Answer like a stream=true completion: SSE deltas spread over the latency."""
+        pieces = [content[i:i + STREAM_PIECE_CHARS] for i in range(0, len(content), STREAM_PIECE_CHARS)]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self._write_chunk(": MOCK PROCESSING\n\n")
+        for piece in pieces:
+            time.sleep(self.server.latency / len(pieces))
+            chunk = {"id": completion_id, "model": model,
+                     "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+    
+    def _check_rate_limit(self) -> Tuple[bool, Dict[str, str]]:
+        """Sliding-window request limit; returns (allowed, X-RateLimit-* headers)."""
+        server = self.server
+        if not server.rate_limit:
+            return True, {}
+        with server.lock:
+            now = time.time()
+            while server.rate_log and server.rate_log[0] <= now - server.rate_window:
+                server.rate_log.popleft()
+            allowed = len(server.rate_log) < server.rate_limit
+            if allowed:
+                server.rate_log.append(now)
+            else:
+                server.rate_limited += 1
+            reset = (server.rate_log[0] if server.rate_log else now) + server.rate_window
+            headers = {
+                "X-RateLimit-Limit": str(server.rate_limit),
+                "X-RateLimit-Remaining": str(server.rate_limit - len(server.rate_log)),
+                "X-RateLimit-Reset": str(int(reset * 1000)),
+            }
+        if not allowed:
+            headers["Retry-After"] = str(max(1, int(reset - now + 0.999)))
+        return allowed, headers
+    
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+
+        with self.server.lock:
+            self.server.request_count += 1
+            self.server.prompt_chars += sum(len(m.get("content", "")) for m in request.get("messages", []))
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+        stream = bool(request.get("stream"))
+        allowed, rate_headers = self._check_rate_limit()
+        try:
+            if not allowed:
+                self._send_json(429, {"error": {"message": "Rate limit exceeded"}}, rate_headers)
+                return
+            if not stream:
+                time.sleep(self.server.latency)
+            if random.random() < self.server.error_rate:
+                self._send_json(500, {"error": {"message": "Mock upstream failure"}})
+                return
+
+            essay_text = request.get("messages", [{}])[-1].get("content", "")
+            packed = PACKED_ESSAY_RE.findall(essay_text)
+            if packed:
+                answer = {"results": [dict(id=essay_id, **_fake_scores(text)) for essay_id, text in packed
+                                      if random.random() >= self.server.pack_drop_rate]}
+            else:
+                answer = _fake_scores(essay_text)
+            content = json.dumps(answer, indent=2)
+            if stream:
+                self._send_stream(content, request.get("model", "mock"), f"mock-{self.server.request_count}", rate_headers)
+                return
+            self._send_json(200, {
+                "id": f"mock-{self.server.request_count}",
+                "model": request.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": len(essay_text) // 4, "completion_tokens": len(content) // 4,
+                          "total_tokens": len(essay_text) // 4 + len(content) // 4},
+            }, rate_headers)
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+
+
+class MockUpstreamServer(ThreadingHTTPServer):
+    """Threaded server with a listen backlog deep enough for an asyncio fan-out.
+
+    With socketserver's default of 5, a burst of concurrent connections
+    overflows the accept queue and the extra ones only get in after
+    1-second SYN retransmits, which is what a benchmark would then measure.
+    """
+
+    request_queue_size = 1024
+
+
+def start_mock_upstream(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                        error_rate: float = 0.0, verbose: bool = False,
+                        pack_drop_rate: float = 0.0, rate_limit: int = 0,
+                        rate_window: float = 60.0) -> Tuple[MockUpstreamServer, str]:
+    """Start the mock server on a background thread.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free port)
+        latency: Seconds to wait before answering each request (spread over
+            the deltas for stream=true requests)
+        error_rate: Fraction of requests answered with HTTP 500
+        verbose: Whether to log every request
+        pack_drop_rate: Fraction of essays left out of packed answers
+        rate_limit: Requests allowed per rate_window before answering 429 (0 for no limit)
+        rate_window: Length of the sliding rate-limit window in seconds
+
+    Returns:
+        Tuple of (server, chat-completions URL). Call server.shutdown() to stop it.
+    """
+    server = MockUpstreamServer((host, port), MockUpstreamHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.verbose = verbose
+    server.pack_drop_rate = pack_drop_rate
+    server.prompt_chars = 0
+    server.rate_limit = rate_limit
+    server.rate_window = rate_window
+    server.rate_log = deque()
+    server.rate_limited = 0
+    server.lock = threading.Lock()
+    server.request_count = 0
+    server.in_flight = 0
+    server.max_in_flight = 0
+
+    thread = threading.Thread(target=server.serve_forever, name="mock-upstream", daemon=True)
+    thread.start()
+    url = f"http://{server.server_address[0]}:{server.server_address[1]}/api/v1/chat/completions"
+    return server, url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock of the chat-completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail with 500")
+    parser.add_argument("--pack-drop-rate", type=float, default=0.0, help="fraction of essays left out of packed answers")
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute before answering 429 (0 for no limit)")
+    args = parser.parse_args()
+
+    server, url = start_mock_upstream(args.host, args.port, args.latency, args.error_rate, verbose=True,
+                                      pack_drop_rate=args.pack_drop_rate, rate_limit=args.rpm)
+    print(f"Mock upstream listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,170 @@
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+
+from embedding_engine import EmbeddingEngine
+from logs import get_logger
+from numpy_lstm import NumpyLSTMScorer
+from vector_store import MemmapKeyedVectors, store_exists
+
+log = get_logger(__name__)
+
+
+def _file_version(path: str) -> str:
+    return f"{os.path.basename(path)}@{int(os.path.getmtime(path))}"
+
+
+class ModelRegistry:
+    """Process-wide holder for the word2vec vectors and the LSTM scorer.
+
+    Both artifacts are loaded once, warmed up with a dummy prediction and then
+    kept resident so that request handlers only pay for tokenization and a
+    single forward pass.
+    """
+
+    def __init__(self, word2vec_path: Optional[str] = None, lstm_path: Optional[str] = None,
+                 num_features: int = 300, vector_store: Optional[str] = None,
+                 lstm_weights: Optional[str] = None):
+        """Initialize the registry without loading anything yet.
+
+        Args:
+            word2vec_path: Path to the binary word2vec file (defaults to WORD2VEC_PATH or word2vecmodel.bin)
+            lstm_path: Path to the saved Keras model (defaults to LSTM_MODEL_PATH or final_lstm.h5)
+            num_features: Dimensionality of the word vectors
+            vector_store: Prefix of a memory-mapped vector store written by vector_store.py
+                (defaults to WORD2VEC_STORE, or the word2vec path without its extension).
+                Used instead of word2vec_path when it exists.
+            lstm_weights: LSTM weights exported by numpy_lstm.py (defaults to LSTM_WEIGHTS_PATH,
+                or the model path with a .npz extension). When it exists the model runs in
+                NumPy and TensorFlow is never imported.
+        """
+        self.word2vec_path = word2vec_path or os.environ.get("WORD2VEC_PATH", "word2vecmodel.bin")
+        self.vector_store = vector_store or os.environ.get(
+            "WORD2VEC_STORE", os.path.splitext(self.word2vec_path)[0])
+        self.lstm_path = lstm_path or os.environ.get("LSTM_MODEL_PATH", "final_lstm.h5")
+        self.lstm_weights = lstm_weights or os.environ.get(
+            "LSTM_WEIGHTS_PATH", os.path.splitext(self.lstm_path)[0] + ".npz")
+        self.num_features = num_features
+
+        self.word2vec = None
+        self.embeddings: Optional[EmbeddingEngine] = None
+        self.lstm_model = None
+        # Identifies the loaded model files, e.g. for cache keys
+        self.version: Optional[str] = None
+        self.error: Optional[str] = None
+
+        self._ready = threading.Event()
+        self._done = threading.Event()
+        self._load_lock = threading.Lock()
+        self._predict_lock = threading.Lock()
+        self._loader: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether both models are loaded and warmed up."""
+        return self._ready.is_set()
+
+    def load(self) -> None:
+        """Load and warm up both models. Safe to call more than once."""
+        with self._load_lock:
+            if self.ready:
+                return
+            try:
+                if store_exists(self.vector_store):
+                    log.info("Mapping word2vec vectors from %s.npy", self.vector_store)
+                    self.word2vec = MemmapKeyedVectors(self.vector_store)
+                    vectors_file = self.vector_store + ".npy"
+                else:
+                    from gensim.models.keyedvectors import KeyedVectors
+
+                    log.info("Loading word2vec vectors from %s", self.word2vec_path)
+                    self.word2vec = KeyedVectors.load_word2vec_format(self.word2vec_path, binary=True)
+                    vectors_file = self.word2vec_path
+                self.embeddings = EmbeddingEngine.from_keyed_vectors(self.word2vec)
+                if os.path.exists(self.lstm_weights):
+                    log.info("Loading NumPy LSTM weights from %s", self.lstm_weights)
+                    self.lstm_model = NumpyLSTMScorer(self.lstm_weights)
+                    model_file = self.lstm_weights
+                else:
+                    from tensorflow.keras.models import load_model
+
+                    log.info("Loading LSTM model from %s", self.lstm_path)
+                    self.lstm_model = load_model(self.lstm_path)
+                    model_file = self.lstm_path
+
+                # Build the predict function now instead of on the first request
+                warmup = np.zeros((1, 1, self.num_features), dtype="float32")
+                self.lstm_model.predict(warmup)
+
+                # Cached scores are keyed on this, so it covers the embeddings as well as the LSTM:
+                # switching to a float16/int8 store or rebuilding one must not reuse old scores
+                vectors = f"{_file_version(vectors_file)}:{self.word2vec.vectors.dtype.name}"
+                if getattr(self.word2vec, "scales", None) is not None:
+                    vectors += "+scales"
+                self.version = f"{_file_version(model_file)}|{vectors}"
+                self.error = None
+                self._ready.set()
+                log.info("Models loaded and warmed up")
+            except Exception as e:
+                self.error = str(e)
+                log.error("Error loading models: %s", self.error)
+                raise
+            finally:
+                self._done.set()
+
+    def load_async(self) -> threading.Thread:
+        """Start loading the models on a background thread."""
+        if self._loader is None:
+            def _run():
+                try:
+                    self.load()
+                except Exception:
+                    # Already recorded in self.error and reported by the health check
+                    pass
+
+            self._loader = threading.Thread(target=_run, name="model-loader", daemon=True)
+            self._loader.start()
+        return self._loader
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> None:
+        """Block until the models are loaded.
+
+        Args:
+            timeout: Maximum number of seconds to wait (None waits forever)
+
+        Raises:
+            RuntimeError: If loading failed or did not finish in time
+        """
+        if not self.ready and self._loader is None:
+            self.load()
+        self._done.wait(timeout)
+        if not self.ready:
+            raise RuntimeError(self.error or "Models are still loading")
+
+    def predict(self, vectors: np.ndarray) -> np.ndarray:
+        """Run the LSTM on a batch of essay vectors.
+
+        Args:
+            vectors: Array of shape (batch, 1, num_features)
+
+        Returns:
+            Array of shape (batch, 1) with the predicted scores
+        """
+        self.wait_until_ready()
+        with self._predict_lock:
+            return self.lstm_model.predict(vectors)
+
+    def status(self) -> dict:
+        """Readiness information for health checks."""
+        return {
+            "ready": self.ready,
+            "word2vec_path": self.word2vec_path,
+            "memory_mapped": isinstance(self.word2vec, MemmapKeyedVectors),
+            "vector_precision": self.word2vec.vectors.dtype.name if self.word2vec is not None else None,
+            "lstm_path": self.lstm_path,
+            "version": self.version,
+            "backend": "numpy" if isinstance(self.lstm_model, NumpyLSTMScorer) else "keras",
+            "error": self.error,
+        }
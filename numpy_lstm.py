@@ -0,0 +1,174 @@
+import argparse
+import json
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _hard_sigmoid(x: np.ndarray) -> np.ndarray:
+    return np.clip(0.2 * x + 0.5, 0.0, 1.0)
+
+
+ACTIVATIONS = {
+    "tanh": np.tanh,
+    "sigmoid": _sigmoid,
+    "hard_sigmoid": _hard_sigmoid,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "linear": lambda x: x,
+}
+
+# Layers that only matter during training
+INFERENCE_NOOP_LAYERS = {"Dropout", "InputLayer"}
+
+
+def _decode(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+
+def export_weights(h5_path: str, npz_path: str) -> List[Dict[str, Any]]:
+    """Extract the LSTM/Dense weights of a saved Keras model into a compact .npz.
+
+    Reads the HDF5 file directly with h5py, so TensorFlow is not needed.
+
+    Args:
+        h5_path: Keras model saved with model.save('....h5')
+        npz_path: Output file
+
+    Returns:
+        The layer specs stored alongside the weights
+    """
+    import h5py
+
+    arrays: Dict[str, np.ndarray] = {}
+    specs: List[Dict[str, Any]] = []
+    with h5py.File(h5_path, "r") as f:
+        config = json.loads(_decode(f.attrs["model_config"]))
+        layers = config["config"]
+        if isinstance(layers, dict):
+            layers = layers["layers"]
+        weights_root = f["model_weights"] if "model_weights" in f else f
+
+        for layer in layers:
+            kind, layer_config = layer["class_name"], layer["config"]
+            if kind in INFERENCE_NOOP_LAYERS:
+                continue
+            if kind not in ("LSTM", "Dense"):
+                raise ValueError(f"Unsupported layer type for NumPy inference: {kind}")
+
+            group = weights_root[layer_config["name"]]
+            weights = {}
+            for weight_name in (_decode(n) for n in group.attrs["weight_names"]):
+                leaf = weight_name.rsplit("/", 1)[-1].split(":")[0]
+                weights[leaf] = np.asarray(group[weight_name], dtype=np.float32)
+
+            index = len(specs)
+            spec = {"type": kind, "activation": layer_config.get("activation", "linear")}
+            if kind == "LSTM":
+                spec.update({
+                    "units": layer_config["units"],
+                    "recurrent_activation": layer_config.get("recurrent_activation", "sigmoid"),
+                    "return_sequences": layer_config.get("return_sequences", False),
+                })
+                arrays[f"layer{index}_recurrent_kernel"] = weights["recurrent_kernel"]
+            arrays[f"layer{index}_kernel"] = weights["kernel"]
+            arrays[f"layer{index}_bias"] = weights.get("bias", np.zeros(weights["kernel"].shape[1], np.float32))
+            specs.append(spec)
+
+    np.savez(npz_path, config=np.array(json.dumps(specs)), **arrays)
+    return specs
+
+
+class NumpyLSTMScorer:
+    """Pure-NumPy forward pass for the Sequential LSTM -> LSTM -> Dense scorer.
+
+    Drop-in for ``keras_model.predict`` at inference time: dropout is inactive
+    and the initial hidden and cell states are zero, exactly as in Keras.
+    """
+
+    def __init__(self, npz_path: str):
+        """Load weights written by export_weights.
+
+        Args:
+            npz_path: Path to the exported .npz file
+        """
+        with np.load(npz_path) as data:
+            self.layers: List[Dict[str, Any]] = json.loads(str(data["config"]))
+            for index, spec in enumerate(self.layers):
+                spec["kernel"] = data[f"layer{index}_kernel"]
+                spec["bias"] = data[f"layer{index}_bias"]
+                if spec["type"] == "LSTM":
+                    spec["recurrent_kernel"] = data[f"layer{index}_recurrent_kernel"]
+
+    @staticmethod
+    def _lstm(x: np.ndarray, spec: Dict[str, Any]) -> np.ndarray:
+        activation = ACTIVATIONS[spec["activation"]]
+        recurrent_activation = ACTIVATIONS[spec["recurrent_activation"]]
+        units = spec["units"]
+        batch, timesteps, _ = x.shape
+
+        # Input projections for every timestep at once; Keras gate order is i, f, c, o
+        projected = x @ spec["kernel"] + spec["bias"]
+        h = np.zeros((batch, units), dtype=np.float32)
+        c = np.zeros((batch, units), dtype=np.float32)
+        outputs = []
+        for t in range(timesteps):
+            z = projected[:, t]
+            if t:
+                z = z + h @ spec["recurrent_kernel"]
+            i = recurrent_activation(z[:, :units])
+            f = recurrent_activation(z[:, units:2 * units])
+            g = activation(z[:, 2 * units:3 * units])
+            o = recurrent_activation(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * activation(c)
+            outputs.append(h)
+        return np.stack(outputs, axis=1) if spec["return_sequences"] else h
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        """Run the network on a batch.
+
+        Args:
+            x: Array of shape (batch, timesteps, features)
+
+        Returns:
+            Array of shape (batch, 1)
+        """
+        out = np.asarray(x, dtype=np.float32)
+        for spec in self.layers:
+            if spec["type"] == "LSTM":
+                out = self._lstm(out, spec)
+            else:
+                out = ACTIVATIONS[spec["activation"]](out @ spec["kernel"] + spec["bias"])
+        return out
+
+
+def verify(h5_path: str, npz_path: str, samples: int = 256) -> float:
+    """Compare NumPy and Keras predictions on random inputs (needs TensorFlow).
+
+    Returns:
+        Largest absolute difference between the two
+    """
+    from tensorflow.keras.models import load_model
+
+    keras_model = load_model(h5_path)
+    x = np.random.default_rng(0).normal(scale=0.1, size=(samples,) + tuple(keras_model.input_shape[1:]))
+    x = x.astype(np.float32)
+    expected = keras_model.predict(x, verbose=0)
+    return float(np.max(np.abs(NumpyLSTMScorer(npz_path).predict(x) - expected)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the LSTM scorer for TensorFlow-free inference.")
+    parser.add_argument("h5_path", nargs="?", default="final_lstm.h5", help="saved Keras model")
+    parser.add_argument("npz_path", nargs="?", default="final_lstm.npz", help="output weights file")
+    parser.add_argument("--verify", action="store_true", help="compare against Keras predictions (needs TensorFlow)")
+    args = parser.parse_args()
+
+    layers = export_weights(args.h5_path, args.npz_path)
+    print(f"Exported {len(layers)} layers to {args.npz_path}: {', '.join(spec['type'] for spec in layers)}")
+    if args.verify:
+        print(f"Max absolute difference vs. Keras: {verify(args.h5_path, args.npz_path):.2e}")
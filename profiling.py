@@ -0,0 +1,225 @@
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from logs import get_logger
+
+log = get_logger(__name__)
+
+PROFILE_SUFFIXES = (".pstats", ".txt")
+
+_SLUG_RE = re.compile(r"[^A-Za-z0-9]+")
+_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class RequestProfiler:
+    """Run a sample of Flask requests under cProfile and tracemalloc.
+
+    A request is profiled when it is drawn by ``sample_rate`` or when it
+    carries ``X-Profile: 1`` together with a valid ``X-Admin-Token``. Each
+    profiled request leaves a ``.pstats`` file (load it with pstats or
+    snakeviz) and a ``.txt`` summary of the slowest functions and the top
+    allocation sites in ``directory``, which keeps only the newest
+    ``max_profiles`` of them. With no sample rate and no admin token nothing
+    is installed, so requests don't pay for the hook.
+
+    Only one request is profiled at a time: cProfile follows the thread that
+    enabled it, and tracemalloc is process-wide, so its summary can include
+    allocations made by requests running concurrently.
+    """
+
+    def __init__(self, directory: str = "profiles", sample_rate: float = 0.0, admin_token: Optional[str] = None,
+                 max_profiles: int = 50, trace_memory: bool = True, top: int = 30):
+        """Initialize the profiler.
+
+        Args:
+            directory: Where profiles are written
+            sample_rate: Fraction of requests to profile (0 profiles only on request)
+            admin_token: Token for the X-Profile header and the admin endpoints (None disables both)
+            max_profiles: Profiles kept before the oldest are deleted
+            trace_memory: Whether to trace allocations with tracemalloc as well
+            top: Functions and allocation sites listed in each summary
+        """
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.admin_token = admin_token
+        self.max_profiles = max_profiles
+        self.trace_memory = trace_memory
+        self.top = top
+        self._busy = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "RequestProfiler":
+        """Build a profiler from PROFILE_SAMPLE_RATE, PROFILE_ADMIN_TOKEN, PROFILE_DIR, PROFILE_MAX_FILES,
+        PROFILE_TRACEMALLOC and PROFILE_TOP."""
+        return cls(
+            directory=os.environ.get("PROFILE_DIR", "profiles"),
+            sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", 0)),
+            admin_token=os.environ.get("PROFILE_ADMIN_TOKEN") or None,
+            max_profiles=int(os.environ.get("PROFILE_MAX_FILES", 50)),
+            trace_memory=os.environ.get("PROFILE_TRACEMALLOC", "1") == "1",
+            top=int(os.environ.get("PROFILE_TOP", 30)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.admin_token is not None
+
+    def is_admin(self, token: Optional[str]) -> bool:
+        return self.admin_token is not None and token is not None and hmac.compare_digest(token, self.admin_token)
+
+    def _wanted(self, headers) -> bool:
+        if headers.get("X-Profile") == "1" and self.is_admin(headers.get("X-Admin-Token")):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, headers) -> Optional[Dict[str, Any]]:
+        """Begin profiling the current request if it is drawn or asked for and no other one is running.
+
+        Returns:
+            State to pass to finish(), or None if the request is not profiled
+        """
+        if not self._wanted(headers) or not self._busy.acquire(blocking=False):
+            return None
+        # Leave tracing alone if it was already started elsewhere (e.g. PYTHONTRACEMALLOC)
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        try:
+            if tracing:
+                tracemalloc.start()
+            profile = cProfile.Profile()
+            profile.enable()
+        except Exception:
+            # e.g. another profiler is already attached to the interpreter
+            if tracing:
+                tracemalloc.stop()
+            self._busy.release()
+            log.exception("Could not start request profiling")
+            return None
+        return {"profile": profile, "tracing": tracing, "started": time.perf_counter(), "wall": time.time()}
+
+    def finish(self, state: Dict[str, Any], label: str) -> Optional[str]:
+        """Stop profiling and write the profile and its summary.
+
+        Args:
+            state: What start() returned
+            label: Describes the request in the file name and summary, e.g. "POST /api/score"
+
+        Returns:
+            Base name of the written files (without suffix)
+        """
+        try:
+            state["profile"].disable()
+            seconds = time.perf_counter() - state["started"]
+            snapshot = tracemalloc.take_snapshot() if state["tracing"] else None
+            if state["tracing"]:
+                tracemalloc.stop()
+        finally:
+            self._busy.release()
+
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(state["wall"]))
+        name = f"{stamp}-{int(state['wall'] * 1000) % 1000:03d}-{_SLUG_RE.sub('-', label).strip('-').lower()}-{seconds * 1000:.0f}ms"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, name)
+            state["profile"].dump_stats(path + ".pstats")
+            with open(path + ".txt", "w", encoding="utf-8") as f:
+                f.write(self._summary(state["profile"], snapshot, label, seconds))
+            self._rotate()
+        except OSError:
+            log.exception("Could not write profile %s", name)
+            return None
+        log.info("Wrote profile %s", name)
+        return name
+
+    def _summary(self, profile: cProfile.Profile, snapshot: Optional[tracemalloc.Snapshot], label: str,
+                 seconds: float) -> str:
+        out = io.StringIO()
+        out.write(f"{label}: {seconds * 1000:.1f} ms\n\n")
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(self.top)
+        if snapshot is not None:
+            snapshot = snapshot.filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ))
+            stats = snapshot.statistics("lineno")
+            out.write(f"Top {self.top} allocation sites ({sum(s.size for s in stats) / 1024:.1f} KiB live):\n")
+            for stat in stats[:self.top]:
+                out.write(f"  {stat}\n")
+        return out.getvalue()
+
+    def _rotate(self) -> None:
+        names = sorted({os.path.splitext(f)[0] for f in os.listdir(self.directory) if f.endswith(PROFILE_SUFFIXES)})
+        for name in names[:max(0, len(names) - self.max_profiles)]:
+            for suffix in PROFILE_SUFFIXES:
+                try:
+                    os.remove(os.path.join(self.directory, name + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Written profiles, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for filename in sorted(os.listdir(self.directory), reverse=True):
+            if filename.endswith(".pstats"):
+                path = os.path.join(self.directory, filename)
+                name = filename[:-len(".pstats")]
+                profiles.append({"name": name, "created": os.path.getmtime(path), "bytes": os.path.getsize(path),
+                                 "files": [name + suffix for suffix in PROFILE_SUFFIXES
+                                           if os.path.exists(os.path.join(self.directory, name + suffix))]})
+        return profiles
+
+    def install(self, app) -> "RequestProfiler":
+        """Add the profiling hooks and the admin endpoints to a Flask app.
+
+        Does nothing when profiling is off. The admin endpoints, GET
+        /admin/profiles and GET /admin/profiles/<file>, are only added when an
+        admin token is set and require it in X-Admin-Token.
+        """
+        if not self.enabled:
+            return self
+        from flask import abort, g, jsonify, request, send_from_directory
+
+        @app.before_request
+        def _start_profile():
+            g.profile_state = self.start(request.headers)
+
+        @app.teardown_request
+        def _finish_profile(exc=None):
+            # Teardown runs after a streamed body has been sent, so the whole request is covered
+            state = g.pop("profile_state", None)
+            if state is not None:
+                self.finish(state, f"{request.method} {request.path}")
+
+        if self.admin_token is None:
+            return self
+
+        def require_admin():
+            if not self.is_admin(request.headers.get("X-Admin-Token")):
+                abort(403)
+
+        @app.route("/admin/profiles", methods=["GET"])
+        def list_profiles():
+            """List the written profiles, newest first."""
+            require_admin()
+            return jsonify({"directory": self.directory, "sample_rate": self.sample_rate,
+                            "profiles": self.list_profiles()})
+
+        @app.route("/admin/profiles/<filename>", methods=["GET"])
+        def download_profile(filename):
+            """Download a .pstats or .txt file of a profile."""
+            require_admin()
+            if not _NAME_RE.match(filename) or not filename.endswith(PROFILE_SUFFIXES):
+                abort(404)
+            return send_from_directory(os.path.abspath(self.directory), filename, as_attachment=filename.endswith(".pstats"))
+
+        return self
@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embedding_engine import EmbeddingEngine
+from vector_store import MemmapKeyedVectors, _store_paths, convert_word2vec, store_exists
+
+# Largest first; the smallest table that keeps accuracy is recommended
+PRECISIONS = ("float32", "float16", "int8")
+
+INT8_MAX = 127
+
+
+def quantize_rows(rows: np.ndarray, precision: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Convert float32 embedding rows to a smaller type.
+
+    int8 uses one symmetric scale per row (max |value| / 127), so rare words
+    with small vectors keep their resolution instead of sharing a global range.
+
+    Args:
+        rows: Array of shape (n, num_features)
+        precision: "float32", "float16" or "int8"
+
+    Returns:
+        Tuple of (table, scales); scales is None except for int8
+    """
+    if precision in ("float32", "float16"):
+        return rows.astype(precision), None
+    if precision != "int8":
+        raise ValueError(f"Unknown precision {precision!r}, expected one of {', '.join(PRECISIONS)}")
+    scales = (np.abs(rows).max(axis=1) / INT8_MAX).astype(np.float32)
+    # All-zero rows keep a zero scale and quantize to zeros
+    divisor = np.where(scales > 0, scales, 1.0)[:, None]
+    table = np.clip(np.rint(rows / divisor), -INT8_MAX, INT8_MAX).astype(np.int8)
+    return table, scales
+
+
+def quantize_store(source: str, prefix: str, precision: str, chunk_rows: int = 65536) -> Dict[str, Any]:
+    """Write a reduced-precision copy of a vector store.
+
+    The output is a regular store (``<prefix>.npy`` and ``<prefix>.vocab``,
+    plus ``<prefix>.scales.npy`` for int8) that MemmapKeyedVectors and
+    app.py open like the float32 one. Rows are converted in chunks so the
+    source is never fully loaded.
+
+    Args:
+        source: Prefix of a float32 store written by vector_store.py
+        prefix: Output path prefix
+        precision: "float32", "float16" or "int8"
+        chunk_rows: Rows converted at a time
+
+    Returns:
+        Description of the written table (rows, precision, bytes)
+    """
+    vectors = np.load(_store_paths(source)["vectors"], mmap_mode="r")
+    paths = _store_paths(prefix)
+    table = np.lib.format.open_memmap(paths["vectors"] + ".tmp", mode="w+", dtype=precision, shape=vectors.shape)
+    scales = np.empty(vectors.shape[0], dtype=np.float32) if precision == "int8" else None
+    for start in range(0, vectors.shape[0], chunk_rows):
+        rows, row_scales = quantize_rows(np.asarray(vectors[start:start + chunk_rows], dtype=np.float32), precision)
+        table[start:start + len(rows)] = rows
+        if scales is not None:
+            scales[start:start + len(rows)] = row_scales
+    table.flush()
+    nbytes = table.nbytes
+    del table
+
+    # Only publish the store once all of its files are complete
+    if scales is not None:
+        with open(paths["scales"] + ".tmp", "wb") as f:
+            np.save(f, scales)
+        nbytes += scales.nbytes
+    shutil.copyfile(_store_paths(source)["vocab"], paths["vocab"] + ".tmp")
+    os.replace(paths["vectors"] + ".tmp", paths["vectors"])
+    os.replace(paths["vocab"] + ".tmp", paths["vocab"])
+    if scales is not None:
+        os.replace(paths["scales"] + ".tmp", paths["scales"])
+    elif os.path.exists(paths["scales"]):
+        os.remove(paths["scales"])
+    return {"prefix": prefix, "precision": precision, "rows": int(vectors.shape[0]), "bytes": int(nbytes)}
+
+
+def reconstruction_error(source: str, prefix: str, chunk_rows: int = 65536) -> Dict[str, float]:
+    """How far the rows of a quantized store are from the float32 originals.
+
+    Returns:
+        Largest absolute error, RMS error and the smallest cosine similarity
+        between an original row and its dequantized copy
+    """
+    original = np.load(_store_paths(source)["vectors"], mmap_mode="r")
+    quantized = MemmapKeyedVectors(prefix)
+    max_error, squared, min_cosine = 0.0, 0.0, 1.0
+    for start in range(0, original.shape[0], chunk_rows):
+        ids = np.arange(start, min(start + chunk_rows, original.shape[0]))
+        expected = np.asarray(original[ids], dtype=np.float32)
+        rows = np.asarray(quantized.vectors[ids], dtype=np.float32)
+        if quantized.scales is not None:
+            rows *= quantized.scales[ids, None]
+        error = rows - expected
+        max_error = max(max_error, float(np.abs(error).max()))
+        squared += float(np.square(error, dtype=np.float64).sum())
+        norms = np.linalg.norm(expected, axis=1) * np.linalg.norm(rows, axis=1)
+        nonzero = norms > 0
+        if nonzero.any():
+            cosine = (expected * rows).sum(axis=1)[nonzero] / norms[nonzero]
+            min_cosine = min(min_cosine, float(cosine.min()))
+    return {"max_abs_error": max_error, "rms_error": float(np.sqrt(squared / original.size)),
+            "min_cosine": min_cosine}
+
+
+def load_heldout(data_path: str, scores_path: Optional[str] = None, test_size: float = 0.3,
+                 seed: int = 42) -> Tuple[List[str], np.ndarray]:
+    """The held-out essays and scores of the training notebook's split.
+
+    Args:
+        data_path: training_set_rel3.tsv
+        scores_path: Processed_data.csv, whose final_score column the LSTM was trained on
+            (None uses domain1_score from the TSV)
+        test_size: Held-out fraction, as passed to train_test_split
+        seed: random_state of the split
+
+    Returns:
+        Tuple of (essays, scores)
+    """
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    df = pd.read_csv(data_path, sep="\t", encoding="ISO-8859-1")
+    if scores_path:
+        df["domain1_score"] = pd.read_csv(scores_path)["final_score"]
+    _, X_test, _, y_test = train_test_split(df["essay"], df["domain1_score"], test_size=test_size,
+                                            random_state=seed)
+    return X_test.tolist(), y_test.to_numpy()
+
+
+def evaluate(stores: Dict[str, str], essays: Sequence[str], scores: np.ndarray, lstm_path: Optional[str] = None,
+             max_kappa_drop: float = 0.005, max_mse_increase: float = 0.01, batch_size: int = 256) -> Dict[str, Any]:
+    """Score a held-out set with each precision's table and compare to float32.
+
+    The essays are tokenized exactly like app.py does and scored by the
+    same LSTM; only the embedding table changes between runs.
+
+    Args:
+        stores: Precision -> store prefix; must include "float32", the reference
+        essays: Held-out essays
+        scores: Their human scores
+        lstm_path: LSTM to use (defaults to the one app.py would load)
+        max_kappa_drop: Largest acceptable drop in quadratic weighted kappa
+        max_mse_increase: Largest acceptable increase in MSE
+        batch_size: Essays per predict call
+
+    Returns:
+        Per-precision kappa, MSE, their changes, the share of essays whose
+        rounded score changed, table size and whether the precision passes,
+        plus the recommended (smallest passing) precision
+    """
+    from sklearn.metrics import cohen_kappa_score, mean_squared_error
+
+    from model_registry import ModelRegistry
+    from text_pipeline import default_tokenizer
+
+    registry = ModelRegistry(lstm_path=lstm_path, vector_store=stores["float32"])
+    registry.load()
+    tokenized = default_tokenizer().tokenize_many(essays)
+    scores = np.asarray(scores)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    reference: Optional[np.ndarray] = None
+    for precision in sorted(stores, key=PRECISIONS.index):
+        keyed_vectors = MemmapKeyedVectors(stores[precision])
+        engine = EmbeddingEngine.from_keyed_vectors(keyed_vectors)
+        predictions = np.concatenate([
+            registry.predict(engine.mean_vectors(tokenized[i:i + batch_size])[:, None, :])[:, 0]
+            for i in range(0, len(tokenized), batch_size)
+        ])
+        rounded = np.around(predictions).astype(int)
+        result = {
+            "kappa": float(cohen_kappa_score(scores, rounded, weights="quadratic")),
+            "mse": float(mean_squared_error(scores, predictions)),
+            "table_bytes": int(keyed_vectors.vectors.nbytes
+                               + (keyed_vectors.scales.nbytes if keyed_vectors.scales is not None else 0)),
+        }
+        if reference is None:
+            reference, baseline = rounded, result
+        result["kappa_change"] = result["kappa"] - baseline["kappa"]
+        result["mse_change"] = result["mse"] - baseline["mse"]
+        result["changed_scores"] = float(np.mean(rounded != reference))
+        result["passes"] = -result["kappa_change"] <= max_kappa_drop and result["mse_change"] <= max_mse_increase
+        results[precision] = result
+
+    passing = [p for p in results if results[p]["passes"]]
+    return {
+        "essays": len(essays),
+        "precisions": results,
+        "recommended": min(passing, key=lambda p: results[p]["table_bytes"]),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write float16/int8 copies of the word2vec store and check their accuracy.")
+    parser.add_argument("source", nargs="?", default="word2vecmodel",
+                        help="prefix of the float32 vector store, or a binary word2vec file to convert first")
+    parser.add_argument("--precision", nargs="+", choices=PRECISIONS[1:], default=list(PRECISIONS[1:]),
+                        help="precisions to write (to <source>.<precision>.npy)")
+    parser.add_argument("--evaluate", action="store_true",
+                        help="score the held-out set with each table (needs the training data and app.py's dependencies)")
+    parser.add_argument("--data", default="Dataset/training_set_rel3.tsv", help="essays for the held-out set")
+    parser.add_argument("--scores", default="Processed_data.csv", help="scores the LSTM was trained on ('' for domain1_score)")
+    parser.add_argument("--test-size", type=float, default=0.3, help="held-out fraction of the split")
+    parser.add_argument("--seed", type=int, default=42, help="random_state of the split")
+    parser.add_argument("--lstm", help="LSTM model to evaluate with (defaults to app.py's)")
+    parser.add_argument("--max-kappa-drop", type=float, default=0.005, help="largest acceptable drop in kappa")
+    parser.add_argument("--max-mse-increase", type=float, default=0.01, help="largest acceptable increase in MSE")
+    args = parser.parse_args()
+
+    source = args.source
+    if source.endswith(".bin"):
+        source = os.path.splitext(source)[0]
+        if not store_exists(source):
+            print(f"Converted {convert_word2vec(args.source, source)} vectors to {source}.npy")
+    stores = {"float32": source}
+    for precision in args.precision:
+        info = quantize_store(source, f"{source}.{precision}", precision)
+        error = reconstruction_error(source, info["prefix"])
+        print(f"Wrote {info['prefix']}.npy: {info['rows']} rows, {info['bytes'] / 2 ** 20:.1f} MiB, "
+              f"max error {error['max_abs_error']:.2e}, min cosine {error['min_cosine']:.6f}")
+        stores[precision] = info["prefix"]
+
+    if args.evaluate:
+        essays, scores = load_heldout(args.data, args.scores or None, args.test_size, args.seed)
+        report = evaluate(stores, essays, scores, args.lstm, args.max_kappa_drop, args.max_mse_increase)
+        print(json.dumps(report, indent=2))
+        print(f"Smallest table within tolerance: {report['recommended']} "
+              f"(serve it with WORD2VEC_STORE={stores[report['recommended']]})")
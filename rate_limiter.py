@@ -0,0 +1,302 @@
+import asyncio
+import bisect
+import itertools
+import math
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from metrics import Counter, Histogram
+
+# Priority classes; lower goes first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+QUEUE_WAIT_MS_BUCKETS = [1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 30000, 60000]
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class DeadlineExceededError(RuntimeError):
+    """Raised when a queued request could not start before its deadline."""
+
+
+def parse_reset(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """Seconds until a rate-limit window resets.
+
+    Understands epoch timestamps in milliseconds (OpenRouter's X-RateLimit-Reset)
+    or seconds, plain second counts, and durations such as "6m0s" or "20ms".
+    """
+    if not value:
+        return None
+    now = time.time() if now is None else now
+    try:
+        number = float(value)
+    except ValueError:
+        parts = _DURATION_RE.findall(value)
+        return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts) if parts else None
+    if number > 1e12:
+        return max(0.0, number / 1000.0 - now)
+    if number > 1e9:
+        return max(0.0, number - now)
+    return max(0.0, number)
+
+
+def _header(headers: Mapping[str, str], *names: str) -> Optional[str]:
+    lowered = {key.lower(): value for key, value in headers.items()}
+    for name in names:
+        if name in lowered:
+            return lowered[name]
+    return None
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """Classic token bucket; not thread-safe on its own (UpstreamScheduler locks it)."""
+
+    def __init__(self, limit: float, window_seconds: float = 60.0):
+        """Initialize a full bucket.
+
+        Args:
+            limit: Amount allowed per window
+            window_seconds: Length of the upstream's rate-limit window
+        """
+        self.window_seconds = window_seconds
+        self.limit = limit
+        self.tokens = limit
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Refill per second."""
+        return self.limit / self.window_seconds
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (0 if it can be taken now)."""
+        self._refill(now)
+        amount = min(amount, self.limit)
+        pause = max(0.0, self.paused_until - now)
+        deficit = max(0.0, amount - self.tokens)
+        return max(pause, deficit / self.rate if self.rate else math.inf)
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= min(amount, self.limit)
+
+    def give_back(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens = min(self.limit, self.tokens + amount)
+
+    def sync(self, now: float, limit: Optional[float] = None, remaining: Optional[float] = None,
+             reset_in: Optional[float] = None) -> None:
+        """Adopt what the upstream reported about this limit."""
+        self._refill(now)
+        if limit and limit != self.limit:
+            self.limit = limit
+            self.tokens = min(self.tokens, limit)
+        if remaining is not None:
+            # Our own requests still in flight aren't in the upstream's count yet,
+            # so only ever lower the local estimate
+            self.tokens = min(self.tokens, remaining)
+            if remaining <= 0 and reset_in:
+                self.paused_until = max(self.paused_until, now + reset_in)
+
+    def pause(self, now: float, seconds: float) -> None:
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+        self.paused_until = max(self.paused_until, now + seconds)
+
+
+class UpstreamScheduler:
+    """Client-side rate limiting with priority classes for upstream calls.
+
+    Every upstream attempt first acquires one request from the requests-per-
+    minute bucket and its estimated tokens from the tokens-per-minute bucket.
+    Waiting callers are served strictly by (priority, deadline, arrival), so
+    interactive requests overtake queued batch work. Both buckets start from
+    configuration and follow the upstream's rate-limit headers; a 429 pauses
+    the request bucket until the upstream's reset time.
+    """
+
+    def __init__(self, requests_per_minute: float = 20, tokens_per_minute: float = 0,
+                 window_seconds: float = 60.0, headroom: float = 0.9, poll_interval: float = 0.02):
+        """Initialize the scheduler.
+
+        Args:
+            requests_per_minute: Request limit per window (0 disables request limiting)
+            tokens_per_minute: Token limit per window (0 disables token limiting)
+            window_seconds: Length of the upstream's rate-limit window
+            headroom: Fraction of each limit to use, leaving a margin below the upstream's
+            poll_interval: How often queued callers re-check the buckets, in seconds
+        """
+        self.window_seconds = window_seconds
+        self.headroom = headroom
+        self.poll_interval = poll_interval
+        self.requests = TokenBucket(requests_per_minute * headroom, window_seconds) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute * headroom, window_seconds) if tokens_per_minute else None
+
+        self._lock = threading.Lock()
+        self._waiting: List[Tuple[int, float, int]] = []
+        self._sequence = itertools.count()
+
+        self.granted = Counter()
+        self.expired = Counter()
+        self.throttled = Counter()
+        self.queue_wait_ms = {priority: Histogram(QUEUE_WAIT_MS_BUCKETS) for priority in PRIORITY_NAMES}
+
+    @classmethod
+    def from_env(cls) -> "UpstreamScheduler":
+        """Build a scheduler from OPENROUTER_RPM, OPENROUTER_TPM, OPENROUTER_RATE_WINDOW and
+        OPENROUTER_RATE_HEADROOM."""
+        return cls(
+            requests_per_minute=float(os.environ.get("OPENROUTER_RPM", 20)),
+            tokens_per_minute=float(os.environ.get("OPENROUTER_TPM", 0)),
+            window_seconds=float(os.environ.get("OPENROUTER_RATE_WINDOW", 60)),
+            headroom=float(os.environ.get("OPENROUTER_RATE_HEADROOM", 0.9)),
+        )
+
+    def _wait_time(self, cost: float, now: float) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = self.requests.wait_time(1, now)
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(cost, now))
+        return wait
+
+    def _seconds_per_request(self) -> float:
+        return 1.0 / self.requests.rate if self.requests is not None and self.requests.rate else 0.0
+
+    async def acquire(self, cost: float = 0, priority: int = INTERACTIVE, deadline: Optional[float] = None) -> None:
+        """Wait for permission to send one upstream request.
+
+        Args:
+            cost: Estimated tokens the request will use
+            priority: INTERACTIVE or BATCH
+            deadline: time.monotonic() by which the request must have started
+
+        Raises:
+            DeadlineExceededError: As soon as the expected wait would run past the deadline
+        """
+        enqueued = time.monotonic()
+        entry = (priority, deadline if deadline is not None else math.inf, next(self._sequence))
+        with self._lock:
+            bisect.insort(self._waiting, entry)
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    ahead = bisect.bisect_left(self._waiting, entry)
+                    wait = self._wait_time(cost, now)
+                    if ahead == 0 and wait <= 0:
+                        if self.requests is not None:
+                            self.requests.take(1, now)
+                        if self.tokens is not None:
+                            self.tokens.take(cost, now)
+                        break
+                    expected = wait + ahead * self._seconds_per_request()
+                if deadline is not None and now + expected > deadline:
+                    self.expired.inc()
+                    raise DeadlineExceededError(f"rate limit wait of ~{expected:.1f}s would miss the deadline")
+                # The head sleeps until its tokens are due; the rest re-check less often the further back they are
+                if ahead == 0:
+                    delay = min(wait, self.poll_interval)
+                else:
+                    delay = min(1.0, max(self.poll_interval, 0.5 * ahead * self._seconds_per_request()))
+                await asyncio.sleep(delay)
+        finally:
+            with self._lock:
+                index = bisect.bisect_left(self._waiting, entry)
+                if index < len(self._waiting) and self._waiting[index] == entry:
+                    del self._waiting[index]
+        self.granted.inc()
+        self.queue_wait_ms[priority].observe((time.monotonic() - enqueued) * 1000.0)
+
+    def estimated_wait(self, requests: int) -> float:
+        """Seconds until `requests` more upstream requests could all have started, behind everyone queued now.
+
+        Only the request limit is considered; the token limit depends on answer sizes not known in advance.
+        """
+        if requests <= 0:
+            return 0.0
+        with self._lock:
+            if self.requests is None:
+                return 0.0
+            now = time.monotonic()
+            self.requests._refill(now)
+            pause = max(0.0, self.requests.paused_until - now)
+            deficit = max(0.0, requests + len(self._waiting) - self.requests.tokens)
+            return pause + (deficit / self.requests.rate if self.requests.rate else math.inf)
+
+    def settle(self, reserved: float, used: Optional[float]) -> None:
+        """Correct the token bucket once a request's real usage is known."""
+        if self.tokens is None or used is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if used < reserved:
+                self.tokens.give_back(reserved - used, now)
+            else:
+                self.tokens.take(used - reserved, now)
+
+    def observe(self, status: int, headers: Mapping[str, str]) -> None:
+        """Adjust the buckets from an upstream response's status and rate-limit headers."""
+        request_limit = _number(_header(headers, "x-ratelimit-limit-requests", "x-ratelimit-limit"))
+        request_remaining = _number(_header(headers, "x-ratelimit-remaining-requests", "x-ratelimit-remaining"))
+        request_reset = parse_reset(_header(headers, "x-ratelimit-reset-requests", "x-ratelimit-reset"))
+        token_limit = _number(_header(headers, "x-ratelimit-limit-tokens"))
+        token_remaining = _number(_header(headers, "x-ratelimit-remaining-tokens"))
+        token_reset = parse_reset(_header(headers, "x-ratelimit-reset-tokens"))
+
+        with self._lock:
+            now = time.monotonic()
+            if self.requests is None and request_limit:
+                self.requests = TokenBucket(request_limit * self.headroom, self.window_seconds)
+            if self.requests is not None:
+                self.requests.sync(now, request_limit and request_limit * self.headroom, request_remaining, request_reset)
+            if self.tokens is None and token_limit:
+                self.tokens = TokenBucket(token_limit * self.headroom, self.window_seconds)
+            if self.tokens is not None:
+                self.tokens.sync(now, token_limit and token_limit * self.headroom, token_remaining, token_reset)
+            if status == 429:
+                self.throttled.inc()
+                retry_after = parse_reset(_header(headers, "retry-after")) or request_reset or self._seconds_per_request() or 1.0
+                if self.requests is not None:
+                    self.requests.pause(now, retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current limits, available capacity, queue depth and queue waits per priority class."""
+        with self._lock:
+            now = time.monotonic()
+            buckets = {}
+            for name, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+                if bucket is not None:
+                    bucket._refill(now)
+                    buckets[name] = {"limit": round(bucket.limit, 1), "available": round(bucket.tokens, 1),
+                                     "paused_s": round(max(0.0, bucket.paused_until - now), 2)}
+            queued = {name: sum(1 for entry in self._waiting if entry[0] == priority)
+                      for priority, name in PRIORITY_NAMES.items()}
+        return {
+            "window_seconds": self.window_seconds,
+            "buckets": buckets,
+            "queued": queued,
+            "granted": self.granted.value,
+            "expired": self.expired.value,
+            "throttled": self.throttled.value,
+            "queue_wait_ms": {name: self.queue_wait_ms[priority].snapshot() for priority, name in PRIORITY_NAMES.items()},
+        }
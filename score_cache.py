@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from metrics import timer
+
+
+def normalize_essay(essay_text: str) -> str:
+    """Collapse whitespace so trivially different resubmissions share a key."""
+    return " ".join(essay_text.split())
+
+
+class ScoreCache:
+    """Two-tier cache for essay scores.
+
+    A bounded in-process LRU sits in front of an optional SQLite file that
+    survives restarts and is shared by every worker on the host. Entries are
+    keyed by a hash of the normalized essay and everything else that changes
+    the result (model, prompt version, temperature).
+    """
+
+    def __init__(self, max_entries: int = 1024, db_path: Optional[str] = None,
+                 ttl: float = 7 * 24 * 3600, max_disk_entries: int = 100000):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of results kept in memory
+            db_path: SQLite file for the persistent tier (None disables it)
+            ttl: Seconds before a persisted entry expires
+            max_disk_entries: Maximum number of persisted entries; the least
+                recently used ones are evicted beyond that
+        """
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_entries = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS scores ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS scores_accessed ON scores (accessed)")
+            self._disk_entries = self._db.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    @classmethod
+    def from_env(cls) -> "ScoreCache":
+        """Build a cache from SCORE_CACHE_SIZE, SCORE_CACHE_PATH, SCORE_CACHE_TTL and SCORE_CACHE_MAX_DISK."""
+        return cls(
+            max_entries=int(os.environ.get("SCORE_CACHE_SIZE", 1024)),
+            db_path=os.environ.get("SCORE_CACHE_PATH", "score_cache.sqlite3") or None,
+            ttl=float(os.environ.get("SCORE_CACHE_TTL", 7 * 24 * 3600)),
+            max_disk_entries=int(os.environ.get("SCORE_CACHE_MAX_DISK", 100000)),
+        )
+
+    @staticmethod
+    def make_key(essay_text: str, model: str, prompt_version: str, temperature: float = 0.0,
+                 normalize: bool = True) -> str:
+        """Content-addressed key for one scoring configuration.
+
+        Args:
+            essay_text: The essay text
+            model: Model or scorer name
+            prompt_version: Version of the prompt or feature pipeline
+            temperature: Sampling temperature used upstream
+            normalize: Whether to collapse whitespace first; turn this off for
+                scorers whose result depends on the exact layout
+
+        Returns:
+            Hex SHA-256 digest
+        """
+        text = normalize_essay(essay_text) if normalize else essay_text
+        payload = json.dumps([text, model, prompt_version, temperature])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look a key up in memory, then on disk.
+
+        Returns:
+            A fresh copy of the cached result, or None on a miss
+        """
+        with timer("cache_lookup"), self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return json.loads(value)
+
+            if self._db is not None:
+                now = time.time()
+                row = self._db.execute("SELECT value, created FROM scores WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] <= self.ttl:
+                    self._db.execute("UPDATE scores SET accessed = ? WHERE key = ?", (now, key))
+                    self._remember(key, row[0])
+                    self._stats["disk_hits"] += 1
+                    return json.loads(row[0])
+                if row is not None:
+                    self._db.execute("DELETE FROM scores WHERE key = ?", (key,))
+                    self._disk_entries -= 1
+
+            self._stats["misses"] += 1
+            return None
+
+    def contains(self, key: str) -> bool:
+        """Whether get() would hit, without counting a lookup or refreshing the entry."""
+        with self._lock:
+            if key in self._memory:
+                return True
+            if self._db is None:
+                return False
+            row = self._db.execute("SELECT created FROM scores WHERE key = ?", (key,)).fetchone()
+            return row is not None and time.time() - row[0] <= self.ttl
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a result in both tiers."""
+        value = json.dumps(result)
+        with self._lock:
+            self._remember(key, value)
+            self._stats["stores"] += 1
+            if self._db is not None:
+                now = time.time()
+                inserted = self._db.execute(
+                    "INSERT OR IGNORE INTO scores (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now)).rowcount
+                if not inserted:
+                    self._db.execute("UPDATE scores SET value = ?, created = ?, accessed = ? WHERE key = ?",
+                                     (value, now, now, key))
+                self._disk_entries += inserted
+                if self._disk_entries > self.max_disk_entries:
+                    self._evict_disk(now)
+
+    def _remember(self, key: str, value: str) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now: float) -> None:
+        """Drop expired entries, then the least recently used tenth beyond the limit."""
+        self._db.execute("DELETE FROM scores WHERE created < ?", (now - self.ttl,))
+        count = self._db.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        excess = count - self.max_disk_entries
+        if excess > 0:
+            # Evict in chunks so we don't pay for an eviction on every insert
+            excess += self.max_disk_entries // 10
+            self._db.execute(
+                "DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY accessed LIMIT ?)", (excess,))
+        remaining = self._db.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        self._stats["evictions"] += self._disk_entries - remaining
+        self._disk_entries = remaining
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = self._disk_entries if self._db is not None else None
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,233 @@
+"""Sparse n-gram + handcrafted feature matrices for the LR/SVR/RF essay models.
+
+The notebook built its training matrix with CountVectorizer(...).toarray()
+and np.concatenate, a dense essays x 10k matrix that is almost all zeros.
+SparseFeatureAssembler keeps the n-gram counts in CSR form and hstacks the
+numeric features next to them as sparse columns; scikit-learn's
+LinearRegression, SVR and RandomForestRegressor all fit and predict on that
+directly.
+
+    python sparse_features.py features.parquet --mode count --model rf
+    python sparse_features.py features.parquet --mode hashing --no-dense
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+MODES = ("count", "hashing")
+
+
+def matrix_bytes(matrix) -> int:
+    """Memory held by a dense array or a CSR/CSC matrix."""
+    if sparse.issparse(matrix):
+        return int(matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes)
+    return int(matrix.nbytes)
+
+
+class SparseFeatureAssembler:
+    """Builds CSR feature matrices from essay texts and numeric feature columns.
+
+    In "count" mode the n-gram vocabulary is learned by fit(), like the
+    notebook's CountVectorizer. In "hashing" mode n-grams are hashed into
+    ``n_features`` columns: nothing is fitted, so new essays can be
+    vectorized in a stream (see transform_stream) without the vocabulary,
+    at the cost of occasional collisions and no feature names.
+
+    Numeric features come first and the n-gram columns after them, the
+    layout of the notebook's np.concatenate.
+    """
+
+    def __init__(self, mode: str = "count", max_features: int = 10000, ngram_range: Tuple[int, int] = (1, 3),
+                 stop_words: Optional[str] = "english", n_features: int = 2 ** 18, dtype=np.float64):
+        """Initialize the assembler.
+
+        Args:
+            mode: "count" (fitted vocabulary) or "hashing" (stateless)
+            max_features: Vocabulary size in count mode
+            ngram_range: Smallest and largest n-gram length
+            stop_words: Stopword list passed to the vectorizer
+            n_features: Hash space in hashing mode
+            dtype: Value type of the assembled matrices
+        """
+        from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}, expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.dtype = dtype
+        if mode == "count":
+            self.vectorizer = CountVectorizer(max_features=max_features, ngram_range=ngram_range,
+                                              stop_words=stop_words, dtype=dtype)
+        else:
+            # Raw counts, like CountVectorizer: no sign flipping, no normalization
+            self.vectorizer = HashingVectorizer(n_features=n_features, ngram_range=ngram_range, stop_words=stop_words,
+                                                alternate_sign=False, norm=None, dtype=dtype)
+        self.numeric_columns: Optional[List[str]] = None
+        # Numeric columns of the first matrix; every later one must match so the columns line up
+        self.n_numeric: Optional[int] = None
+        self.fitted = mode == "hashing"
+
+    def _numeric(self, numeric) -> Optional[sparse.csr_matrix]:
+        values = None if numeric is None else np.asarray(numeric, dtype=self.dtype)
+        n_numeric = 0 if values is None else values.shape[1]
+        if self.n_numeric is None:
+            self.n_numeric = n_numeric
+        elif n_numeric != self.n_numeric:
+            raise ValueError(f"Expected {self.n_numeric} numeric feature columns, got {n_numeric}")
+        columns = list(getattr(numeric, "columns", []))
+        if self.numeric_columns is not None and columns and columns != self.numeric_columns:
+            raise ValueError(f"Expected numeric columns {self.numeric_columns}, got {columns}")
+        return None if values is None else sparse.csr_matrix(values)
+
+    def _assemble(self, text_counts: sparse.csr_matrix, numeric) -> sparse.csr_matrix:
+        extra = self._numeric(numeric)
+        if extra is None:
+            return text_counts.tocsr()
+        if extra.shape[0] != text_counts.shape[0]:
+            raise ValueError(f"{text_counts.shape[0]} texts but {extra.shape[0]} rows of numeric features")
+        return sparse.hstack([extra, text_counts], format="csr", dtype=self.dtype)
+
+    def fit(self, texts: Iterable[str], numeric=None) -> "SparseFeatureAssembler":
+        """Learn the n-gram vocabulary (count mode) and remember the numeric column names."""
+        self.fit_transform(texts, numeric)
+        return self
+
+    def fit_transform(self, texts: Iterable[str], numeric=None) -> sparse.csr_matrix:
+        """Fit and return the feature matrix of the training essays.
+
+        Args:
+            texts: Cleaned essay texts (the clean_essay column)
+            numeric: Optional 2-D array or DataFrame of handcrafted features, one row per text
+
+        Returns:
+            CSR matrix of shape (len(texts), n_numeric + n_text_features)
+        """
+        self.numeric_columns = list(numeric.columns) if hasattr(numeric, "columns") else None
+        self.n_numeric = None
+        counts = self.vectorizer.fit_transform(texts)
+        self.fitted = True
+        return self._assemble(counts, numeric)
+
+    def transform(self, texts: Iterable[str], numeric=None) -> sparse.csr_matrix:
+        """Feature matrix of new essays, with the same columns as the training matrix."""
+        if not self.fitted:
+            raise RuntimeError("Call fit() first, or use mode='hashing'")
+        return self._assemble(self.vectorizer.transform(texts), numeric)
+
+    def transform_stream(self, batches: Iterable[Tuple[Sequence[str], Any]]) -> Iterator[sparse.csr_matrix]:
+        """Vectorize (texts, numeric) batches one at a time, e.g. chunks of a large file."""
+        for texts, numeric in batches:
+            yield self.transform(texts, numeric)
+
+    @property
+    def n_text_features(self) -> int:
+        if self.mode == "hashing":
+            return self.vectorizer.n_features
+        return len(self.vectorizer.vocabulary_)
+
+    def feature_names(self) -> List[str]:
+        """Column names (count mode only; hashed columns have no names)."""
+        if self.mode == "hashing":
+            raise ValueError("Hashed n-gram columns have no names")
+        names = getattr(self.vectorizer, "get_feature_names_out", None) or self.vectorizer.get_feature_names
+        return list(self.numeric_columns or []) + list(names())
+
+
+MODELS = ("lr", "svr", "rf")
+
+
+def make_model(name: str):
+    """A fresh, unfitted model with the notebook's settings."""
+    if name == "lr":
+        from sklearn.linear_model import LinearRegression
+
+        return LinearRegression()
+    if name == "svr":
+        from sklearn.svm import SVR
+
+        return SVR(C=1.0, epsilon=0.2)
+    if name == "rf":
+        from sklearn.ensemble import RandomForestRegressor
+
+        return RandomForestRegressor(n_estimators=1000, random_state=42, n_jobs=-1)
+    raise ValueError(f"Unknown model {name!r}, expected one of {', '.join(MODELS)}")
+
+
+def train_model(name: str, X, y):
+    """Fit one of the notebook's models ("lr", "svr" or "rf"); X may be a CSR matrix or a dense array."""
+    return make_model(name).fit(X, y)
+
+
+def _measure(func: Callable[[], Any]) -> Tuple[Any, Dict[str, float]]:
+    """Run func and report its wall time and peak traced memory (NumPy and SciPy allocations included)."""
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    if not tracing:
+        tracemalloc.stop()
+    return result, {"seconds": round(seconds, 3), "peak_mib": round(peak / 2 ** 20, 1)}
+
+
+def compare(texts: Sequence[str], numeric: np.ndarray, y: np.ndarray, mode: str = "count",
+            models: Sequence[str] = (), dense: bool = True, test_size: float = 0.3, seed: int = 42) -> Dict[str, Any]:
+    """Time the dense (notebook) and sparse feature paths, and optionally train and score models on both.
+
+    Returns:
+        Per path: assembly time and peak memory, matrix shape and bytes, and
+        each model's fit/predict time, peak memory and test MSE
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.metrics import mean_squared_error
+    from sklearn.model_selection import train_test_split
+
+    def dense_path():
+        counts = CountVectorizer(max_features=10000, ngram_range=(1, 3), stop_words="english").fit_transform(texts)
+        return np.concatenate((numeric, counts.toarray()), axis=1)
+
+    paths = {"sparse": lambda: SparseFeatureAssembler(mode).fit_transform(texts, numeric)}
+    if dense:
+        paths = {"dense": dense_path, **paths}
+
+    report: Dict[str, Any] = {"essays": len(texts), "mode": mode}
+    for name, build in paths.items():
+        X, stats = _measure(build)
+        stats.update(shape=list(X.shape), matrix_mib=round(matrix_bytes(X) / 2 ** 20, 1))
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=seed)
+        for model_name in models:
+            model, fit_stats = _measure(lambda: train_model(model_name, X_train, y_train))
+            predictions, predict_stats = _measure(lambda: model.predict(X_test))
+            stats[model_name] = {"fit": fit_stats, "predict": predict_stats,
+                                 "mse": round(float(mean_squared_error(y_test, predictions)), 4)}
+        report[name] = stats
+        del X, X_train, X_test
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare dense and sparse feature matrices for the essay models.")
+    parser.add_argument("features", nargs="?", default="features.parquet", help="feature store from feature_pipeline.py")
+    parser.add_argument("--mode", choices=MODES, default="count", help="n-gram vectorizer of the sparse path")
+    parser.add_argument("--model", action="append", choices=MODELS, default=[],
+                        help="also fit and evaluate this model on both paths (repeatable)")
+    parser.add_argument("--no-dense", action="store_true", help="skip the dense baseline (it needs several GB)")
+    parser.add_argument("--limit", type=int, help="use only the first N essays")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    data = pd.read_parquet(args.features)
+    if args.limit:
+        data = data.iloc[:args.limit]
+    result = compare(data["clean_essay"].tolist(), data.iloc[:, 5:].to_numpy(dtype=np.float64),
+                     data["final_score"].to_numpy(), args.mode, args.model, not args.no_dense)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,242 @@
+import argparse
+import os
+import re
+import time
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def _lexicon_paths(prefix: str) -> Dict[str, str]:
+    return {name: f"{prefix}.{name}.npy" for name in ("words", "counts", "deletes", "delete_ids", "distance")}
+
+
+def lexicon_exists(prefix: str) -> bool:
+    """Whether a lexicon was saved under the given prefix."""
+    paths = _lexicon_paths(prefix)
+    return os.path.exists(paths["words"]) and os.path.exists(paths["counts"])
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    """Every string obtained by deleting up to max_distance characters (the word itself included).
+
+    Deletes go all the way down to "", which is what lets short words match each other: "ab" and "cd"
+    are two edits apart, and only share the delete "".
+    """
+    found = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - found
+        found |= frontier
+    return found
+
+
+def _hash(text: str) -> int:
+    # Stable across processes, unlike hash(); collisions only add candidates that the distance check drops
+    return zlib.crc32(text.encode("ascii"))
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (insertions, deletions, substitutions, adjacent swaps),
+    or limit + 1 as soon as it is known to exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SpellLexicon:
+    """Deduplicated, sorted word list for counting spelling errors.
+
+    Replaces membership tests against the list of every token of big.txt
+    (a linear scan per word) with a binary search over the distinct words,
+    and a whole essay is looked up with one vectorized searchsorted. The
+    lexicon is saved as plain .npy files that load memory-mapped, so every
+    worker shares one copy and opening it costs milliseconds.
+
+    Built with max_distance > 0 it also stores a symmetric-delete index
+    (hashes of every word with up to max_distance characters removed), from
+    which suggest() finds corrections without comparing against every word.
+    """
+
+    def __init__(self, words: np.ndarray, counts: np.ndarray, deletes: Optional[np.ndarray] = None,
+                 delete_ids: Optional[np.ndarray] = None, max_distance: int = 0):
+        """Initialize the lexicon from its arrays (use build(), from_corpus() or load()).
+
+        Args:
+            words: Sorted, distinct lowercase words as a fixed-width bytes array
+            counts: Corpus frequency of each word
+            deletes: Sorted hashes of the words' deletes
+            delete_ids: Word index for each entry of deletes
+            max_distance: Largest edit distance the delete index covers
+        """
+        self.words = words
+        self.counts = counts
+        self.deletes = deletes
+        self.delete_ids = delete_ids
+        self.max_distance = max_distance if deletes is not None else 0
+
+    @classmethod
+    def build(cls, counts: Dict[str, int], max_distance: int = 0) -> "SpellLexicon":
+        """Build a lexicon from word frequencies.
+
+        Args:
+            counts: Word -> frequency (words must be ASCII)
+            max_distance: Edit distance suggest() supports (0 skips the delete index; 2 is typical)
+        """
+        vocabulary = sorted(counts)
+        width = max(map(len, vocabulary), default=1)
+        words = np.array([w.encode("ascii") for w in vocabulary], dtype=f"S{width}")
+        frequencies = np.array([counts[w] for w in vocabulary], dtype=np.uint32)
+        if max_distance <= 0:
+            return cls(words, frequencies)
+
+        hashes: List[int] = []
+        ids: List[int] = []
+        for index, word in enumerate(vocabulary):
+            for deleted in _deletes(word, max_distance):
+                hashes.append(_hash(deleted))
+                ids.append(index)
+        deletes = np.array(hashes, dtype=np.uint32)
+        order = np.argsort(deletes, kind="stable")
+        return cls(words, frequencies, deletes[order], np.array(ids, dtype=np.uint32)[order], max_distance)
+
+    @classmethod
+    def from_corpus(cls, path: str, max_distance: int = 0) -> "SpellLexicon":
+        """Build a lexicon from the lowercase words of a text file, e.g. big.txt."""
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            counts = Counter(_WORD_RE.findall(f.read().lower()))
+        return cls.build(counts, max_distance)
+
+    def save(self, prefix: str) -> None:
+        """Write the lexicon as <prefix>.words.npy and .counts.npy, plus .deletes.npy, .delete_ids.npy and
+        .distance.npy for the delete index."""
+        paths = _lexicon_paths(prefix)
+        arrays = {"words": self.words, "counts": self.counts}
+        if self.deletes is not None:
+            arrays.update(deletes=self.deletes, delete_ids=self.delete_ids,
+                          distance=np.array([self.max_distance], dtype=np.int64))
+        for name, array in arrays.items():
+            with open(paths[name] + ".tmp", "wb") as f:
+                np.save(f, array)
+        # Only publish the lexicon once every file is complete
+        for name in ("distance", "deletes", "delete_ids", "counts", "words"):
+            if name in arrays:
+                os.replace(paths[name] + ".tmp", paths[name])
+            elif os.path.exists(paths[name]):
+                os.remove(paths[name])
+
+    @classmethod
+    def load(cls, prefix: str, mmap: bool = True) -> "SpellLexicon":
+        """Open a saved lexicon, memory-mapped unless mmap is False."""
+        paths = _lexicon_paths(prefix)
+        mode = "r" if mmap else None
+        words = np.load(paths["words"], mmap_mode=mode)
+        counts = np.load(paths["counts"], mmap_mode=mode)
+        if os.path.exists(paths["deletes"]):
+            return cls(words, counts, np.load(paths["deletes"], mmap_mode=mode),
+                       np.load(paths["delete_ids"], mmap_mode=mode), int(np.load(paths["distance"])[0]))
+        return cls(words, counts)
+
+    @classmethod
+    def from_env(cls) -> Optional["SpellLexicon"]:
+        """Open the lexicon at SPELL_LEXICON (default spell_lexicon), or None if it has not been built."""
+        prefix = os.environ.get("SPELL_LEXICON", "spell_lexicon")
+        return cls.load(prefix) if lexicon_exists(prefix) else None
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return bool(self.contains([word])[0])
+
+    def _encode(self, words: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        encoded = [w.encode("ascii", "replace") for w in words]
+        # Longer words cannot be in the lexicon, but would match a truncated entry
+        fits = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)) <= self.words.dtype.itemsize
+        return np.array(encoded, dtype=self.words.dtype), fits
+
+    def lookup(self, words: Sequence[str]) -> np.ndarray:
+        """Row of each word in the lexicon, or -1 for unknown words (one searchsorted for all of them)."""
+        if not len(words) or not len(self.words):
+            return np.full(len(words), -1, dtype=np.int64)
+        keys, fits = self._encode(words)
+        positions = np.searchsorted(self.words, keys)
+        np.minimum(positions, len(self.words) - 1, out=positions)
+        return np.where((self.words[positions] == keys) & fits, positions, -1)
+
+    def contains(self, words: Sequence[str]) -> np.ndarray:
+        """Whether each word is in the lexicon, as a boolean array."""
+        return self.lookup(words) >= 0
+
+    def count_unknown(self, words: Sequence[str]) -> int:
+        """Number of words not in the lexicon."""
+        return int(len(words) - np.count_nonzero(self.contains(words)))
+
+    def suggest(self, word: str, max_distance: Optional[int] = None, limit: int = 5) -> List[Tuple[str, int, int]]:
+        """Known words within an edit distance of word, closest and most frequent first.
+
+        Args:
+            word: Lowercase word to correct
+            max_distance: Largest edit distance (defaults to, and may not exceed, the one the index was built with)
+            limit: Maximum number of suggestions
+
+        Returns:
+            List of (word, distance, corpus frequency)
+
+        Raises:
+            ValueError: If the lexicon has no delete index for that distance
+        """
+        max_distance = self.max_distance if max_distance is None else max_distance
+        if max_distance > self.max_distance:
+            raise ValueError(f"The lexicon's delete index covers edit distance {self.max_distance}, "
+                             f"not {max_distance}; rebuild it with --max-distance {max_distance}")
+        index = int(self.lookup([word])[0])
+        if index >= 0:
+            return [(word, 0, int(self.counts[index]))]
+        if max_distance == 0:
+            return []
+        hashes = np.array(sorted({_hash(d) for d in _deletes(word, max_distance) if d.isascii()}), dtype=np.uint32)
+        starts = np.searchsorted(self.deletes, hashes, side="left")
+        ends = np.searchsorted(self.deletes, hashes, side="right")
+        candidates = np.unique(np.concatenate([self.delete_ids[s:e] for s, e in zip(starts, ends)] or
+                                              [np.empty(0, dtype=np.uint32)]))
+        found = []
+        for index in candidates.tolist():
+            candidate = self.words[index].decode("ascii")
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                found.append((candidate, distance, int(self.counts[index])))
+        found.sort(key=lambda item: (item[1], -item[2], item[0]))
+        return found[:limit]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the spelling lexicon used for the spell_err_count feature.")
+    parser.add_argument("corpus", nargs="?", default="big.txt", help="text file of correctly spelled words")
+    parser.add_argument("prefix", nargs="?", default="spell_lexicon", help="output path prefix")
+    parser.add_argument("--max-distance", type=int, default=2,
+                        help="edit distance covered by the suggestion index (0 builds the lookup only)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    lexicon = SpellLexicon.from_corpus(args.corpus, args.max_distance)
+    lexicon.save(args.prefix)
+    size = sum(os.path.getsize(p) for p in _lexicon_paths(args.prefix).values() if os.path.exists(p))
+    print(f"Wrote {len(lexicon)} words ({size / 2 ** 20:.1f} MiB, edit distance {lexicon.max_distance}) "
+          f"to {args.prefix}.*.npy in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,123 @@
+"""Tests for circuit_breaker.py (run with python -m pytest)."""
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", fake.monotonic)
+    return fake
+
+
+def _breaker(**overrides):
+    settings = dict(window_size=4, min_calls=4, failure_rate=0.5, slow_call_seconds=1.0, slow_call_rate=1.0,
+                    open_seconds=30.0, half_open_calls=2)
+    settings.update(overrides)
+    return CircuitBreaker(**settings)
+
+
+def _fail(breaker, times):
+    for _ in range(times):
+        breaker.record(False, 0.1, breaker.allow())
+
+
+def test_trips_after_failure_rate(clock):
+    breaker = _breaker()
+    for success in (True, True, False):
+        breaker.record(success, 0.1, breaker.allow())
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record(False, 0.1, breaker.allow())
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.trips.value == 1 and breaker.rejected.value == 1
+
+
+def test_slow_calls_trip(clock):
+    breaker = _breaker(slow_call_rate=0.75)
+    for _ in range(3):
+        breaker.record(True, 5.0, breaker.allow())
+    breaker.record(True, 0.1, breaker.allow())
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_open_half_open_closed(clock):
+    breaker = _breaker()
+    _fail(breaker, 4)
+    clock.now += 29
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    first, second = breaker.allow(), breaker.allow()
+    assert first and second
+    assert not breaker.allow()  # only half_open_calls probes at a time
+    breaker.record(True, 0.1, first)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(True, 0.1, second)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_bad_probe_reopens(clock):
+    breaker = _breaker()
+    _fail(breaker, 4)
+    clock.now += 30
+    probe = breaker.allow()
+    breaker.record(True, 2.0, probe)  # slow counts as bad
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.trips.value == 2
+
+
+def test_released_probe_frees_its_slot(clock):
+    breaker = _breaker(half_open_calls=1)
+    _fail(breaker, 4)
+    clock.now += 30
+    probe = breaker.allow()
+    assert not breaker.allow()
+    breaker.release(probe)
+    assert breaker.allow()
+
+
+def test_closed_call_finishing_in_half_open_is_not_a_probe(clock):
+    breaker = _breaker(half_open_calls=1)
+    straggler = breaker.allow()  # admitted while closed
+    _fail(breaker, 4)
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    # Neither a success nor a failure of the straggler may decide the probe phase
+    breaker.record(True, 0.1, straggler)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(False, 0.1, straggler)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.release(straggler)
+
+    probe = breaker.allow()
+    assert probe and not breaker.allow()
+    breaker.record(True, 0.1, probe)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_probe_from_earlier_half_open_is_ignored(clock):
+    breaker = _breaker(half_open_calls=2)
+    _fail(breaker, 4)
+    clock.now += 30
+    slow_probe, bad_probe = breaker.allow(), breaker.allow()
+    breaker.record(False, 0.1, bad_probe)
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # The first half-open phase's other probe finishes now; it must not count for this phase
+    breaker.record(True, 0.1, slow_probe)
+    first, second = breaker.allow(), breaker.allow()
+    assert first and second
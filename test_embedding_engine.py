@@ -0,0 +1,68 @@
+"""Tests for embedding_engine.py (run with python -m pytest)."""
+import numpy as np
+import pytest
+
+from embedding_engine import EmbeddingEngine, engine_for
+
+WORDS = ["the", "essay", "argues", "well", "poorly"]
+
+
+def _make_vec(words, vectors, key_to_index):
+    """The per-word loop the engine replaced (makeVec in the notebook)."""
+    total = np.zeros(vectors.shape[1], dtype=np.float32)
+    count = 0
+    for word in words:
+        if word in key_to_index:
+            total += vectors[key_to_index[word]]
+            count += 1
+    return total / count
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).normal(size=(len(WORDS), 6)).astype(np.float32)
+
+
+def test_means_match_the_word_loop(vectors):
+    engine = EmbeddingEngine(vectors, WORDS)
+    essays = [["the", "essay", "argues", "well"], ["well", "well", "unknown", "poorly"], ["essay"]]
+    means = engine.mean_vectors(essays)
+    assert means.shape == (3, 6) and means.dtype == np.float32
+    for essay, mean in zip(essays, means):
+        np.testing.assert_allclose(mean, _make_vec(essay, vectors, engine.key_to_index), rtol=1e-6)
+
+
+def test_essays_without_known_words_are_zero(vectors):
+    engine = EmbeddingEngine(vectors, WORDS)
+    means = engine.mean_vectors([[], ["unknown"], ["essay"]])
+    assert not np.isnan(means).any()
+    assert not means[:2].any() and means[2].any()
+    assert engine.mean_vectors([[]]).shape == (1, 6)
+
+
+def test_encode_drops_unknown_words(vectors):
+    ids, lengths = EmbeddingEngine(vectors, WORDS).encode([["essay", "zzz", "the"], [], ["poorly"]])
+    assert ids.tolist() == [1, 0, 4]
+    assert lengths.tolist() == [2, 0, 1]
+
+
+def test_int8_rows_are_scaled(vectors):
+    scales = np.abs(vectors).max(axis=1) / 127
+    table = np.rint(vectors / scales[:, None]).astype(np.int8)
+    with pytest.raises(ValueError, match="scales"):
+        EmbeddingEngine(table, WORDS)
+    means = EmbeddingEngine(table, WORDS, scales=scales).mean_vectors([WORDS])
+    np.testing.assert_allclose(means[0], vectors.mean(axis=0), atol=0.02)
+
+
+def test_engine_for_caches_per_model(vectors):
+    class KeyedVectors:
+        def __init__(self):
+            self.vectors = vectors
+            self.index_to_key = WORDS
+
+    model = KeyedVectors()
+    engine = engine_for(model)
+    assert engine_for(model) is engine
+    assert engine_for(engine) is engine
+    assert engine_for(KeyedVectors()) is not engine
@@ -0,0 +1,81 @@
+"""Tests for feature_pipeline.py (run with python -m pytest)."""
+import numpy as np
+import pytest
+
+from feature_pipeline import FeatureCache, build_feature_store, normalize_scores, strip_anonymized
+
+ESSAYS = [
+    (1, 1, "Dear @CAPS1, computers help people learn. They are great!", 8),
+    (2, 2, "I think @PERSON1 is right. Libraries should not censor books.", 4),
+    (3, 8, "Laughter is the shortest distance between two people.", 45),
+]
+
+
+def _require_pipeline_dependencies():
+    pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    nltk = pytest.importorskip("nltk")
+    # Punkt comes as punkt_tab since NLTK 3.8.2
+    for resources in (["corpora/stopwords"], ["tokenizers/punkt_tab", "tokenizers/punkt"]):
+        for resource in resources:
+            try:
+                nltk.data.find(resource)
+                break
+            except LookupError:
+                pass
+        else:
+            pytest.skip(f"NLTK data {resources[0]} is not installed")
+
+
+def _write_tsv(path, rows):
+    lines = ["essay_id\tessay_set\tessay\tdomain1_score"]
+    lines += [f"{essay_id}\t{essay_set}\t{essay}\t{score}" for essay_id, essay_set, essay, score in rows]
+    path.write_text("\n".join(lines) + "\n", encoding="ISO-8859-1")
+
+
+def test_normalize_scores_matches_the_notebook():
+    def normalize(essay_set, score):
+        low, high = [2, 1, 0, 0, 0, 0, 0, 0][essay_set - 1], [12, 6, 3, 3, 4, 4, 30, 60][essay_set - 1]
+        return round((score - low) / (high - low) * 10)
+
+    sets = [1, 1, 2, 3, 7, 8, 8]
+    scores = [2, 12, 3.5, 1.5, 15, 0, 33]
+    assert normalize_scores(sets, scores).tolist() == [normalize(s, x) for s, x in zip(sets, scores)]
+
+
+def test_strip_anonymized():
+    assert strip_anonymized("Dear @CAPS1,  the @PERSON1 said\nhi") == "Dear the said hi"
+
+
+def test_feature_cache_round_trip(tmp_path):
+    path = str(tmp_path / "features.sqlite3")
+    cache = FeatureCache(path)
+    cache.put_many({"a": ("clean a", np.array([1.0, 2.5])), "b": ("clean b", np.array([3.0, 4.0]))})
+    cache.close()
+    found = FeatureCache(path).get_many(["a", "missing", "a"])
+    assert list(found) == ["a"]
+    clean, values = found["a"]
+    assert clean == "clean a" and values.tolist() == [1.0, 2.5]
+
+
+def test_rerun_only_computes_changed_essays(tmp_path):
+    _require_pipeline_dependencies()
+    import pandas as pd
+
+    data, output, cache = tmp_path / "essays.tsv", str(tmp_path / "features.parquet"), str(tmp_path / "cache.sqlite3")
+    _write_tsv(data, ESSAYS)
+    stats = build_feature_store(str(data), output, cache, workers=1, chunk_size=2, pos=False)
+    assert (stats["essays"], stats["cached"], stats["computed"]) == (3, 0, 3)
+    first = pd.read_parquet(output)
+    assert first["essay_id"].tolist() == [1, 2, 3]
+    assert first["final_score"].tolist() == [6, 6, 8]
+    assert first["essay"][0] == "Dear computers help people learn. They are great!"
+    assert list(first.columns[5:]) == ["char_count", "word_count", "sent_count", "avg_word_len"]
+
+    edited = ESSAYS[:2] + [(3, 8, "Laughter is the shortest distance between two friends.", 45)]
+    _write_tsv(data, edited)
+    stats = build_feature_store(str(data), output, cache, workers=1, chunk_size=2, pos=False)
+    assert (stats["essays"], stats["cached"], stats["computed"]) == (3, 2, 1)
+    second = pd.read_parquet(output)
+    pd.testing.assert_frame_equal(second.iloc[:2], first.iloc[:2])
+    assert second["clean_essay"][2] != first["clean_essay"][2]
@@ -0,0 +1,91 @@
+"""Tests for the upstream client of gemma_scorer.py (run with python -m pytest).
+
+Runs against mock_upstream.py, so no network access or API key is needed.
+"""
+import socket
+
+import pytest
+
+from gemma_scorer import GemmaEssayScorer
+from mock_upstream import start_mock_upstream
+
+ESSAY = "A short essay about testing. " * 20
+
+
+@pytest.fixture
+def upstream():
+    servers = []
+
+    def start(**settings):
+        server, url = start_mock_upstream(**settings)
+        servers.append(server)
+        return server, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def make_scorer():
+    scorers = []
+
+    def make(url, **settings):
+        settings = {"api_key": "test", "max_retries": 2, "backoff_base": 0.001, **settings}
+        scorer = GemmaEssayScorer(api_url=url, **settings)
+        scorers.append(scorer)
+        return scorer
+
+    yield make
+    for scorer in scorers:
+        scorer.close()
+
+
+def _closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/api/v1/chat/completions"
+
+
+def test_requests_share_a_keep_alive_connection(upstream, make_scorer):
+    server, url = upstream()
+    scorer = make_scorer(url)
+    for _ in range(4):
+        result = scorer.score_essay(ESSAY)
+        assert "error" not in result and 1 <= result["overall_score"] <= 10
+    stats = scorer.pool_stats()
+    assert (stats["requests"], stats["retries"], stats["failures"]) == (4, 0, 0)
+    assert (stats["connections_opened"], stats["connections_reused"]) == (1, 3)
+    assert server.request_count == 4
+
+
+def test_server_errors_are_retried_then_reported(upstream, make_scorer):
+    server, url = upstream(error_rate=1.0)
+    scorer = make_scorer(url)
+    result = scorer.score_essay(ESSAY)
+    assert result["error"] == "API request error: HTTP 500"
+    assert server.request_count == 3
+    stats = scorer.pool_stats()
+    assert (stats["requests"], stats["retries"], stats["failures"]) == (3, 2, 1)
+    # Error bodies are drained, so the retries reuse the connection
+    assert stats["connections_opened"] == 1
+
+
+def test_connection_errors_are_retried_then_reported(make_scorer):
+    scorer = make_scorer(_closed_port_url(), max_retries=1)
+    result = scorer.score_essay(ESSAY)
+    assert result["error"].startswith("API request error")
+    stats = scorer.pool_stats()
+    assert (stats["requests"], stats["retries"], stats["failures"]) == (2, 1, 1)
+
+
+def test_retry_delay_honors_retry_after_within_bounds():
+    scorer = GemmaEssayScorer(api_key="test", backoff_base=0.5, backoff_max=10.0)
+    assert scorer._retry_delay(0, "2") == 2.0
+    assert scorer._retry_delay(0, "120") == 10.0
+    assert scorer._retry_delay(0, "Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    for attempt in range(8):
+        assert 0.0 <= scorer._retry_delay(attempt) <= min(10.0, 0.5 * 2 ** attempt)
+        assert 0.0 <= scorer._retry_delay(attempt, "soon") <= min(10.0, 0.5 * 2 ** attempt)
@@ -0,0 +1,30 @@
+"""Tests for heuristics.py (run with python -m pytest)."""
+import pytest
+
+from heuristics import extract_features, score_essay
+
+
+def _reference_features(text):
+    """The counting of the original per-scorer code."""
+    sentences = [s for s in text.split(".") if s.strip()]
+    paragraphs = [p for p in text.split("\n\n") if p.strip()]
+    grammar = sum(marker in text for marker in (". ,", "  ", " .", " ,", ",,", "!!"))
+    return len(text.split()), len(sentences), max(1, len(paragraphs)), grammar
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "One sentence. Two sentences.\n\nA second paragraph .",
+    "Café naïve text　with unicode spaces.",
+    "A lone surrogate \ud800 in the middle. Another\udfff one.",
+    "\ud800",
+])
+def test_extract_features_matches_reference(text):
+    assert tuple(extract_features(text)) == _reference_features(text)
+
+
+def test_lone_surrogate_is_scored():
+    # Valid JSON such as {"text": "\ud800 ..."} decodes to a lone surrogate
+    essay = "This essay has a lone surrogate \ud800 in it. " * 20
+    for preset in ("offline", "basic", "vercel"):
+        assert "overall_score" in score_essay(essay, preset)
@@ -0,0 +1,117 @@
+"""Tests for job_queue.py (run with python -m pytest)."""
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+from job_queue import RUNNING, JobQueue
+
+
+def _score(essays):
+    return [{"score": len(essay)} for essay in essays]
+
+
+def _items(*essays):
+    return [({"index": i}, essay) for i, essay in enumerate(essays)]
+
+
+def _wait_completed(queue, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = queue.status(job_id)
+        if status["status"] == "completed":
+            return status
+        time.sleep(0.01)
+    pytest.fail("job did not complete")
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+def test_job_runs_to_completion(db_path):
+    queue = JobQueue(db_path, _score, workers=2, chunk_size=2, poll_interval=0.01).start()
+    try:
+        job_id = queue.submit(_items("a", "bb", "ccc") + [({"index": 3, "error": "Empty essay"}, None)])
+        status = _wait_completed(queue, job_id)
+    finally:
+        queue.stop()
+    assert (status["completed"], status["failed"], status["remaining"]) == (3, 1, 0)
+    assert [result.get("score") for result in status["results"]] == [1, 2, 3, None]
+
+
+def test_claims_of_a_crashed_process_are_resumed(db_path):
+    crashed = JobQueue(db_path, _score, chunk_size=2)
+    job_id = crashed.submit(_items("a", "bb", "ccc"))
+    claimed = crashed._claim()
+    crashed._store(claimed[:1], _score(["a"]))
+    # The process dies holding the second essay of its chunk
+    crashed._db.execute("UPDATE job_items SET owner = ? WHERE status = ?", (_dead_pid(), RUNNING))
+    crashed._db.close()
+
+    restarted = JobQueue(db_path, _score, chunk_size=2, poll_interval=0.01)
+    assert restarted.recover() == 1
+    assert restarted.stats()["pending_essays"] == 2
+    restarted.start()
+    try:
+        status = _wait_completed(restarted, job_id)
+    finally:
+        restarted.stop()
+    assert [result["score"] for result in status["results"]] == [1, 2, 3]
+
+
+def test_recover_leaves_live_claims_alone(db_path):
+    queue = JobQueue(db_path, _score, chunk_size=1)
+    queue.submit(_items("a"))
+    queue._claim()
+    other = JobQueue(db_path, _score)
+    # Seen from another process, whose own pid differs from the claim's owner
+    other._owner = -1
+    assert other.recover() == 0
+    assert dict(other._db.execute("SELECT status, COUNT(*) FROM job_items GROUP BY status")) == {RUNNING: 1}
+
+
+def test_worker_survives_database_errors(db_path, monkeypatch):
+    queue = JobQueue(db_path, _score, workers=1, chunk_size=1, poll_interval=0.01)
+    claim, store = queue._claim, queue._store
+    failures = {"claim": 1, "store": 1}
+    scored = []
+
+    def flaky_claim():
+        if failures["claim"]:
+            failures["claim"] -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return claim()
+
+    def flaky_store(claimed, results):
+        if failures["store"]:
+            failures["store"] -= 1
+            raise sqlite3.OperationalError("database is locked")
+        store(claimed, results)
+
+    def counting_score(essays):
+        scored.extend(essays)
+        return _score(essays)
+
+    monkeypatch.setattr(queue, "_claim", flaky_claim)
+    monkeypatch.setattr(queue, "_store", flaky_store)
+    monkeypatch.setattr(queue, "score_batch", counting_score)
+    job_id = queue.submit(_items("a", "bb"))
+    queue.start()
+    try:
+        status = _wait_completed(queue, job_id)
+    finally:
+        queue.stop()
+    assert status["completed"] == 2 and not any(failures.values())
+    # A failed write is retried with the results already computed
+    assert scored == ["a", "bb"]
+    assert queue.stats()["pending_essays"] == 0
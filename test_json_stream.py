@@ -0,0 +1,74 @@
+"""Tests for json_stream.py (run with python -m pytest)."""
+import codecs
+import json
+
+import pytest
+
+from json_stream import IncrementalJSONParser
+
+DOCUMENT = {
+    "coherence_score": 7,
+    "grammar_score": 6.5,
+    "flagged": False,
+    "notes": None,
+    "feedback": {
+        "grammar": "Watch \"its\" vs \"it's\", and the comma splice\\run-on in ¶2 — très fréquent 🙂",
+        "structure": "Clear {intro} and [conclusion], but a weak middle.",
+    },
+    "suggestions": ["Vary sentence length", "", "Cite sources: 1, 2, 3"],
+    "empty": {},
+    "matrix": [[1, -2e3], []],
+}
+
+
+def _flatten(value, path=()):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(item, path + (key,))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            yield from _flatten(item, path + (index,))
+    else:
+        yield path, value
+
+
+def _parse(chunks):
+    parser = IncrementalJSONParser()
+    found = []
+    for chunk in chunks:
+        found.extend(parser.feed(chunk))
+    return parser, found
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_byte_split_chunks(indent):
+    text = json.dumps(DOCUMENT, ensure_ascii=False, indent=indent)
+    # A streamed response decoded as it arrives, one byte at a time
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = [decoder.decode(bytes([byte])) for byte in text.encode("utf-8")]
+    parser, found = _parse(chunks)
+    assert parser.done
+    assert found == list(_flatten(DOCUMENT))
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10_000])
+def test_any_chunk_size_gives_the_full_parse(size):
+    text = "```json\n" + json.dumps(DOCUMENT) + "\n```\nTrailing remarks {\"ignored\": 1}"
+    parser, found = _parse(text[i:i + size] for i in range(0, len(text), size))
+    assert parser.done
+    assert found == list(_flatten(DOCUMENT))
+
+
+def test_values_are_reported_as_soon_as_complete():
+    parser = IncrementalJSONParser()
+    assert parser.feed('Sure! {"score": 12') == []
+    assert parser.feed(', "feedback": "Good') == [(("score",), 12)]
+    assert parser.feed(' work"') == [(("feedback",), "Good work")]
+    assert parser.feed("}") == [] and parser.done
+    assert parser.feed('{"more": 1}') == []
+
+
+def test_long_string_in_small_deltas():
+    words = ["word"] * 20_000
+    parser, found = _parse(['{"feedback": "'] + [w + " " for w in words] + ['"}'])
+    assert found == [(("feedback",), "word " * len(words))]
@@ -0,0 +1,56 @@
+"""Tests for metrics.py (run with python -m pytest)."""
+import pytest
+
+from metrics import Counter, Registry
+
+
+def test_counters_and_histograms_are_shared():
+    registry = Registry()
+    first = registry.counter("scores", "Essays scored", method="basic")
+    assert registry.counter("scores", "Essays scored", method="basic") is first
+    assert registry.counter("scores", "Essays scored", method="advanced") is not first
+    histogram = registry.histogram("stage_seconds", "Stage time", buckets=[1, 2], stage="parse")
+    assert registry.histogram("stage_seconds", "Stage time", buckets=[1, 2], stage="parse") is histogram
+
+
+def test_duplicate_with_other_type_or_help_text_raises():
+    registry = Registry()
+    registry.counter("cache_hits", "Score cache hits")
+    with pytest.raises(ValueError, match="counter"):
+        registry.gauge("cache_hits", lambda: 1.0, "Score cache hits")
+    with pytest.raises(ValueError, match="help text"):
+        registry.counter("cache_hits", "LSTM cache hits")
+    registry.histogram("latency", "Latency", buckets=[1])
+    with pytest.raises(ValueError, match="buckets"):
+        registry.histogram("latency", "Latency", buckets=[1, 2])
+
+
+def test_second_gauge_or_metric_under_a_name_raises():
+    registry = Registry()
+    registry.gauge("cache_size", lambda: 1.0, "Score cache size")
+    with pytest.raises(ValueError, match="already registered"):
+        registry.gauge("cache_size", lambda: 2.0, "Score cache size")
+    assert "essay_cache_size 1" in registry.render()
+
+    trips = Counter()
+    assert registry.register("breaker_trips", trips, "Breaker trips") is trips
+    assert registry.register("breaker_trips", trips, "Breaker trips") is trips
+    with pytest.raises(ValueError, match="already registered"):
+        registry.register("breaker_trips", Counter(), "Breaker trips")
+
+
+def test_render():
+    registry = Registry()
+    registry.counter("scores", "Essays scored", method="basic").inc(3)
+    registry.histogram("stage_seconds", "Stage time", buckets=[0.5], stage="parse").observe(0.25)
+    assert registry.render().splitlines() == [
+        "# HELP essay_scores_total Essays scored",
+        "# TYPE essay_scores_total counter",
+        'essay_scores_total{method="basic"} 3',
+        "# HELP essay_stage_seconds Stage time",
+        "# TYPE essay_stage_seconds histogram",
+        'essay_stage_seconds_bucket{stage="parse",le="0.5"} 1',
+        'essay_stage_seconds_bucket{stage="parse",le="+Inf"} 1',
+        'essay_stage_seconds_sum{stage="parse"} 0.25',
+        'essay_stage_seconds_count{stage="parse"} 1',
+    ]
@@ -0,0 +1,74 @@
+"""Tests for microbatch.py (run with python -m pytest)."""
+import threading
+
+import numpy as np
+import pytest
+
+from microbatch import MicroBatcher, QueueFullError
+
+
+class GatedModel:
+    """Doubles its input; the first call blocks until released, so requests pile up behind it."""
+
+    def __init__(self):
+        self.batches = []
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+
+    def __call__(self, x):
+        self.batches.append(len(x))
+        self.entered.set()
+        self.gate.wait(5)
+        return x * 2
+
+
+def _busy_batcher(**settings):
+    model = GatedModel()
+    batcher = MicroBatcher(model, **settings)
+    first = batcher.submit(np.zeros((1, 2)))
+    assert model.entered.wait(5)
+    return model, batcher, first
+
+
+def test_waiting_requests_share_a_model_call():
+    model, batcher, first = _busy_batcher(max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit(np.full((1, 2), i)) for i in range(5)]
+    model.gate.set()
+    for i, future in enumerate(futures):
+        np.testing.assert_array_equal(future.result(5), np.full((1, 2), 2 * i))
+    first.result(5)
+    assert model.batches == [1, 4, 1]
+    assert batcher.stats()["batches"] == 3
+
+
+def test_batches_never_exceed_the_maximum():
+    model, batcher, first = _busy_batcher(max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit(np.ones((3, 2))), batcher.submit(np.ones((3, 2)))]
+    model.gate.set()
+    assert [future.result(5).shape for future in futures] == [(3, 2), (3, 2)]
+    assert model.batches == [1, 3, 3]
+
+
+def test_full_queue_rejects():
+    model, batcher, first = _busy_batcher(max_queue=1)
+    queued = batcher.submit(np.ones((1, 2)))
+    with pytest.raises(QueueFullError):
+        batcher.submit(np.ones((1, 2)))
+    assert batcher.rejected.value == 1
+    model.gate.set()
+    assert queued.result(5).shape == (1, 2)
+
+
+def test_model_errors_reach_every_caller_and_the_worker_survives():
+    calls = []
+
+    def flaky(x):
+        calls.append(len(x))
+        if len(calls) == 1:
+            raise RuntimeError("model failed")
+        return x + 1
+
+    batcher = MicroBatcher(flaky, max_wait_ms=1)
+    with pytest.raises(RuntimeError, match="model failed"):
+        batcher.predict(np.zeros((2, 1)), timeout=5)
+    np.testing.assert_array_equal(batcher.predict(np.zeros((2, 1)), timeout=5), np.ones((2, 1)))
@@ -0,0 +1,44 @@
+"""Tests for numpy_lstm.py (run with python -m pytest)."""
+import os
+
+import numpy as np
+import pytest
+
+from numpy_lstm import NumpyLSTMScorer, export_weights
+
+# Written by testdata/make_lstm_reference.py from a small Keras model shaped like the scorer
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata")
+REFERENCE_H5 = os.path.join(TESTDATA, "lstm_reference.h5")
+REFERENCE_OUTPUT = os.path.join(TESTDATA, "lstm_reference_output.npz")
+
+
+@pytest.fixture
+def exported(tmp_path):
+    pytest.importorskip("h5py")
+    npz_path = str(tmp_path / "lstm.npz")
+    return export_weights(REFERENCE_H5, npz_path), npz_path
+
+
+def test_export_keeps_only_inference_layers(exported):
+    specs, _ = exported
+    assert [spec["type"] for spec in specs] == ["LSTM", "LSTM", "Dense"]
+    assert [spec.get("return_sequences") for spec in specs] == [True, False, None]
+    assert specs[-1]["activation"] == "relu"
+
+
+def test_predictions_match_keras(exported):
+    _, npz_path = exported
+    with np.load(REFERENCE_OUTPUT) as reference:
+        x, expected = reference["x"], reference["expected"]
+    predicted = NumpyLSTMScorer(npz_path).predict(x)
+    assert predicted.shape == expected.shape == (len(x), 1)
+    np.testing.assert_allclose(predicted, expected, rtol=0, atol=1e-5)
+
+
+def test_batch_rows_are_independent(exported):
+    _, npz_path = exported
+    scorer = NumpyLSTMScorer(npz_path)
+    with np.load(REFERENCE_OUTPUT) as reference:
+        x = reference["x"]
+    single = np.concatenate([scorer.predict(x[i:i + 1]) for i in range(len(x))])
+    np.testing.assert_allclose(scorer.predict(x), single, rtol=0, atol=1e-6)
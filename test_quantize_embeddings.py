@@ -0,0 +1,85 @@
+"""Tests for quantize_embeddings.py and vector_store.py (run with python -m pytest)."""
+import os
+
+import numpy as np
+import pytest
+
+from embedding_engine import EmbeddingEngine
+from quantize_embeddings import INT8_MAX, quantize_rows, quantize_store, reconstruction_error
+from vector_store import MemmapKeyedVectors, convert_word2vec
+
+WORDS = ["the", "essay", "café", "zero", "argues"]
+
+
+@pytest.fixture
+def vectors():
+    rows = np.random.default_rng(0).normal(size=(len(WORDS), 16)).astype(np.float32)
+    rows[WORDS.index("zero")] = 0.0
+    return rows
+
+
+@pytest.fixture
+def store(tmp_path, vectors):
+    """A float32 store converted from a binary word2vec file."""
+    bin_path = tmp_path / "vectors.bin"
+    with open(bin_path, "wb") as f:
+        f.write(f"{len(WORDS)} {vectors.shape[1]}\n".encode())
+        for word, row in zip(WORDS, vectors):
+            f.write(word.encode("utf-8") + b" " + row.astype("<f4").tobytes() + b"\n")
+    prefix = str(tmp_path / "vectors")
+    assert convert_word2vec(str(bin_path), prefix) == len(WORDS)
+    return prefix
+
+
+def test_converted_store_reads_back(store, vectors):
+    keyed_vectors = MemmapKeyedVectors(store)
+    assert keyed_vectors.index_to_key == WORDS and keyed_vectors.precision == "float32"
+    assert "café" in keyed_vectors and "cafe" not in keyed_vectors
+    np.testing.assert_array_equal(keyed_vectors["café"], vectors[2])
+
+
+def test_int8_rows_use_per_row_scales(vectors):
+    # Rows of very different magnitude each keep their own resolution
+    vectors[1] *= 1000
+    table, scales = quantize_rows(vectors, "int8")
+    assert table.dtype == np.int8 and scales.shape == (len(WORDS),)
+    assert np.abs(table).max(axis=1)[[0, 1, 2, 4]].tolist() == [INT8_MAX] * 4
+    assert not table[WORDS.index("zero")].any() and scales[WORDS.index("zero")] == 0
+    assert (np.abs(table * scales[:, None] - vectors) <= scales[:, None] / 2 + 1e-6).all()
+    with pytest.raises(ValueError, match="precision"):
+        quantize_rows(vectors, "int4")
+
+
+@pytest.mark.parametrize("precision, max_error", [("float16", 1e-2), ("int8", 3e-2)])
+def test_quantized_store_stays_close(store, vectors, precision, max_error):
+    prefix = store + "." + precision
+    info = quantize_store(store, prefix, precision, chunk_rows=2)
+    assert info["rows"] == len(WORDS)
+    assert info["bytes"] < vectors.nbytes
+    error = reconstruction_error(store, prefix, chunk_rows=2)
+    assert error["max_abs_error"] < max_error and error["min_cosine"] > 0.999
+
+    quantized = MemmapKeyedVectors(prefix)
+    assert quantized.precision == precision
+    np.testing.assert_allclose(quantized["essay"], vectors[1], atol=max_error)
+    essays = [["the", "essay"], ["argues", "unknown", "café"], []]
+    reference = EmbeddingEngine(vectors, WORDS).mean_vectors(essays)
+    np.testing.assert_allclose(EmbeddingEngine.from_keyed_vectors(quantized).mean_vectors(essays), reference,
+                               atol=max_error)
+
+
+def test_rewriting_a_store_drops_stale_scales(store):
+    prefix = store + ".copy"
+    quantize_store(store, prefix, "int8")
+    assert os.path.exists(prefix + ".scales.npy")
+    quantize_store(store, prefix, "float16")
+    assert not os.path.exists(prefix + ".scales.npy")
+    assert MemmapKeyedVectors(prefix).scales is None
+
+
+def test_int8_store_without_scales_is_refused(store):
+    prefix = store + ".int8"
+    quantize_store(store, prefix, "int8")
+    os.remove(prefix + ".scales.npy")
+    with pytest.raises(ValueError, match="scales"):
+        MemmapKeyedVectors(prefix)
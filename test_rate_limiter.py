@@ -0,0 +1,93 @@
+"""Tests for rate_limiter.py (run with python -m pytest)."""
+import asyncio
+import time
+
+import pytest
+
+from rate_limiter import BATCH, INTERACTIVE, DeadlineExceededError, TokenBucket, UpstreamScheduler, parse_reset
+
+
+def test_bucket_refills_at_its_rate_up_to_the_limit():
+    bucket = TokenBucket(10, window_seconds=10)
+    start = bucket.updated
+    bucket.take(10, start)
+    assert bucket.wait_time(3, start) == pytest.approx(3.0)
+    assert bucket.wait_time(3, start + 1) == pytest.approx(2.0)
+    assert bucket.tokens == pytest.approx(1.0)
+    assert bucket.wait_time(3, start + 100) == 0.0
+    assert bucket.tokens == 10
+
+
+def test_bucket_pause_and_sync():
+    bucket = TokenBucket(10, window_seconds=10)
+    start = bucket.updated
+    bucket.pause(start, 5)
+    assert bucket.wait_time(1, start) == pytest.approx(5.0)
+    # The upstream's remaining count only ever lowers the estimate
+    bucket.sync(start + 8, remaining=20)
+    assert bucket.tokens == pytest.approx(8.0)
+    bucket.sync(start + 8, limit=4, remaining=0, reset_in=30)
+    assert bucket.limit == 4 and bucket.tokens == 0
+    assert bucket.wait_time(1, start + 8) == pytest.approx(30.0)
+
+
+def test_interactive_overtakes_queued_batch_work():
+    # Two requests per 0.1 s, so the queue drains quickly
+    scheduler = UpstreamScheduler(requests_per_minute=2, window_seconds=0.1, headroom=1.0, poll_interval=0.005)
+    order = []
+
+    async def call(name, priority, deadline=None):
+        await scheduler.acquire(priority=priority, deadline=deadline)
+        order.append(name)
+
+    async def main():
+        await call("first", INTERACTIVE)
+        await call("second", INTERACTIVE)
+        batch = [asyncio.ensure_future(call(f"batch{i}", BATCH)) for i in range(3)]
+        await asyncio.sleep(0)
+        late = time.monotonic() + 10
+        urgent = time.monotonic() + 5
+        interactive = [asyncio.ensure_future(call("late", INTERACTIVE, late)),
+                       asyncio.ensure_future(call("urgent", INTERACTIVE, urgent))]
+        await asyncio.gather(*batch, *interactive)
+
+    asyncio.run(main())
+    # Priority first, then the earlier deadline, then arrival
+    assert order == ["first", "second", "urgent", "late", "batch0", "batch1", "batch2"]
+    assert scheduler.granted.value == 7
+    assert scheduler.stats()["queued"] == {"interactive": 0, "batch": 0}
+
+
+def test_deadline_expires_without_waiting():
+    scheduler = UpstreamScheduler(requests_per_minute=1, window_seconds=60, headroom=1.0)
+
+    async def main():
+        await scheduler.acquire()
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceededError):
+            await scheduler.acquire(deadline=started + 1.0)
+        return time.monotonic() - started
+
+    assert asyncio.run(main()) < 0.5
+    assert scheduler.expired.value == 1
+    assert scheduler.stats()["queued"]["interactive"] == 0
+
+
+def test_estimated_wait_counts_the_request_bucket_and_pauses():
+    scheduler = UpstreamScheduler(requests_per_minute=10, window_seconds=10, headroom=1.0)
+    assert scheduler.estimated_wait(0) == 0.0
+    assert scheduler.estimated_wait(10) == pytest.approx(0.0, abs=0.01)
+    assert scheduler.estimated_wait(12) == pytest.approx(2.0, abs=0.01)
+    scheduler.observe(429, {"Retry-After": "5"})
+    assert scheduler.throttled.value == 1
+    assert scheduler.estimated_wait(1) == pytest.approx(6.0, abs=0.01)
+
+
+def test_parse_reset():
+    now = 1_700_000_000.0
+    assert parse_reset(None) is None
+    assert parse_reset("6m0s", now) == 360.0
+    assert parse_reset("20ms", now) == pytest.approx(0.02)
+    assert parse_reset("12", now) == 12.0
+    assert parse_reset(str(now + 30), now) == pytest.approx(30.0)
+    assert parse_reset(str(int((now + 30) * 1000)), now) == pytest.approx(30.0)
@@ -0,0 +1,98 @@
+"""Tests for score_cache.py (run with python -m pytest)."""
+import pytest
+
+import score_cache
+from score_cache import ScoreCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        self.now += 0.001  # every call is a distinct instant, so LRU order is well defined
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(score_cache.time, "time", fake.time)
+    return fake
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "scores.sqlite3")
+
+
+def test_key_ignores_whitespace_but_not_settings():
+    key = ScoreCache.make_key("An  essay.\n\nMore.", "gemma", "v1")
+    assert key == ScoreCache.make_key("An essay. More.", "gemma", "v1")
+    assert key != ScoreCache.make_key("An essay. More.", "gemma", "v2")
+    assert key != ScoreCache.make_key("An essay. More.", "gemma", "v1", temperature=0.7)
+    assert key != ScoreCache.make_key("An  essay.\n\nMore.", "gemma", "v1", normalize=False)
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ScoreCache(max_entries=2)
+    cache.set("a", {"score": 1})
+    cache.set("b", {"score": 2})
+    assert cache.get("a") == {"score": 1}  # "b" is now the oldest
+    cache.set("c", {"score": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"score": 1} and cache.get("c") == {"score": 3}
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"], stats["memory_entries"]) == (3, 1, 2)
+
+
+def test_results_are_copies():
+    cache = ScoreCache()
+    result = {"feedback": {"grammar": "Fine"}}
+    cache.set("a", result)
+    result["feedback"]["grammar"] = "changed"
+    cache.get("a")["feedback"]["grammar"] = "changed again"
+    assert cache.get("a") == {"feedback": {"grammar": "Fine"}}
+
+
+def test_disk_tier_survives_a_restart(db_path, clock):
+    ScoreCache(max_entries=1, db_path=db_path).set("a", {"score": 1})
+    restarted = ScoreCache(max_entries=1, db_path=db_path)
+    assert restarted.stats()["disk_entries"] == 1
+    assert restarted.contains("a")
+    assert restarted.get("a") == {"score": 1}
+    assert restarted.get("a") == {"score": 1}
+    stats = restarted.stats()
+    assert (stats["disk_hits"], stats["memory_hits"]) == (1, 1)
+
+
+def test_disk_entries_expire(db_path, clock):
+    cache = ScoreCache(max_entries=1, db_path=db_path, ttl=60)
+    cache.set("a", {"score": 1})
+    cache.set("b", {"score": 2})  # pushes "a" out of memory
+    clock.now += 61
+    assert not cache.contains("a")
+    assert cache.get("a") is None
+    assert cache.stats()["disk_entries"] == 1
+
+
+def test_disk_tier_evicts_least_recently_used(db_path, clock):
+    cache = ScoreCache(max_entries=1, db_path=db_path, max_disk_entries=10)
+    for i in range(10):
+        cache.set(str(i), {"score": i})
+    assert cache.get("0") == {"score": 0}  # refreshes "0" on disk
+    cache.set("10", {"score": 10})
+    # One over the limit evicts the oldest tenth plus the excess: "1" and "2"
+    assert cache.stats()["disk_entries"] == 9 and cache.stats()["evictions"] == 2
+    assert not cache.contains("1") and not cache.contains("2")
+    assert all(cache.contains(str(i)) for i in [0] + list(range(3, 11)))
+
+
+def test_contains_does_not_count_or_refresh():
+    cache = ScoreCache(max_entries=2)
+    cache.set("a", {"score": 1})
+    cache.set("b", {"score": 2})
+    assert cache.contains("a") and not cache.contains("z")
+    cache.set("c", {"score": 3})  # "a" is still the oldest
+    assert not cache.contains("a")
+    assert cache.stats()["misses"] == 0
@@ -0,0 +1,33 @@
+"""Tests for spell_lexicon.py (run with python -m pytest)."""
+import itertools
+import random
+
+import pytest
+
+from spell_lexicon import SpellLexicon, edit_distance
+
+
+def _brute_force(lexicon_counts, word, max_distance):
+    found = [(w, edit_distance(word, w, max_distance), c) for w, c in lexicon_counts.items()]
+    found = [item for item in found if item[1] <= max_distance]
+    return sorted(found, key=lambda item: (item[1], -item[2], item[0]))
+
+
+def test_short_words_match_brute_force():
+    counts = {"cd": 1, "a": 1, "to": 1, "xyz": 1}
+    lexicon = SpellLexicon.build(counts, max_distance=2)
+    assert lexicon.suggest("ab", limit=10) == _brute_force(counts, "ab", 2)
+    assert {w for w, _, _ in lexicon.suggest("ab", limit=10)} == {"a", "cd", "to"}
+
+
+@pytest.mark.parametrize("max_distance", [1, 2])
+def test_suggest_matches_brute_force(max_distance, tmp_path):
+    rng = random.Random(7)
+    words = {"".join(rng.choice("abcd") for _ in range(rng.randint(1, 5))) for _ in range(300)}
+    counts = {w: rng.randint(1, 50) for w in words}
+    SpellLexicon.build(counts, max_distance).save(str(tmp_path / "lexicon"))
+    lexicon = SpellLexicon.load(str(tmp_path / "lexicon"))
+    queries = ["".join(p) for n in range(4) for p in itertools.product("abcde", repeat=n)]
+    for word in queries:
+        expected = [(word, 0, counts[word])] if word in counts else _brute_force(counts, word, max_distance)
+        assert lexicon.suggest(word, limit=len(counts)) == expected, word
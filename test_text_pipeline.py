@@ -0,0 +1,55 @@
+"""Tests for text_pipeline.py (run with python -m pytest)."""
+import re
+
+import pytest
+
+from text_pipeline import EssayTokenizer, split_contractions
+
+STOP_WORDS = {"the", "a", "is", "of", "and", "i", "not"}
+
+ESSAY = ("The @CAPS1 of computers is a big deal. I think they're great!  "
+         "Dr. Smith said \"use them wisely.\" Don't you agree? We cannot wait; gonna try 42 times.")
+
+
+def _sent2word(text, stop_words):
+    """The notebooks' original sent2word."""
+    words = re.sub("[^A-Za-z]", " ", text).split()
+    return [w for w in words if w not in stop_words]
+
+
+def test_words_match_the_original_sent2word():
+    tokenizer = EssayTokenizer(stop_words=STOP_WORDS)
+    assert tokenizer.words(ESSAY) == _sent2word(ESSAY, STOP_WORDS)
+    # Case is kept, so "The" and "I" survive a lowercase stopword list
+    assert tokenizer.words("The cat and I") == ["The", "cat", "I"]
+    assert EssayTokenizer(stop_words=STOP_WORDS, lowercase=True).words("The cat and I") == ["cat"]
+    assert EssayTokenizer(stop_words=None).words("a b-c") == ["a", "b", "c"]
+
+
+def test_regex_sentences():
+    tokenizer = EssayTokenizer(stop_words=None, sentence_splitter="regex")
+    assert tokenizer.sentences("  One. Two!  Three? \"Four.\" (Five.) Six ") == [
+        "One.", "Two!", "Three?", "\"Four.\"", "(Five.)", "Six"]
+    assert tokenizer.tokenize("Hi there. Bye.") == [["Hi", "there"], ["Bye"]]
+    with pytest.raises(ValueError, match="splitter"):
+        EssayTokenizer(stop_words=None, sentence_splitter="spacy")
+
+
+def test_flat_and_sentence_tokens_hold_the_same_words():
+    tokenizer = EssayTokenizer(stop_words=STOP_WORDS, sentence_splitter="regex")
+    flat, = tokenizer.tokenize_many([ESSAY])
+    by_sentence, = tokenizer.tokenize_many([ESSAY], by_sentence=True)
+    assert flat == [w for sentence in by_sentence for w in sentence]
+
+
+def test_split_contractions():
+    assert split_contractions(["Cannot", "gonna", "canned", "wannabe", "LEMME"]) == [
+        "Can", "not", "gon", "na", "canned", "wannabe", "LEM", "ME"]
+    tokenizer = EssayTokenizer(stop_words=STOP_WORDS, split_contractions=True)
+    assert tokenizer.words("We cannot wait") == ["We", "can", "wait"]
+
+
+def test_split_contractions_matches_the_treebank_tokenizer():
+    tokenize = pytest.importorskip("nltk.tokenize").TreebankWordTokenizer().tokenize
+    words = re.findall("[A-Za-z]+", ESSAY + " Gimme lemme gotta wanna Cannot")
+    assert split_contractions(words) == [token for word in words for token in tokenize(word)]
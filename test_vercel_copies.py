@@ -0,0 +1,9 @@
+"""The committed copies under api/ must match their sources (run with python -m pytest)."""
+import os
+
+import copy_files_for_vercel
+
+
+def test_module_copies_are_current(monkeypatch):
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+    assert copy_files_for_vercel.check_copies() == []
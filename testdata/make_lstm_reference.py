@@ -0,0 +1,42 @@
+"""Regenerate the Keras reference used by test_numpy_lstm.py (needs TensorFlow 2.x with Keras 2).
+
+Builds a scaled-down copy of the scorer (LSTM -> LSTM -> Dropout -> Dense,
+as in app.py) with random weights, saves it as HDF5 and records Keras's
+predictions for fixed inputs. Run from the repository root:
+
+    python testdata/make_lstm_reference.py
+"""
+import os
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.layers import LSTM, Dense, Dropout
+from tensorflow.keras.models import Sequential
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TIMESTEPS, FEATURES = 3, 8
+
+
+def main() -> None:
+    tf.keras.utils.set_random_seed(0)
+    model = Sequential()
+    model.add(LSTM(12, dropout=0.4, recurrent_dropout=0.4, input_shape=[TIMESTEPS, FEATURES], return_sequences=True))
+    model.add(LSTM(5, recurrent_dropout=0.4))
+    model.add(Dropout(0.5))
+    model.add(Dense(1, activation='relu'))
+    # Random biases too, and a positive output bias so the relu isn't clipping everything
+    for layer in model.layers:
+        weights = layer.get_weights()
+        if weights:
+            weights[-1] = np.random.default_rng(1).normal(scale=0.5, size=weights[-1].shape).astype(np.float32)
+            layer.set_weights(weights)
+    kernel, _ = model.layers[-1].get_weights()
+    model.layers[-1].set_weights([kernel, np.array([1.0], np.float32)])
+    model.save(os.path.join(HERE, "lstm_reference.h5"))
+
+    x = np.random.default_rng(2).normal(size=(16, TIMESTEPS, FEATURES)).astype(np.float32)
+    np.savez(os.path.join(HERE, "lstm_reference_output.npz"), x=x, expected=model.predict(x, verbose=0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import re
+import threading
+from typing import Iterable, List, Optional, Union
+
+# Sentence ends for the regex splitter: ., ! or ?, optionally followed by a closing quote or bracket, then whitespace
+_SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"')\]])\s+")
+
+SENTENCE_SPLITTERS = ("punkt", "regex")
+
+# Words nltk.word_tokenize splits in two even without apostrophes (its MacIntyre contractions):
+# lowercase word -> length of the first part. The rest of its rules only fire on punctuation.
+TREEBANK_SPLITS = {"cannot": 3, "gimme": 3, "gonna": 3, "gotta": 3, "lemme": 3, "wanna": 3}
+
+
+def split_contractions(words: Iterable[str]) -> List[str]:
+    """Split "cannot", "gonna" and the like as nltk.word_tokenize does, keeping case ("Cannot" -> "Can", "not")."""
+    out: List[str] = []
+    for word in words:
+        cut = TREEBANK_SPLITS.get(word.lower()) if len(word) in (5, 6) else None
+        if cut is None:
+            out.append(word)
+        else:
+            out += (word[:cut], word[cut:])
+    return out
+
+
+def _load_punkt():
+    """The English Punkt sentence tokenizer."""
+    try:
+        # NLTK >= 3.8.2 loads Punkt from punkt_tab instead of unpickling english.pickle
+        from nltk.tokenize import PunktTokenizer
+    except ImportError:
+        import nltk
+
+        return nltk.data.load("tokenizers/punkt/english.pickle")
+    return PunktTokenizer("english")
+
+
+class EssayTokenizer:
+    """Essay normalization shared by the training notebooks and the LSTM service.
+
+    Built once: the word pattern is compiled, the stopword list is loaded into
+    a frozenset and the Punkt model is loaded on first use and then kept, so
+    tokenizing an essay costs one regex scan and a set lookup per word.
+
+    The defaults reproduce the original sent2word exactly (letters only,
+    English stopwords removed, case kept). Case is kept on purpose: the
+    word2vec vocabulary was trained on that output and is cased ("I", "The",
+    and the dataset's anonymization tokens such as "CAPS" and "PERSON"), so
+    lowercasing would change which words find a vector.
+    """
+
+    def __init__(self, stop_words: Union[str, Iterable[str], None] = "english", pattern: str = r"[A-Za-z]+",
+                 lowercase: bool = False, sentence_splitter: str = "punkt", split_contractions: bool = False):
+        """Initialize the tokenizer.
+
+        Args:
+            stop_words: NLTK stopword list to load by language, an iterable of words, or None to keep every word
+            pattern: Regex matching one word; everything between matches is dropped
+            lowercase: Lowercase words before the stopword check (changes the output for a cased vocabulary)
+            sentence_splitter: "punkt" (NLTK, as the notebooks used) or "regex" (splits after . ! ? and is
+                several times faster, but breaks after abbreviations such as "Dr.")
+            split_contractions: Split "cannot", "gonna" etc. in two like nltk.word_tokenize, which the
+                handcrafted features were computed with (the LSTM's sent2word used str.split and did not)
+        """
+        if sentence_splitter not in SENTENCE_SPLITTERS:
+            raise ValueError(f"Unknown sentence splitter {sentence_splitter!r}, expected one of {', '.join(SENTENCE_SPLITTERS)}")
+        if isinstance(stop_words, str):
+            from nltk.corpus import stopwords
+
+            stop_words = stopwords.words(stop_words)
+        self.stop_words = frozenset(stop_words or ())
+        self.pattern = re.compile(pattern)
+        self.lowercase = lowercase
+        self.sentence_splitter = sentence_splitter
+        self.split_contractions = split_contractions
+        self._punkt = None
+        self._punkt_lock = threading.Lock()
+
+    def words(self, text: str) -> List[str]:
+        """Words of a text, without stopwords (the old sent2word)."""
+        words = self.pattern.findall(text.lower() if self.lowercase else text)
+        if self.split_contractions:
+            words = split_contractions(words)
+        if not self.stop_words:
+            return words
+        stop_words = self.stop_words
+        return [w for w in words if w not in stop_words]
+
+    def sentences(self, text: str) -> List[str]:
+        """Split a text into sentences with the configured splitter."""
+        text = text.strip()
+        if self.sentence_splitter == "regex":
+            return [s for s in _SENTENCE_BREAK_RE.split(text) if s]
+        if self._punkt is None:
+            with self._punkt_lock:
+                if self._punkt is None:
+                    self._punkt = _load_punkt()
+        return self._punkt.tokenize(text)
+
+    def tokenize(self, essay: str) -> List[List[str]]:
+        """Words of every sentence of an essay (the old essay2word)."""
+        return [self.words(sentence) for sentence in self.sentences(essay) if sentence]
+
+    def tokenize_many(self, essays: Iterable[str], by_sentence: bool = False) -> Union[List[List[str]], List[List[List[str]]]]:
+        """Tokenize a batch of essays.
+
+        Args:
+            essays: Essay texts
+            by_sentence: Return each essay's words grouped by sentence (as
+                tokenize() does) instead of one flat word list per essay. The
+                flat lists skip sentence splitting and contain the same words.
+
+        Returns:
+            One token list (or list of sentence token lists) per essay
+        """
+        if by_sentence:
+            return [self.tokenize(essay) for essay in essays]
+        return [self.words(essay) for essay in essays]
+
+
+_default: Optional[EssayTokenizer] = None
+_default_lock = threading.Lock()
+
+
+def default_tokenizer() -> EssayTokenizer:
+    """The process-wide tokenizer with the settings the LSTM was trained with."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = EssayTokenizer()
+    return _default
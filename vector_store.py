@@ -0,0 +1,134 @@
+import argparse
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def _store_paths(prefix: str) -> Dict[str, str]:
+    return {"vectors": prefix + ".npy", "vocab": prefix + ".vocab", "scales": prefix + ".scales.npy"}
+
+
+def store_exists(prefix: str) -> bool:
+    """Whether a converted vector store exists for the given prefix."""
+    paths = _store_paths(prefix)
+    return os.path.exists(paths["vectors"]) and os.path.exists(paths["vocab"])
+
+
+def convert_word2vec(bin_path: str, prefix: str) -> int:
+    """Convert a binary word2vec file into a memory-mappable vector store.
+
+    Writes ``<prefix>.npy`` (a plain float32 matrix, one row per word) and
+    ``<prefix>.vocab`` (one word per line, in row order). The input is parsed
+    directly so gensim is not needed for the conversion.
+
+    Args:
+        bin_path: Path to the binary word2vec file (e.g. word2vecmodel.bin)
+        prefix: Output path prefix
+
+    Returns:
+        Number of words written
+    """
+    paths = _store_paths(prefix)
+    with open(bin_path, "rb") as f:
+        vocab_size, dim = (int(x) for x in f.readline().split())
+        row_bytes = dim * np.dtype(np.float32).itemsize
+        # Write through a memmap so the whole matrix never sits in memory twice
+        matrix = np.lib.format.open_memmap(paths["vectors"] + ".tmp", mode="w+",
+                                           dtype=np.float32, shape=(vocab_size, dim))
+        words: List[str] = []
+        for row in range(vocab_size):
+            word = bytearray()
+            while True:
+                ch = f.read(1)
+                if ch == b" " or not ch:
+                    break
+                if ch != b"\n":  # some writers put a newline after each vector
+                    word.extend(ch)
+            words.append(word.decode("utf-8"))
+            matrix[row] = np.frombuffer(f.read(row_bytes), dtype="<f4")
+        matrix.flush()
+        del matrix
+
+    tmp_vocab = paths["vocab"] + ".tmp"
+    with open(tmp_vocab, "w", encoding="utf-8") as f:
+        f.write("\n".join(words))
+        f.write("\n")
+    # Only publish the store once both files are complete
+    os.replace(paths["vectors"] + ".tmp", paths["vectors"])
+    os.replace(tmp_vocab, paths["vocab"])
+    return len(words)
+
+
+class MemmapKeyedVectors:
+    """Read-only word vectors backed by a memory-mapped matrix.
+
+    Drop-in replacement for the parts of gensim's KeyedVectors used by the
+    scoring path. Every worker that opens the same store shares the same
+    physical pages through the OS page cache instead of holding a private copy.
+
+    Stores written by quantize_embeddings.py hold float16 or int8 rows; int8
+    stores come with a ``<prefix>.scales.npy`` of per-row scales. ``vectors``
+    is the stored table as is, get_vector() always returns float32.
+    """
+
+    def __init__(self, prefix: str):
+        """Open a vector store written by convert_word2vec.
+
+        Args:
+            prefix: Path prefix of the store (without .npy/.vocab)
+        """
+        paths = _store_paths(prefix)
+        self.vectors = np.load(paths["vectors"], mmap_mode="r")
+        with open(paths["vocab"], encoding="utf-8") as f:
+            self.index_to_key: List[str] = f.read().split("\n")[:-1]
+        if len(self.index_to_key) != self.vectors.shape[0]:
+            raise ValueError(f"Vocabulary size {len(self.index_to_key)} does not match "
+                             f"{self.vectors.shape[0]} vector rows in {paths['vectors']}")
+        self.scales: Optional[np.ndarray] = None
+        if os.path.exists(paths["scales"]):
+            self.scales = np.load(paths["scales"], mmap_mode="r")
+            if self.scales.shape != (self.vectors.shape[0],):
+                raise ValueError(f"{paths['scales']} has shape {self.scales.shape}, "
+                                 f"expected one scale per row of {paths['vectors']}")
+        elif np.issubdtype(self.vectors.dtype, np.integer):
+            raise ValueError(f"{paths['vectors']} holds {self.vectors.dtype} rows but {paths['scales']} is missing")
+        self.key_to_index: Dict[str, int] = {w: i for i, w in enumerate(self.index_to_key)}
+        self.vector_size = self.vectors.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.index_to_key)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.key_to_index
+
+    def __getitem__(self, word: str) -> np.ndarray:
+        return self.get_vector(word)
+
+    def has_index_for(self, word: str) -> bool:
+        return word in self.key_to_index
+
+    def get_index(self, word: str, default: Optional[int] = None) -> Optional[int]:
+        return self.key_to_index.get(word, default)
+
+    @property
+    def precision(self) -> str:
+        """Storage type of the rows, e.g. "float32" or "int8"."""
+        return self.vectors.dtype.name
+
+    def get_vector(self, word: str) -> np.ndarray:
+        row = self.key_to_index[word]
+        vector = np.array(self.vectors[row], dtype=np.float32)
+        if self.scales is not None:
+            vector *= self.scales[row]
+        return vector
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a binary word2vec file into a memory-mapped vector store.")
+    parser.add_argument("bin_path", nargs="?", default="word2vecmodel.bin", help="binary word2vec file")
+    parser.add_argument("prefix", nargs="?", default="word2vecmodel", help="output path prefix")
+    args = parser.parse_args()
+
+    count = convert_word2vec(args.bin_path, args.prefix)
+    print(f"Wrote {count} vectors to {args.prefix}.npy and {args.prefix}.vocab")